@@ -1,6 +1,26 @@
-try:
-    __version__ = __import__('pkg_resources').get_distribution(__name__).version
-except Exception as e:
-    __version__ = 'unknown'
-
-from .heatmap import Heatmap
+import importlib
+
+from .heatmap import Heatmap, HeatmapResult, HeatmapAccumulator, DensityGrid, PointIndex, RenderStats, \
+                     Diagnostics, SaturationWarning, simd
+
+# the version and the tile, animation and sharded modules are only looked up when first
+# asked for, importing heatmap has to stay cheap
+_lazy = {'TileRenderer' : 'tiles', 'TileServer' : 'server', 'AnimationRenderer' : 'animation',
+         'ShardedRenderer' : 'sharded',
+         'tiles' : 'tiles', 'server' : 'server', 'animation' : 'animation', 'sharded' : 'sharded'}
+
+def __getattr__(name):
+    if name == '__version__':
+        try:
+            from importlib.metadata import version
+            value = version(__name__)
+        except Exception:
+            value = 'unknown'
+    elif name in _lazy:
+        value = importlib.import_module('.' + _lazy[name], __name__)
+        if name != _lazy[name]:
+            value = getattr(value, name)
+    else:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value
+    return value
@@ -0,0 +1,169 @@
+import os
+import math
+import array
+import bisect
+import ctypes
+from .heatmap import Heatmap, _flattenPoints, _transformer, _checkPyproj, _projectArea
+
+class AnimationRenderer:
+    """
+    Renders time series of points as animations, one heatmap per window of time
+    sliding along in steps.
+
+    ar = AnimationRenderer(points, window=3600, step=600, area=area, srcepsg='EPSG:4326')
+    ar.save("traffic.gif", scheme="fire")
+
+    Frames are drawn with the additive engine on one rolling intensity grid: each
+    step adds the points entering the window and subtracts the ones leaving it,
+    so a frame costs the points that changed rather than the whole window.  The
+    grid is rebuilt from the window's points once per window's worth of frames,
+    which keeps the float rounding of adding and subtracting from piling up.
+
+    points   -> x,y,t triples, or x,y,t,w when weighted, in any of the layouts
+                Heatmap.heatmap() accepts.  t is any number, e.g. seconds since
+                the epoch (keep those out of float32 buffers, which would round
+                them to minutes).
+    window   -> length of time a frame covers, in the units of t.  Frames cover
+                [start, start + window), [start + step, start + step + window)...
+    step     -> time between frames, in the units of t
+    start    -> time of the first frame, the earliest t by default
+    end      -> frames go on until one covers end, the latest t by default
+    area     -> as for Heatmap.heatmap(), the same for every frame.  By default
+                the bounds of all the points.
+    size, dotsize, weighted, srcepsg, dstepsg, threads and kernel are as for
+    Heatmap.heatmap().
+    """
+
+    def __init__(self, points, window, step, size=(1024, 1024), area=None, dotsize=150,
+                 weighted=0, srcepsg=None, dstepsg='EPSG:3857', threads=1, kernel='dot',
+                 start=None, end=None, libpath=None):
+        _checkPyproj(srcepsg)
+        if not (window > 0 and step > 0):
+            raise Exception("window and step must be greater than 0")
+
+        self.window = window
+        self.step = step
+        self.size = size
+        self.dotsize = dotsize
+        self.weighted = weighted
+        self.srcepsg = srcepsg
+        self.dstepsg = dstepsg
+        self.threads = threads
+        self.kernel = kernel
+        self._hm = Heatmap(libpath)
+
+        points, view = _flattenPoints(points)
+        inc = 4 if weighted else 3
+        if len(points) == 0 or len(points) % inc != 0:
+            raise Exception("points must be %s" % ("x,y,t,w quadruples" if weighted else "x,y,t triples"))
+        ts = points[2::inc]
+        order = sorted(range(len(ts)), key=ts.__getitem__)
+        self._times = array.array('d', [ts[i] for i in order])
+        xs = array.array('d', [points[i*inc] for i in order])
+        ys = array.array('d', [points[i*inc+1] for i in order])
+
+        if area is None:
+            area = ((min(xs), min(ys)), (max(xs), max(ys)))
+        self.area = area
+        if srcepsg is not None and srcepsg != dstepsg:
+          xs, ys = _transformer(srcepsg, dstepsg).transform(xs, ys)
+        ((east, south), (west, north)) = _projectArea(area, srcepsg, dstepsg)
+        self._bounds = [ctypes.c_float(v) for v in (east, south, west, north)]
+
+        # every point carries a weight for heatmap.c, negated in the copy that
+        # takes the points leaving the window back out
+        n = len(order)
+        self._entering = array.array('f', bytes(12 * n))
+        self._entering[0::3] = array.array('f', xs)
+        self._entering[1::3] = array.array('f', ys)
+        if weighted:
+            self._entering[2::3] = array.array('f', [points[i*inc+3] for i in order])
+        else:
+            self._entering[2::3] = array.array('f', [1.0]) * n
+        self._leaving = array.array('f', self._entering)
+        self._leaving[2::3] = array.array('f', [-w for w in self._entering[2::3]])
+
+        self.start = self._times[0] if start is None else start
+        self.end = self._times[-1] if end is None else end
+
+    def times(self):
+        """
+        Returns the start time of every frame, the last frame being the first to
+        cover end.
+        """
+        count = 1
+        if self.end - self.start >= self.window:
+            count = int(math.floor((self.end - self.start - self.window) / self.step)) + 2
+        return [self.start + k * self.step for k in range(count)]
+
+    def _add(self, grid, points, first, last):
+        """ stamps points first to last (of the time sorted ones) into grid """
+        if last <= first:
+            return
+        arrPoints = (ctypes.c_float * ((last - first) * 3)).from_buffer(points, first * 12)
+        self._hm._stamp(grid, arrPoints, self.dotsize, 1, self._bounds)
+
+    def frames(self, scheme="classic", opacity=128, normalize='linear', percentile=99.0,
+               saturation=5.0, _stacklevel=3):
+        """
+        Generator of the frames as (start time, HeatmapResult), rendered one at a
+        time as they are asked for.  scheme, opacity, normalize, percentile and
+        saturation are as for Heatmap.heatmap(), normalizing each frame on its own.
+        The results carry the area but not the points.
+        """
+        self._hm._checkScheme(scheme)
+        self._hm._checkNormalize(normalize, saturation)
+
+        grid = self._hm._densityGrid(self.size, 'additive', 1, self.area, self.srcepsg,
+                                     self.threads, self.kernel, self.dotsize)
+        grid.dstepsg = self.dstepsg
+        rebuild = max(int(math.ceil(float(self.window) / self.step)), 1)
+        # the time sorted points first to last are in the grid
+        (first, last) = (0, 0)
+        for (k, t0) in enumerate(self.times()):
+            newFirst = bisect.bisect_left(self._times, t0)
+            newLast = bisect.bisect_left(self._times, t0 + self.window)
+            if k % rebuild == 0 or newFirst >= last:
+                ctypes.memset(grid.data, 0, ctypes.sizeof(grid.data))
+                (first, last) = (newFirst, newFirst)
+            self._add(grid, self._entering, max(last, newFirst), newLast)
+            self._add(grid, self._leaving, first, min(newFirst, last))
+            (first, last) = (newFirst, newLast)
+            # warnings go to whatever is iterating over the frames
+            yield (t0, self._hm.colorize(grid, scheme, opacity, normalize, percentile,
+                                         saturation=saturation, _stacklevel=_stacklevel))
+
+    def save(self, path, scheme="classic", opacity=128, normalize='linear', percentile=99.0,
+             duration=100, loop=0, saturation=5.0):
+        """
+        Renders every frame into one animated image, a GIF when path ends in .gif
+        and an animated PNG otherwise.  Returns the number of frames.
+
+        duration -> time each frame is shown, in milliseconds
+        loop     -> times the animation repeats, 0 for ever
+        """
+        imgs = []
+        for (t0, result) in self.frames(scheme, opacity, normalize, percentile, saturation, 4):
+            imgs.append(result.img)
+        if path.lower().endswith('.gif'):
+            # frames are replaced, not drawn over the one before
+            imgs[0].save(path, 'GIF', save_all=True, append_images=imgs[1:],
+                         duration=duration, loop=loop, disposal=2)
+        else:
+            imgs[0].save(path, 'PNG', save_all=True, append_images=imgs[1:],
+                         duration=duration, loop=loop)
+        return len(imgs)
+
+    def saveFrames(self, directory, scheme="classic", opacity=128, normalize='linear',
+                   percentile=99.0, saturation=5.0):
+        """
+        Renders every frame as directory/00000.png, 00001.png...  Returns the
+        number of frames.
+        """
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        for (k, (t0, result)) in enumerate(self.frames(scheme, opacity, normalize, percentile,
+                                                       saturation, 4)):
+            result.img.save(os.path.join(directory, "%05d.png" % k))
+            count += 1
+        return count
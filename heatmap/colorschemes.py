@@ -1,1286 +1,222 @@
-""" color scheme source data """
+""" color scheme source data
 
-schemes = {'classic': [(255, 237, 237),
-             (255, 224, 224),
-             (255, 209, 209),
-             (255, 193, 193),
-             (255, 176, 176),
-             (255, 159, 159),
-             (255, 142, 142),
-             (255, 126, 126),
-             (255, 110, 110),
-             (255, 94, 94),
-             (255, 81, 81),
-             (255, 67, 67),
-             (255, 56, 56),
-             (255, 46, 46),
-             (255, 37, 37),
-             (255, 29, 29),
-             (255, 23, 23),
-             (255, 18, 18),
-             (255, 14, 14),
-             (255, 11, 11),
-             (255, 8, 8),
-             (255, 6, 6),
-             (255, 5, 5),
-             (255, 3, 3),
-             (255, 2, 2),
-             (255, 2, 2),
-             (255, 1, 1),
-             (255, 1, 1),
-             (255, 0, 0),
-             (255, 0, 0),
-             (255, 0, 0),
-             (255, 0, 0),
-             (255, 0, 0),
-             (255, 0, 0),
-             (255, 0, 0),
-             (255, 0, 0),
-             (255, 1, 0),
-             (255, 4, 0),
-             (255, 6, 0),
-             (255, 10, 0),
-             (255, 14, 0),
-             (255, 18, 0),
-             (255, 22, 0),
-             (255, 26, 0),
-             (255, 31, 0),
-             (255, 36, 0),
-             (255, 41, 0),
-             (255, 45, 0),
-             (255, 51, 0),
-             (255, 57, 0),
-             (255, 62, 0),
-             (255, 68, 0),
-             (255, 74, 0),
-             (255, 81, 0),
-             (255, 86, 0),
-             (255, 93, 0),
-             (255, 99, 0),
-             (255, 105, 0),
-             (255, 111, 0),
-             (255, 118, 0),
-             (255, 124, 0),
-             (255, 131, 0),
-             (255, 137, 0),
-             (255, 144, 0),
-             (255, 150, 0),
-             (255, 156, 0),
-             (255, 163, 0),
-             (255, 169, 0),
-             (255, 175, 0),
-             (255, 181, 0),
-             (255, 187, 0),
-             (255, 192, 0),
-             (255, 198, 0),
-             (255, 203, 0),
-             (255, 208, 0),
-             (255, 213, 0),
-             (255, 218, 0),
-             (255, 222, 0),
-             (255, 227, 0),
-             (255, 232, 0),
-             (255, 235, 0),
-             (255, 238, 0),
-             (255, 242, 0),
-             (255, 245, 0),
-             (255, 247, 0),
-             (255, 250, 0),
-             (255, 251, 0),
-             (253, 252, 0),
-             (250, 252, 1),
-             (248, 252, 2),
-             (244, 252, 2),
-             (241, 252, 3),
-             (237, 252, 3),
-             (233, 252, 3),
-             (229, 252, 4),
-             (225, 252, 4),
-             (220, 252, 5),
-             (216, 252, 5),
-             (211, 252, 6),
-             (206, 252, 7),
-             (201, 252, 7),
-             (197, 252, 8),
-             (191, 251, 8),
-             (185, 249, 9),
-             (180, 247, 9),
-             (174, 246, 10),
-             (169, 244, 11),
-             (164, 242, 11),
-             (158, 240, 12),
-             (151, 238, 13),
-             (146, 236, 14),
-             (140, 233, 14),
-             (134, 231, 15),
-             (128, 228, 16),
-             (122, 226, 17),
-             (116, 223, 18),
-             (110, 221, 19),
-             (105, 218, 20),
-             (99, 216, 21),
-             (93, 214, 22),
-             (88, 211, 23),
-             (82, 209, 24),
-             (76, 207, 25),
-             (71, 204, 26),
-             (66, 202, 28),
-             (60, 200, 30),
-             (55, 198, 31),
-             (50, 196, 33),
-             (45, 194, 34),
-             (40, 191, 35),
-             (36, 190, 37),
-             (31, 188, 39),
-             (27, 187, 40),
-             (23, 185, 43),
-             (19, 184, 44),
-             (15, 183, 46),
-             (12, 182, 48),
-             (9, 181, 51),
-             (6, 181, 53),
-             (3, 180, 55),
-             (1, 180, 57),
-             (0, 180, 60),
-             (0, 180, 62),
-             (0, 180, 65),
-             (0, 181, 68),
-             (0, 182, 70),
-             (0, 182, 74),
-             (0, 183, 77),
-             (0, 184, 80),
-             (0, 184, 84),
-             (0, 186, 88),
-             (0, 187, 92),
-             (0, 188, 95),
-             (0, 190, 99),
-             (0, 191, 104),
-             (0, 193, 108),
-             (0, 194, 112),
-             (0, 196, 116),
-             (0, 198, 120),
-             (0, 200, 125),
-             (0, 201, 129),
-             (0, 203, 134),
-             (0, 205, 138),
-             (0, 207, 143),
-             (0, 209, 147),
-             (0, 211, 151),
-             (0, 213, 156),
-             (0, 215, 160),
-             (0, 216, 165),
-             (0, 219, 171),
-             (0, 222, 178),
-             (0, 224, 184),
-             (0, 227, 190),
-             (0, 229, 197),
-             (0, 231, 203),
-             (0, 233, 209),
-             (0, 234, 214),
-             (0, 234, 220),
-             (0, 234, 225),
-             (0, 234, 230),
-             (0, 234, 234),
-             (0, 234, 238),
-             (0, 234, 242),
-             (0, 234, 246),
-             (0, 234, 248),
-             (0, 234, 251),
-             (0, 234, 254),
-             (0, 234, 255),
-             (0, 232, 255),
-             (0, 228, 255),
-             (0, 224, 255),
-             (0, 219, 255),
-             (0, 214, 254),
-             (0, 208, 252),
-             (0, 202, 250),
-             (0, 195, 247),
-             (0, 188, 244),
-             (0, 180, 240),
-             (0, 173, 236),
-             (0, 164, 232),
-             (0, 156, 228),
-             (0, 147, 222),
-             (0, 139, 218),
-             (0, 130, 213),
-             (0, 122, 208),
-             (0, 117, 205),
-             (0, 112, 203),
-             (0, 107, 199),
-             (0, 99, 196),
-             (0, 93, 193),
-             (0, 86, 189),
-             (0, 78, 184),
-             (0, 71, 180),
-             (0, 65, 175),
-             (0, 58, 171),
-             (0, 52, 167),
-             (0, 46, 162),
-             (0, 40, 157),
-             (0, 35, 152),
-             (0, 30, 147),
-             (0, 26, 142),
-             (0, 22, 136),
-             (0, 18, 131),
-             (0, 15, 126),
-             (0, 12, 120),
-             (0, 9, 115),
-             (1, 8, 110),
-             (1, 6, 106),
-             (1, 5, 101),
-             (2, 4, 97),
-             (3, 4, 92),
-             (4, 5, 89),
-             (5, 5, 85),
-             (6, 6, 82),
-             (7, 7, 79),
-             (8, 8, 77),
-             (10, 10, 77),
-             (12, 12, 77),
-             (14, 14, 76),
-             (16, 16, 74),
-             (19, 19, 73),
-             (21, 21, 72),
-             (24, 24, 71),
-             (26, 26, 69),
-             (29, 29, 70),
-             (32, 32, 69),
-             (35, 35, 68),
-             (37, 37, 67),
-             (40, 40, 67),
-             (42, 42, 65),
-             (44, 44, 65),
-             (46, 46, 64),
-             (48, 48, 63),
-             (49, 50, 62),
-             (51, 51, 61),
-             (53, 52, 61)],
- 'fire': [(255, 255, 255),
-          (255, 255, 253),
-          (255, 255, 250),
-          (255, 255, 247),
-          (255, 255, 244),
-          (255, 255, 241),
-          (255, 255, 238),
-          (255, 255, 234),
-          (255, 255, 231),
-          (255, 255, 227),
-          (255, 255, 223),
-          (255, 255, 219),
-          (255, 255, 214),
-          (255, 255, 211),
-          (255, 255, 206),
-          (255, 255, 202),
-          (255, 255, 197),
-          (255, 255, 192),
-          (255, 255, 187),
-          (255, 255, 183),
-          (255, 255, 178),
-          (255, 255, 172),
-          (255, 255, 167),
-          (255, 255, 163),
-          (255, 255, 157),
-          (255, 255, 152),
-          (255, 255, 147),
-          (255, 255, 142),
-          (255, 255, 136),
-          (255, 255, 132),
-          (255, 255, 126),
-          (255, 255, 121),
-          (255, 255, 116),
-          (255, 255, 111),
-          (255, 255, 106),
-          (255, 255, 102),
-          (255, 255, 97),
-          (255, 255, 91),
-          (255, 255, 87),
-          (255, 255, 82),
-          (255, 255, 78),
-          (255, 255, 74),
-          (255, 255, 70),
-          (255, 255, 65),
-          (255, 255, 61),
-          (255, 255, 57),
-          (255, 255, 53),
-          (255, 255, 50),
-          (255, 255, 46),
-          (255, 255, 43),
-          (255, 255, 39),
-          (255, 255, 38),
-          (255, 255, 34),
-          (255, 255, 31),
-          (255, 255, 29),
-          (255, 255, 26),
-          (255, 255, 25),
-          (255, 254, 23),
-          (255, 251, 22),
-          (255, 250, 22),
-          (255, 247, 23),
-          (255, 245, 23),
-          (255, 242, 24),
-          (255, 239, 24),
-          (255, 236, 25),
-          (255, 232, 25),
-          (255, 229, 26),
-          (255, 226, 26),
-          (255, 222, 27),
-          (255, 218, 27),
-          (255, 215, 28),
-          (255, 210, 28),
-          (255, 207, 29),
-          (255, 203, 29),
-          (255, 199, 30),
-          (255, 194, 30),
-          (255, 190, 31),
-          (255, 186, 31),
-          (255, 182, 32),
-          (255, 176, 32),
-          (255, 172, 33),
-          (255, 168, 34),
-          (255, 163, 34),
-          (255, 159, 35),
-          (255, 154, 35),
-          (255, 150, 36),
-          (255, 145, 36),
-          (255, 141, 37),
-          (255, 136, 37),
-          (255, 132, 38),
-          (255, 128, 39),
-          (255, 124, 39),
-          (255, 119, 40),
-          (255, 115, 40),
-          (255, 111, 41),
-          (255, 107, 41),
-          (255, 103, 42),
-          (255, 99, 42),
-          (255, 95, 43),
-          (255, 92, 44),
-          (255, 89, 44),
-          (255, 85, 45),
-          (255, 81, 45),
-          (255, 79, 46),
-          (255, 76, 47),
-          (255, 72, 47),
-          (255, 70, 48),
-          (255, 67, 48),
-          (255, 65, 49),
-          (255, 63, 50),
-          (255, 60, 50),
-          (255, 59, 51),
-          (255, 57, 51),
-          (255, 55, 52),
-          (255, 55, 53),
-          (255, 53, 53),
-          (253, 54, 54),
-          (253, 54, 54),
-          (251, 55, 55),
-          (250, 56, 56),
-          (248, 56, 56),
-          (247, 57, 57),
-          (246, 57, 57),
-          (244, 58, 58),
-          (242, 59, 59),
-          (240, 59, 59),
-          (239, 60, 60),
-          (238, 61, 61),
-          (235, 61, 61),
-          (234, 62, 62),
-          (232, 62, 62),
-          (229, 63, 63),
-          (228, 64, 64),
-          (226, 64, 64),
-          (224, 65, 65),
-          (222, 66, 66),
-          (219, 66, 66),
-          (218, 67, 67),
-          (216, 67, 67),
-          (213, 68, 68),
-          (211, 69, 69),
-          (209, 69, 69),
-          (207, 70, 70),
-          (205, 71, 71),
-          (203, 71, 71),
-          (200, 72, 72),
-          (199, 73, 73),
-          (196, 73, 73),
-          (194, 74, 74),
-          (192, 74, 74),
-          (190, 75, 75),
-          (188, 76, 76),
-          (186, 76, 76),
-          (183, 77, 77),
-          (181, 78, 78),
-          (179, 78, 78),
-          (177, 79, 79),
-          (175, 80, 80),
-          (173, 80, 80),
-          (170, 81, 81),
-          (169, 82, 82),
-          (166, 82, 82),
-          (165, 83, 83),
-          (162, 83, 83),
-          (160, 84, 84),
-          (158, 85, 85),
-          (156, 85, 85),
-          (154, 86, 86),
-          (153, 87, 87),
-          (150, 87, 87),
-          (149, 88, 88),
-          (147, 89, 89),
-          (146, 90, 90),
-          (144, 91, 91),
-          (142, 92, 92),
-          (142, 94, 94),
-          (141, 95, 95),
-          (140, 96, 96),
-          (139, 98, 98),
-          (138, 99, 99),
-          (136, 100, 100),
-          (135, 101, 101),
-          (135, 103, 103),
-          (134, 104, 104),
-          (133, 105, 105),
-          (133, 107, 107),
-          (132, 108, 108),
-          (131, 109, 109),
-          (132, 111, 111),
-          (131, 112, 112),
-          (130, 113, 113),
-          (130, 114, 114),
-          (130, 116, 116),
-          (130, 117, 117),
-          (130, 118, 118),
-          (129, 119, 119),
-          (130, 121, 121),
-          (130, 122, 122),
-          (130, 123, 123),
-          (130, 124, 124),
-          (131, 126, 126),
-          (131, 127, 127),
-          (130, 128, 128),
-          (131, 129, 129),
-          (132, 131, 131),
-          (132, 132, 132),
-          (133, 133, 133),
-          (134, 134, 134),
-          (135, 135, 135),
-          (136, 136, 136),
-          (138, 138, 138),
-          (139, 139, 139),
-          (140, 140, 140),
-          (141, 141, 141),
-          (142, 142, 142),
-          (143, 143, 143),
-          (144, 144, 144),
-          (145, 145, 145),
-          (147, 147, 147),
-          (148, 148, 148),
-          (149, 149, 149),
-          (150, 150, 150),
-          (151, 151, 151),
-          (152, 152, 152),
-          (153, 153, 153),
-          (154, 154, 154),
-          (155, 155, 155),
-          (156, 156, 156),
-          (157, 157, 157),
-          (158, 158, 158),
-          (159, 159, 159),
-          (160, 160, 160),
-          (160, 160, 160),
-          (161, 161, 161),
-          (162, 162, 162),
-          (163, 163, 163),
-          (164, 164, 164),
-          (165, 165, 165),
-          (166, 166, 166),
-          (167, 167, 167),
-          (167, 167, 167),
-          (168, 168, 168),
-          (169, 169, 169),
-          (170, 170, 170),
-          (170, 170, 170),
-          (171, 171, 171),
-          (172, 172, 172),
-          (173, 173, 173),
-          (173, 173, 173),
-          (174, 174, 174),
-          (175, 175, 175),
-          (175, 175, 175),
-          (176, 176, 176),
-          (176, 176, 176),
-          (177, 177, 177),
-          (177, 177, 177)],
- 'omg': [(255, 255, 255),
-         (255, 254, 254),
-         (255, 253, 253),
-         (255, 251, 251),
-         (255, 250, 250),
-         (255, 249, 249),
-         (255, 247, 247),
-         (255, 246, 246),
-         (255, 244, 244),
-         (255, 242, 242),
-         (255, 241, 241),
-         (255, 239, 239),
-         (255, 237, 237),
-         (255, 235, 235),
-         (255, 233, 233),
-         (255, 231, 231),
-         (255, 229, 229),
-         (255, 227, 227),
-         (255, 226, 226),
-         (255, 224, 224),
-         (255, 222, 222),
-         (255, 220, 220),
-         (255, 217, 217),
-         (255, 215, 215),
-         (255, 213, 213),
-         (255, 210, 210),
-         (255, 208, 208),
-         (255, 206, 206),
-         (255, 204, 204),
-         (255, 202, 202),
-         (255, 199, 199),
-         (255, 197, 197),
-         (255, 194, 194),
-         (255, 192, 192),
-         (255, 189, 189),
-         (255, 188, 188),
-         (255, 185, 185),
-         (255, 183, 183),
-         (255, 180, 180),
-         (255, 178, 178),
-         (255, 176, 176),
-         (255, 173, 173),
-         (255, 171, 171),
-         (255, 169, 169),
-         (255, 167, 167),
-         (255, 164, 164),
-         (255, 162, 162),
-         (255, 160, 160),
-         (255, 158, 158),
-         (255, 155, 155),
-         (255, 153, 153),
-         (255, 151, 151),
-         (255, 149, 149),
-         (255, 147, 147),
-         (255, 145, 145),
-         (255, 143, 143),
-         (255, 141, 141),
-         (255, 139, 139),
-         (255, 137, 137),
-         (255, 136, 136),
-         (255, 134, 134),
-         (255, 132, 132),
-         (255, 131, 131),
-         (255, 129, 129),
-         (255, 128, 128),
-         (255, 127, 127),
-         (255, 127, 127),
-         (255, 126, 126),
-         (255, 125, 125),
-         (255, 125, 125),
-         (255, 124, 124),
-         (255, 123, 122),
-         (255, 123, 122),
-         (255, 122, 121),
-         (255, 122, 121),
-         (255, 121, 120),
-         (255, 120, 119),
-         (255, 119, 118),
-         (255, 119, 118),
-         (255, 118, 116),
-         (255, 117, 116),
-         (255, 117, 115),
-         (255, 115, 114),
-         (255, 115, 114),
-         (255, 114, 113),
-         (255, 114, 112),
-         (255, 113, 111),
-         (255, 113, 111),
-         (255, 112, 110),
-         (255, 111, 108),
-         (255, 111, 108),
-         (255, 110, 107),
-         (255, 110, 107),
-         (255, 109, 105),
-         (255, 109, 105),
-         (255, 108, 104),
-         (255, 107, 104),
-         (255, 107, 102),
-         (255, 106, 102),
-         (255, 106, 101),
-         (255, 105, 101),
-         (255, 104, 99),
-         (255, 104, 99),
-         (255, 103, 98),
-         (255, 103, 98),
-         (255, 102, 97),
-         (255, 102, 96),
-         (255, 101, 96),
-         (255, 101, 96),
-         (255, 100, 94),
-         (255, 100, 94),
-         (255, 99, 93),
-         (255, 99, 92),
-         (255, 98, 91),
-         (255, 98, 91),
-         (255, 97, 90),
-         (255, 97, 89),
-         (255, 96, 89),
-         (255, 96, 89),
-         (255, 95, 88),
-         (255, 95, 88),
-         (255, 94, 86),
-         (255, 93, 86),
-         (255, 93, 85),
-         (255, 93, 85),
-         (255, 92, 85),
-         (255, 92, 84),
-         (255, 91, 83),
-         (255, 91, 83),
-         (255, 90, 82),
-         (255, 90, 82),
-         (255, 89, 81),
-         (255, 89, 82),
-         (255, 89, 80),
-         (255, 89, 80),
-         (255, 89, 79),
-         (255, 89, 79),
-         (255, 88, 79),
-         (255, 88, 79),
-         (255, 87, 78),
-         (255, 87, 78),
-         (255, 87, 78),
-         (255, 87, 77),
-         (255, 87, 77),
-         (255, 86, 77),
-         (255, 86, 77),
-         (255, 85, 76),
-         (255, 85, 76),
-         (255, 85, 75),
-         (255, 85, 76),
-         (255, 85, 75),
-         (255, 85, 76),
-         (255, 84, 75),
-         (255, 84, 75),
-         (255, 84, 75),
-         (255, 84, 75),
-         (255, 85, 75),
-         (255, 84, 75),
-         (255, 84, 75),
-         (255, 83, 74),
-         (255, 83, 75),
-         (255, 83, 75),
-         (255, 84, 75),
-         (255, 83, 75),
-         (255, 83, 75),
-         (255, 83, 75),
-         (255, 83, 75),
-         (255, 83, 76),
-         (255, 83, 76),
-         (255, 83, 76),
-         (255, 83, 76),
-         (255, 83, 76),
-         (255, 83, 76),
-         (255, 83, 76),
-         (255, 83, 76),
-         (255, 83, 77),
-         (255, 84, 78),
-         (255, 83, 78),
-         (255, 84, 79),
-         (255, 84, 78),
-         (255, 84, 79),
-         (255, 83, 79),
-         (255, 84, 80),
-         (255, 83, 80),
-         (255, 84, 81),
-         (255, 85, 82),
-         (255, 85, 82),
-         (255, 85, 83),
-         (255, 85, 83),
-         (255, 85, 84),
-         (255, 85, 84),
-         (255, 86, 85),
-         (255, 86, 85),
-         (255, 87, 87),
-         (254, 89, 89),
-         (254, 91, 92),
-         (253, 92, 93),
-         (252, 94, 96),
-         (251, 96, 98),
-         (251, 97, 100),
-         (249, 99, 103),
-         (249, 100, 105),
-         (248, 102, 108),
-         (247, 104, 111),
-         (246, 105, 113),
-         (245, 107, 116),
-         (244, 109, 119),
-         (243, 110, 122),
-         (242, 112, 125),
-         (241, 113, 127),
-         (240, 115, 130),
-         (239, 117, 134),
-         (238, 118, 136),
-         (237, 120, 140),
-         (236, 121, 142),
-         (235, 123, 145),
-         (234, 124, 148),
-         (233, 126, 151),
-         (232, 127, 154),
-         (232, 129, 157),
-         (230, 130, 159),
-         (230, 132, 162),
-         (229, 133, 165),
-         (228, 135, 168),
-         (227, 136, 170),
-         (227, 138, 173),
-         (226, 139, 176),
-         (225, 140, 178),
-         (224, 142, 181),
-         (223, 143, 183),
-         (223, 144, 185),
-         (223, 146, 188),
-         (222, 147, 190),
-         (221, 148, 192),
-         (221, 150, 195),
-         (220, 151, 197),
-         (219, 152, 199),
-         (219, 153, 201),
-         (219, 154, 202),
-         (219, 156, 205),
-         (218, 157, 207),
-         (217, 158, 208),
-         (217, 159, 210),
-         (217, 160, 211),
-         (217, 161, 213),
-         (216, 162, 214),
-         (216, 163, 216),
-         (216, 164, 217),
-         (215, 165, 218),
-         (216, 166, 219),
-         (215, 166, 220),
-         (215, 167, 222),
-         (215, 168, 223),
-         (215, 169, 223),
-         (215, 170, 224),
-         (215, 170, 225)],
- 'pbj': [(41, 10, 89),
-         (41, 10, 89),
-         (42, 10, 89),
-         (42, 10, 89),
-         (42, 10, 88),
-         (43, 10, 88),
-         (43, 9, 88),
-         (43, 9, 88),
-         (44, 9, 88),
-         (44, 9, 88),
-         (45, 10, 89),
-         (46, 10, 88),
-         (46, 9, 88),
-         (47, 9, 88),
-         (47, 9, 88),
-         (47, 9, 88),
-         (48, 8, 88),
-         (48, 8, 87),
-         (49, 8, 87),
-         (49, 8, 87),
-         (49, 7, 87),
-         (50, 7, 87),
-         (50, 7, 87),
-         (51, 7, 86),
-         (51, 6, 86),
-         (53, 7, 86),
-         (53, 7, 86),
-         (54, 7, 86),
-         (54, 6, 85),
-         (55, 6, 85),
-         (55, 6, 85),
-         (56, 5, 85),
-         (56, 5, 85),
-         (57, 5, 84),
-         (57, 5, 84),
-         (58, 4, 84),
-         (59, 4, 84),
-         (59, 5, 84),
-         (60, 4, 84),
-         (60, 4, 84),
-         (61, 4, 84),
-         (61, 4, 83),
-         (62, 3, 83),
-         (63, 3, 83),
-         (63, 3, 83),
-         (64, 3, 82),
-         (64, 3, 82),
-         (65, 3, 82),
-         (66, 3, 82),
-         (67, 4, 82),
-         (68, 4, 82),
-         (69, 4, 82),
-         (69, 4, 81),
-         (70, 4, 81),
-         (71, 4, 81),
-         (71, 4, 80),
-         (72, 4, 80),
-         (73, 4, 80),
-         (73, 4, 79),
-         (75, 5, 80),
-         (76, 5, 80),
-         (77, 5, 79),
-         (77, 5, 79),
-         (78, 5, 79),
-         (79, 5, 78),
-         (80, 5, 78),
-         (80, 5, 78),
-         (80, 5, 77),
-         (81, 5, 77),
-         (83, 6, 76),
-         (83, 6, 76),
-         (84, 6, 76),
-         (85, 6, 75),
-         (86, 6, 75),
-         (87, 6, 74),
-         (88, 6, 74),
-         (88, 6, 73),
-         (89, 6, 73),
-         (91, 7, 73),
-         (92, 7, 73),
-         (93, 7, 72),
-         (94, 7, 72),
-         (94, 7, 71),
-         (95, 7, 71),
-         (96, 7, 70),
-         (96, 7, 70),
-         (97, 7, 69),
-         (99, 9, 70),
-         (100, 9, 69),
-         (101, 10, 69),
-         (102, 10, 68),
-         (103, 11, 67),
-         (104, 11, 67),
-         (105, 12, 66),
-         (106, 13, 66),
-         (107, 14, 66),
-         (108, 15, 65),
-         (109, 16, 64),
-         (110, 16, 64),
-         (111, 17, 63),
-         (112, 18, 62),
-         (113, 18, 61),
-         (114, 19, 61),
-         (115, 20, 60),
-         (118, 22, 60),
-         (119, 22, 59),
-         (120, 22, 58),
-         (120, 23, 58),
-         (121, 24, 57),
-         (122, 25, 56),
-         (124, 26, 55),
-         (125, 27, 54),
-         (127, 29, 54),
-         (128, 30, 54),
-         (130, 31, 53),
-         (131, 32, 52),
-         (132, 33, 51),
-         (133, 34, 50),
-         (134, 35, 49),
-         (135, 36, 48),
-         (137, 38, 48),
-         (138, 39, 47),
-         (140, 40, 46),
-         (141, 41, 46),
-         (142, 42, 45),
-         (143, 42, 44),
-         (144, 43, 43),
-         (145, 44, 42),
-         (146, 45, 42),
-         (149, 47, 41),
-         (150, 48, 41),
-         (151, 49, 40),
-         (152, 50, 39),
-         (153, 51, 38),
-         (154, 52, 38),
-         (155, 53, 37),
-         (157, 55, 36),
-         (159, 57, 36),
-         (160, 57, 35),
-         (160, 58, 34),
-         (162, 59, 33),
-         (163, 60, 33),
-         (164, 61, 32),
-         (165, 62, 31),
-         (167, 63, 30),
-         (168, 65, 30),
-         (169, 66, 29),
-         (170, 67, 29),
-         (172, 68, 28),
-         (173, 69, 27),
-         (174, 70, 26),
-         (175, 71, 26),
-         (176, 71, 25),
-         (178, 73, 25),
-         (179, 74, 24),
-         (180, 75, 24),
-         (181, 76, 23),
-         (182, 77, 23),
-         (183, 78, 23),
-         (184, 79, 22),
-         (186, 80, 22),
-         (187, 81, 21),
-         (188, 82, 21),
-         (189, 83, 21),
-         (190, 83, 20),
-         (191, 84, 20),
-         (192, 85, 19),
-         (192, 86, 19),
-         (193, 87, 18),
-         (194, 87, 18),
-         (196, 89, 18),
-         (196, 90, 18),
-         (197, 90, 18),
-         (198, 90, 18),
-         (199, 91, 18),
-         (200, 92, 18),
-         (201, 93, 18),
-         (202, 93, 18),
-         (203, 94, 18),
-         (204, 96, 19),
-         (204, 96, 19),
-         (205, 97, 19),
-         (206, 98, 19),
-         (207, 99, 19),
-         (208, 99, 19),
-         (209, 100, 19),
-         (210, 100, 19),
-         (211, 100, 19),
-         (212, 102, 20),
-         (213, 103, 20),
-         (214, 103, 20),
-         (214, 104, 20),
-         (215, 105, 20),
-         (215, 105, 20),
-         (216, 106, 20),
-         (217, 107, 20),
-         (218, 107, 20),
-         (219, 108, 20),
-         (220, 109, 21),
-         (221, 109, 21),
-         (222, 110, 21),
-         (222, 111, 21),
-         (223, 111, 21),
-         (224, 112, 21),
-         (225, 113, 21),
-         (226, 113, 21),
-         (227, 114, 21),
-         (227, 114, 21),
-         (228, 115, 22),
-         (229, 116, 22),
-         (229, 116, 22),
-         (230, 117, 22),
-         (231, 117, 22),
-         (231, 118, 22),
-         (232, 119, 22),
-         (233, 119, 22),
-         (234, 120, 22),
-         (234, 120, 22),
-         (235, 121, 22),
-         (236, 121, 22),
-         (237, 122, 23),
-         (237, 122, 23),
-         (238, 123, 23),
-         (239, 124, 23),
-         (239, 124, 23),
-         (240, 125, 23),
-         (240, 125, 23),
-         (241, 126, 23),
-         (241, 126, 23),
-         (242, 127, 23),
-         (243, 127, 23),
-         (243, 128, 23),
-         (244, 128, 24),
-         (244, 128, 24),
-         (245, 129, 24),
-         (246, 129, 24),
-         (246, 130, 24),
-         (247, 130, 24),
-         (247, 131, 24),
-         (248, 131, 24),
-         (249, 131, 24),
-         (249, 132, 24),
-         (250, 132, 24),
-         (250, 133, 24),
-         (250, 133, 24),
-         (250, 133, 24),
-         (251, 134, 24),
-         (251, 134, 25),
-         (252, 135, 25),
-         (252, 135, 25),
-         (253, 135, 25),
-         (253, 136, 25),
-         (253, 136, 25),
-         (254, 136, 25),
-         (254, 136, 25),
-         (255, 137, 25)],
- 'pgaitch': [(255, 254, 165),
-             (255, 254, 164),
-             (255, 253, 163),
-             (255, 253, 162),
-             (255, 253, 161),
-             (255, 252, 160),
-             (255, 252, 159),
-             (255, 252, 157),
-             (255, 251, 156),
-             (255, 251, 155),
-             (255, 251, 153),
-             (255, 250, 152),
-             (255, 250, 150),
-             (255, 250, 149),
-             (255, 249, 148),
-             (255, 249, 146),
-             (255, 249, 145),
-             (255, 248, 143),
-             (255, 248, 141),
-             (255, 248, 139),
-             (255, 247, 138),
-             (255, 247, 136),
-             (255, 246, 134),
-             (255, 246, 132),
-             (255, 246, 130),
-             (255, 245, 129),
-             (255, 245, 127),
-             (255, 245, 125),
-             (255, 244, 123),
-             (255, 244, 121),
-             (255, 243, 119),
-             (255, 243, 117),
-             (255, 242, 114),
-             (255, 242, 112),
-             (255, 241, 111),
-             (255, 241, 109),
-             (255, 240, 107),
-             (255, 240, 105),
-             (255, 239, 102),
-             (255, 239, 100),
-             (255, 238, 99),
-             (255, 238, 97),
-             (255, 237, 95),
-             (255, 237, 92),
-             (255, 236, 90),
-             (255, 237, 89),
-             (255, 236, 87),
-             (255, 235, 84),
-             (255, 235, 82),
-             (255, 234, 80),
-             (255, 233, 79),
-             (255, 233, 77),
-             (255, 232, 74),
-             (255, 231, 72),
-             (255, 230, 70),
-             (255, 230, 69),
-             (255, 229, 67),
-             (255, 228, 65),
-             (255, 227, 63),
-             (255, 226, 61),
-             (255, 225, 60),
-             (255, 225, 58),
-             (255, 224, 56),
-             (255, 223, 54),
-             (255, 222, 52),
-             (255, 222, 51),
-             (255, 221, 49),
-             (255, 220, 47),
-             (255, 219, 46),
-             (255, 218, 44),
-             (255, 216, 43),
-             (255, 215, 42),
-             (255, 214, 41),
-             (255, 213, 39),
-             (255, 212, 39),
-             (255, 211, 37),
-             (255, 209, 36),
-             (255, 208, 34),
-             (255, 208, 33),
-             (255, 206, 33),
-             (255, 205, 32),
-             (255, 204, 30),
-             (255, 202, 29),
-             (255, 201, 29),
-             (255, 199, 28),
-             (254, 199, 28),
-             (254, 199, 27),
-             (253, 198, 27),
-             (252, 197, 27),
-             (251, 196, 27),
-             (250, 195, 26),
-             (249, 195, 26),
-             (248, 194, 26),
-             (248, 193, 26),
-             (247, 192, 26),
-             (246, 192, 25),
-             (245, 191, 26),
-             (244, 190, 26),
-             (243, 189, 25),
-             (241, 188, 25),
-             (240, 187, 25),
-             (239, 187, 25),
-             (238, 186, 25),
-             (236, 185, 25),
-             (236, 184, 26),
-             (235, 183, 26),
-             (233, 182, 25),
-             (232, 181, 25),
-             (230, 181, 26),
-             (229, 180, 26),
-             (228, 179, 25),
-             (227, 178, 25),
-             (226, 177, 26),
-             (224, 176, 26),
-             (222, 176, 25),
-             (221, 175, 25),
-             (220, 173, 26),
-             (219, 172, 26),
-             (217, 171, 25),
-             (215, 170, 25),
-             (214, 170, 26),
-             (212, 169, 26),
-             (211, 167, 25),
-             (209, 166, 25),
-             (208, 166, 26),
-             (206, 165, 26),
-             (204, 163, 26),
-             (203, 162, 26),
-             (202, 161, 25),
-             (200, 161, 26),
-             (198, 159, 26),
-             (197, 158, 26),
-             (195, 157, 26),
-             (193, 157, 27),
-             (192, 155, 27),
-             (190, 154, 27),
-             (189, 153, 27),
-             (187, 152, 28),
-             (186, 151, 28),
-             (184, 150, 28),
-             (182, 149, 28),
-             (181, 148, 29),
-             (179, 147, 29),
-             (177, 146, 29),
-             (175, 144, 29),
-             (174, 144, 30),
-             (172, 142, 30),
-             (170, 141, 30),
-             (169, 140, 30),
-             (167, 139, 31),
-             (165, 138, 31),
-             (164, 137, 31),
-             (162, 136, 31),
-             (161, 135, 32),
-             (159, 134, 32),
-             (157, 133, 32),
-             (154, 132, 32),
-             (153, 131, 33),
-             (151, 130, 33),
-             (150, 129, 33),
-             (148, 127, 33),
-             (147, 127, 34),
-             (145, 126, 34),
-             (143, 124, 34),
-             (141, 123, 34),
-             (140, 122, 35),
-             (139, 121, 35),
-             (137, 120, 35),
-             (135, 119, 35),
-             (134, 118, 36),
-             (132, 117, 36),
-             (130, 116, 36),
-             (129, 115, 36),
-             (127, 113, 36),
-             (126, 113, 37),
-             (124, 112, 37),
-             (122, 111, 37),
-             (121, 110, 37),
-             (120, 109, 38),
-             (118, 108, 38),
-             (116, 107, 38),
-             (115, 105, 38),
-             (113, 104, 38),
-             (112, 104, 39),
-             (110, 103, 39),
-             (108, 102, 39),
-             (107, 101, 39),
-             (106, 100, 40),
-             (104, 99, 40),
-             (102, 98, 40),
-             (101, 96, 40),
-             (99, 96, 40),
-             (99, 96, 41),
-             (97, 94, 41),
-             (96, 93, 41),
-             (94, 92, 41),
-             (92, 91, 41),
-             (92, 90, 42),
-             (90, 90, 42),
-             (89, 89, 42),
-             (87, 87, 42),
-             (86, 86, 42),
-             (85, 86, 43),
-             (84, 85, 43),
-             (83, 84, 43),
-             (81, 83, 43),
-             (80, 82, 43),
-             (80, 82, 44),
-             (78, 80, 44),
-             (77, 80, 44),
-             (75, 79, 44),
-             (75, 78, 44),
-             (74, 78, 45),
-             (73, 76, 45),
-             (71, 75, 45),
-             (71, 75, 45),
-             (70, 74, 45),
-             (69, 74, 46),
-             (68, 73, 46),
-             (67, 72, 46),
-             (66, 71, 46),
-             (65, 71, 46),
-             (64, 69, 46),
-             (64, 69, 47),
-             (63, 68, 47),
-             (62, 67, 47),
-             (61, 67, 47),
-             (60, 66, 47),
-             (59, 65, 47),
-             (59, 65, 48),
-             (59, 64, 48),
-             (58, 63, 48),
-             (57, 63, 48),
-             (56, 62, 48),
-             (56, 62, 48),
-             (55, 61, 48),
-             (55, 61, 49),
-             (55, 60, 49),
-             (55, 60, 49),
-             (54, 59, 49),
-             (53, 58, 49),
-             (53, 57, 49),
-             (52, 57, 49),
-             (52, 57, 50),
-             (52, 56, 50),
-             (52, 56, 50),
-             (52, 56, 50),
-             (52, 55, 50),
-             (51, 54, 50),
-             (51, 53, 50),
-             (51, 53, 50),
-             (51, 52, 50),
-             (51, 53, 51),
-             (51, 53, 51),
-             (51, 52, 51),
-             (51, 52, 51)]}
+Every scheme is 768 bytes, the r, g, b of each of the 256 density levels from the
+densest (0) to the faintest (255).  Levels above 252 are drawn transparent.
+Schemes besides the built-in ones can be added at runtime with register_scheme(),
+register_gradient() or register_image().
+"""
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+# the built-in schemes, hex decoded on first use
+_builtin = {
+    'classic' : (
+        'ffededffe0e0ffd1d1ffc1c1ffb0b0ff9f9fff8e8eff7e7eff6e6eff5e5eff5151ff4343'
+        'ff3838ff2e2eff2525ff1d1dff1717ff1212ff0e0eff0b0bff0808ff0606ff0505ff0303'
+        'ff0202ff0202ff0101ff0101ff0000ff0000ff0000ff0000ff0000ff0000ff0000ff0000'
+        'ff0100ff0400ff0600ff0a00ff0e00ff1200ff1600ff1a00ff1f00ff2400ff2900ff2d00'
+        'ff3300ff3900ff3e00ff4400ff4a00ff5100ff5600ff5d00ff6300ff6900ff6f00ff7600'
+        'ff7c00ff8300ff8900ff9000ff9600ff9c00ffa300ffa900ffaf00ffb500ffbb00ffc000'
+        'ffc600ffcb00ffd000ffd500ffda00ffde00ffe300ffe800ffeb00ffee00fff200fff500'
+        'fff700fffa00fffb00fdfc00fafc01f8fc02f4fc02f1fc03edfc03e9fc03e5fc04e1fc04'
+        'dcfc05d8fc05d3fc06cefc07c9fc07c5fc08bffb08b9f909b4f709aef60aa9f40ba4f20b'
+        '9ef00c97ee0d92ec0e8ce90e86e70f80e4107ae21174df126edd1369da1463d8155dd616'
+        '58d31752d1184ccf1947cc1a42ca1c3cc81e37c61f32c4212dc22228bf2324be251fbc27'
+        '1bbb2817b92b13b82c0fb72e0cb63009b53306b53503b43701b43900b43c00b43e00b441'
+        '00b54400b64600b64a00b74d00b85000b85400ba5800bb5c00bc5f00be6300bf6800c16c'
+        '00c27000c47400c67800c87d00c98100cb8600cd8a00cf8f00d19300d39700d59c00d7a0'
+        '00d8a500dbab00deb200e0b800e3be00e5c500e7cb00e9d100ead600eadc00eae100eae6'
+        '00eaea00eaee00eaf200eaf600eaf800eafb00eafe00eaff00e8ff00e4ff00e0ff00dbff'
+        '00d6fe00d0fc00cafa00c3f700bcf400b4f000adec00a4e8009ce40093de008bda0082d5'
+        '007ad00075cd0070cb006bc70063c4005dc10056bd004eb80047b40041af003aab0034a7'
+        '002ea200289d002398001e93001a8e001688001283000f7e000c7800097301086e01066a'
+        '01056502046103045c04055905055506065207074f08084d0a0a4d0c0c4d0e0e4c10104a'
+        '1313491515481818471a1a451d1d462020452323442525432828432a2a412c2c412e2e40'
+        '30303f31323e33333d35343d'),
+    'fire' : (
+        'fffffffffffdfffffafffff7fffff4fffff1ffffeeffffeaffffe7ffffe3ffffdfffffdb'
+        'ffffd6ffffd3ffffceffffcaffffc5ffffc0ffffbbffffb7ffffb2ffffacffffa7ffffa3'
+        'ffff9dffff98ffff93ffff8effff88ffff84ffff7effff79ffff74ffff6fffff6affff66'
+        'ffff61ffff5bffff57ffff52ffff4effff4affff46ffff41ffff3dffff39ffff35ffff32'
+        'ffff2effff2bffff27ffff26ffff22ffff1fffff1dffff1affff19fffe17fffb16fffa16'
+        'fff717fff517fff218ffef18ffec19ffe819ffe51affe21affde1bffda1bffd71cffd21c'
+        'ffcf1dffcb1dffc71effc21effbe1fffba1fffb620ffb020ffac21ffa822ffa322ff9f23'
+        'ff9a23ff9624ff9124ff8d25ff8825ff8426ff8027ff7c27ff7728ff7328ff6f29ff6b29'
+        'ff672aff632aff5f2bff5c2cff592cff552dff512dff4f2eff4c2fff482fff4630ff4330'
+        'ff4131ff3f32ff3c32ff3b33ff3933ff3734ff3735ff3535fd3636fd3636fb3737fa3838'
+        'f83838f73939f63939f43a3af23b3bf03b3bef3c3cee3d3deb3d3dea3e3ee83e3ee53f3f'
+        'e44040e24040e04141de4242db4242da4343d84343d54444d34545d14545cf4646cd4747'
+        'cb4747c84848c74949c44949c24a4ac04a4abe4b4bbc4c4cba4c4cb74d4db54e4eb34e4e'
+        'b14f4faf5050ad5050aa5151a95252a65252a55353a25353a054549e55559c55559a5656'
+        '995757965757955858935959925a5a905b5b8e5c5c8e5e5e8d5f5f8c60608b62628a6363'
+        '886464876565876767866868856969856b6b846c6c836d6d846f6f837070827171827272'
+        '827474827575827676817777827979827a7a827b7b827c7c837e7e837f7f828080838181'
+        '8483838484848585858686868787878888888a8a8a8b8b8b8c8c8c8d8d8d8e8e8e8f8f8f'
+        '9090909191919393939494949595959696969797979898989999999a9a9a9b9b9b9c9c9c'
+        '9d9d9d9e9e9e9f9f9fa0a0a0a0a0a0a1a1a1a2a2a2a3a3a3a4a4a4a5a5a5a6a6a6a7a7a7'
+        'a7a7a7a8a8a8a9a9a9aaaaaaaaaaaaabababacacacadadadadadadaeaeaeafafafafafaf'
+        'b0b0b0b0b0b0b1b1b1b1b1b1'),
+    'omg' : (
+        'fffffffffefefffdfdfffbfbfffafafff9f9fff7f7fff6f6fff4f4fff2f2fff1f1ffefef'
+        'ffededffebebffe9e9ffe7e7ffe5e5ffe3e3ffe2e2ffe0e0ffdedeffdcdcffd9d9ffd7d7'
+        'ffd5d5ffd2d2ffd0d0ffceceffccccffcacaffc7c7ffc5c5ffc2c2ffc0c0ffbdbdffbcbc'
+        'ffb9b9ffb7b7ffb4b4ffb2b2ffb0b0ffadadffababffa9a9ffa7a7ffa4a4ffa2a2ffa0a0'
+        'ff9e9eff9b9bff9999ff9797ff9595ff9393ff9191ff8f8fff8d8dff8b8bff8989ff8888'
+        'ff8686ff8484ff8383ff8181ff8080ff7f7fff7f7fff7e7eff7d7dff7d7dff7c7cff7b7a'
+        'ff7b7aff7a79ff7a79ff7978ff7877ff7776ff7776ff7674ff7574ff7573ff7372ff7372'
+        'ff7271ff7270ff716fff716fff706eff6f6cff6f6cff6e6bff6e6bff6d69ff6d69ff6c68'
+        'ff6b68ff6b66ff6a66ff6a65ff6965ff6863ff6863ff6762ff6762ff6661ff6660ff6560'
+        'ff6560ff645eff645eff635dff635cff625bff625bff615aff6159ff6059ff6059ff5f58'
+        'ff5f58ff5e56ff5d56ff5d55ff5d55ff5c55ff5c54ff5b53ff5b53ff5a52ff5a52ff5951'
+        'ff5952ff5950ff5950ff594fff594fff584fff584fff574eff574eff574eff574dff574d'
+        'ff564dff564dff554cff554cff554bff554cff554bff554cff544bff544bff544bff544b'
+        'ff554bff544bff544bff534aff534bff534bff544bff534bff534bff534bff534bff534c'
+        'ff534cff534cff534cff534cff534cff534cff534cff534dff544eff534eff544fff544e'
+        'ff544fff534fff5450ff5350ff5451ff5552ff5552ff5553ff5553ff5554ff5554ff5655'
+        'ff5655ff5757fe5959fe5b5cfd5c5dfc5e60fb6062fb6164f96367f96469f8666cf7686f'
+        'f66971f56b74f46d77f36e7af2707df1717ff07382ef7586ee7688ed788cec798eeb7b91'
+        'ea7c94e97e97e87f9ae8819de6829fe684a2e585a5e487a8e388aae38aade28bb0e18cb2'
+        'e08eb5df8fb7df90b9df92bcde93bedd94c0dd96c3dc97c5db98c7db99c9db9acadb9ccd'
+        'da9dcfd99ed0d99fd2d9a0d3d9a1d5d8a2d6d8a3d8d8a4d9d7a5dad8a6dbd7a6dcd7a7de'
+        'd7a8dfd7a9dfd7aae0d7aae1'),
+    'pbj' : (
+        '290a59290a592a0a592a0a592a0a582b0a582b09582b09582c09582c09582d0a592e0a58'
+        '2e09582f09582f09582f0958300858300857310857310857310757320757320757330756'
+        '3306563507563507563607563606553706553706553805553805553905543905543a0454'
+        '3b04543b05543c04543c04543d04543d04533e03533f03533f0353400352400352410352'
+        '42035243045244045245045245045146045147045147045048045049045049044f4b0550'
+        '4c05504d054f4d054f4e054f4f054e50054e50054e50054d51054d53064c53064c54064c'
+        '55064b56064b57064a58064a5806495906495b07495c07495d07485e07485e07475f0747'
+        '600746600746610745630946640945650a45660a44670b43680b43690c426a0d426b0e42'
+        '6c0f416d10406e10406f113f70123e71123d72133d73143c76163c77163b78163a78173a'
+        '7918397a19387c1a377d1b367f1d36801e36821f35832034842133852232862331872430'
+        '8926308a272f8c282e8d292e8e2a2d8f2a2c902b2b912c2a922d2a952f29963029973128'
+        '9832279933269a34269b35259d37249f3924a03923a03a22a23b21a33c21a43d20a53e1f'
+        'a73f1ea8411ea9421daa431dac441cad451bae461aaf471ab04719b24919b34a18b44b18'
+        'b54c17b64d17b74e17b84f16ba5016bb5115bc5215bd5315be5314bf5414c05513c05613'
+        'c15712c25712c45912c45a12c55a12c65a12c75b12c85c12c95d12ca5d12cb5e12cc6013'
+        'cc6013cd6113ce6213cf6313d06313d16413d26413d36413d46614d56714d66714d66814'
+        'd76914d76914d86a14d96b14da6b14db6c14dc6d15dd6d15de6e15de6f15df6f15e07015'
+        'e17115e27115e37215e37215e47316e57416e57416e67516e77516e77616e87716e97716'
+        'ea7816ea7816eb7916ec7916ed7a17ed7a17ee7b17ef7c17ef7c17f07d17f07d17f17e17'
+        'f17e17f27f17f37f17f38017f48018f48018f58118f68118f68218f78218f78318f88318'
+        'f98318f98418fa8418fa8518fa8518fa8518fb8618fb8619fc8719fc8719fd8719fd8819'
+        'fd8819fe8819fe8819ff8919'),
+    'pgaitch' : (
+        'fffea5fffea4fffda3fffda2fffda1fffca0fffc9ffffc9dfffb9cfffb9bfffb99fffa98'
+        'fffa96fffa95fff994fff992fff991fff88ffff88dfff88bfff78afff788fff686fff684'
+        'fff682fff581fff57ffff57dfff47bfff479fff377fff375fff272fff270fff16ffff16d'
+        'fff06bfff069ffef66ffef64ffee63ffee61ffed5fffed5cffec5affed59ffec57ffeb54'
+        'ffeb52ffea50ffe94fffe94dffe84affe748ffe646ffe645ffe543ffe441ffe33fffe23d'
+        'ffe13cffe13affe038ffdf36ffde34ffde33ffdd31ffdc2fffdb2effda2cffd82bffd72a'
+        'ffd629ffd527ffd427ffd325ffd124ffd022ffd021ffce21ffcd20ffcc1effca1dffc91d'
+        'ffc71cfec71cfec71bfdc61bfcc51bfbc41bfac31af9c31af8c21af8c11af7c01af6c019'
+        'f5bf1af4be1af3bd19f1bc19f0bb19efbb19eeba19ecb919ecb81aebb71ae9b619e8b519'
+        'e6b51ae5b41ae4b319e3b219e2b11ae0b01adeb019ddaf19dcad1adbac1ad9ab19d7aa19'
+        'd6aa1ad4a91ad3a719d1a619d0a61acea51acca31acba21acaa119c8a11ac69f1ac59e1a'
+        'c39d1ac19d1bc09b1bbe9a1bbd991bbb981cba971cb8961cb6951cb5941db3931db1921d'
+        'af901dae901eac8e1eaa8d1ea98c1ea78b1fa58a1fa4891fa2881fa187209f86209d8520'
+        '9a8420998321978221968121947f21937f22917e228f7c228d7b228c7a238b7923897823'
+        '8777238676248475248274248173247f71247e71257c70257a6f25796e25786d26766c26'
+        '746b267369267168267068276e67276c66276b65276a6428686328666228656028636028'
+        '636029615e29605d295e5c295c5b295c5a2a5a5a2a59592a57572a56562a55562b54552b'
+        '53542b51532b50522b50522c4e502c4d502c4b4f2c4b4e2c4a4e2d494c2d474b2d474b2d'
+        '464a2d454a2e44492e43482e42472e41472e40452e40452f3f442f3e432f3d432f3c422f'
+        '3b412f3b41303b40303a3f30393f30383e30383e30373d30373d31373c31373c31363b31'
+        '353a31353931343931343932343832343832343832343732333632333532333532333432'
+        '333533333533333433333433'),
+}
+
+# decoded and registered schemes, name -> 768 bytes
+_schemes = {}
+
+def _rgb(name):
+    """ the 768 bytes of scheme name, KeyError if there is no such scheme """
+    rgb = _schemes.get(name)
+    if rgb is None:
+        rgb = _schemes.setdefault(name, bytes(bytearray.fromhex(_builtin[name])))
+    return rgb
+
+class _Schemes(Mapping):
+    """ every scheme as a list of 256 (r, g, b) tuples, built on access """
+
+    def __getitem__(self, name):
+        rgb = bytearray(_rgb(name))
+        return [tuple(rgb[i:i+3]) for i in range(0, len(rgb), 3)]
+
+    def __contains__(self, name):
+        return name in _schemes or name in _builtin
+
+    def __iter__(self):
+        return iter(sorted(set(_builtin) | set(_schemes)))
+
+    def __len__(self):
+        return len(set(_builtin) | set(_schemes))
+
+schemes = _Schemes()
 
 def valid_schemes():
     return schemes.keys()
 
+def register_scheme(name, colors):
+    """
+    Adds scheme name, or replaces it.
+
+    colors -> the 256 (r, g, b) colors of the density levels from the densest to
+              the faintest, or the same as 768 bytes.
+    """
+    try:
+        if isinstance(colors, (bytes, bytearray, memoryview)):
+            rgb = bytes(colors)
+        else:
+            rgb = bytes(bytearray(v for color in colors for v in color))
+    except (TypeError, ValueError):
+        raise Exception("Invalid colors for scheme %s: expected (r, g, b) values 0-255" % name)
+    if len(rgb) != 768:
+        raise Exception("Invalid colors for scheme %s: expected 256 (r, g, b) colors" % name)
+    _schemes[name] = rgb
+
+def register_gradient(name, stops):
+    """
+    Adds scheme name, or replaces it, interpolating linearly between color stops.
+
+    stops -> (position, (r, g, b)) pairs, position going from 0.0 for the faintest
+             density to 1.0 for the densest.  Before the first and after the last
+             stop the color stays the same.
+    """
+    stops = sorted((float(pos), tuple(color)) for (pos, color) in stops)
+    if not stops:
+        raise Exception("Invalid gradient for scheme %s: no stops" % name)
+
+    colors = []
+    for level in range(256):
+        pos = (255 - level) / 255.
+        upper = 0
+        while upper < len(stops) and stops[upper][0] < pos:
+            upper += 1
+        if upper == 0:
+            colors.append(stops[0][1])
+        elif upper == len(stops):
+            colors.append(stops[-1][1])
+        else:
+            (pos0, color0), (pos1, color1) = stops[upper-1], stops[upper]
+            t = (pos - pos0) / (pos1 - pos0)
+            colors.append(tuple(int(round(c0 + (c1 - c0) * t)) for c0, c1 in zip(color0, color1)))
+    register_scheme(name, colors)
+
+def register_image(name, image):
+    """
+    Adds scheme name, or replaces it, from a horizontal color strip such as a
+    legend or colormap image.
+
+    image -> PIL image or path of one.  Its width is resampled to 256 levels, the
+             left edge being the faintest density and the right edge the densest.
+    """
+    from PIL import Image
+
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    strip = bytearray(image.convert('RGB').resize((256, 1), Image.BILINEAR).tobytes())
+    register_scheme(name, [tuple(strip[i:i+3]) for i in range(765, -3, -3)])
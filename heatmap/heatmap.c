@@ -3,6 +3,10 @@
 #include <math.h>
 #include <string.h>
 
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
 float constant = 50.0;
 float multiplier = 200.0;
 
@@ -24,6 +28,71 @@ struct point {
     float y;
 };
 
+// what a stamp holds per pixel
+#define STAMP_PIXVAL 0      // unsigned char pixVal, 255 outside the radius
+#define STAMP_FALLOFF 1     // float falloff to divide by a weight, -1 outside
+#define STAMP_INTENSITY 2   // float -log(falloff/255) to add up, 0 outside
+
+// entries per unit of falloff in the table of -log(falloff/255) intensity
+// stamps interpolate, close enough for the error to stay under a float's
+// rounding of the value
+#define LOG_STEPS 16
+
+// additive dots have their sub-pixel offset rounded to a multiple of
+// 1/subpixel per axis, 0 and 1 included, each offset getting its own
+// precomputed intensity stamp.  subpixel starts at STAMP_SUBPIXEL and is
+// halved for large dots to bound memory.
+#define STAMP_SUBPIXEL 16
+#define STAMP_MAXBYTES (16*1024*1024)
+
+// aggregatePoints() merges the points falling in the same 1/AGGREGATE_SUBPIXEL
+// of a pixel per axis
+#define AGGREGATE_SUBPIXEL 16
+
+// a dot's falloff depends on where its centre falls within a pixel, so for
+// the multiply engine only the stamp of a dot centred on a pixel corner is
+// precomputed.  the others are worked out a row at a time as they are
+// stamped, with the very same float arithmetic as calcDensity always used,
+// which keeps the images identical.  an unweighted dot's pixel values are
+// worked out from the squared distances of its columns and rows, see squared
+// in struct kernels.  the additive engine need not match calcDensity and uses
+// the bucketed stamps instead.
+struct stamp
+{
+    int radius;             // stamp reach either side of the dot, in pixels
+    int side;               // width and height of a stamp
+    int kind;               // one of STAMP_*
+    float midpt;            // half the dotsize
+    float fradius;          // falloff radius, as used in calcDensity
+    void *aligned;          // side*side stamp of a dot on a pixel corner, but
+                            // for STAMP_INTENSITY
+    float *logs;            // -log(falloff/255) table, for STAMP_INTENSITY
+    float outside;          // least squared distance beyond fradius
+    int subpixel;           // offsets per axis, for STAMP_INTENSITY
+    float **buckets;        // (subpixel+1)^2 stamps, built on first use
+    int **spans;            // per bucket and row, the [first, last) columns
+                            // within the radius, built with the stamp
+};
+
+// how colorizeGrid maps accumulated intensity onto the 256 scheme levels.
+// NORMALIZE_SATURATION also applies to colorizePixels.
+#define NORMALIZE_LINEAR 0
+#define NORMALIZE_LOG 1
+#define NORMALIZE_PERCENTILE 2
+#define NORMALIZE_SATURATION 3
+#define NORMALIZE_BINS 4096
+
+// levels below this are over 95% density, the saturated pixels
+#define SATURATED_LEVEL 0x10
+
+// parameter errors come back as a NULL or 0 return for the caller to raise,
+// only debug builds print them
+#ifdef DEBUG
+#define INVALID_PARAMETER() fprintf(stderr, "Invalid parameter; aborting.\n")
+#else
+#define INVALID_PARAMETER()
+#endif
+
 #ifdef WIN32
 #define WIN32_LEAN_AND_MEAN
 #include <Windows.h>
@@ -36,26 +105,575 @@ BOOL WINAPI DllMain(    HINSTANCE hinstDLL,  // handle to DLL module
 }
 #endif
 
-//walk the list of points, get the boundary values    
-void getBounds(struct info *inf, float *points, unsigned int cPoints, int weighted)
+// the inner loops come in scalar, SSE2 and AVX2 flavors picked at runtime by
+// what the CPU supports.  every flavor gives bit-identical results, build
+// with HEATMAP_NO_SIMD to leave the vector ones out altogether.
+#define SIMD_AUTO -1
+#define SIMD_SCALAR 0
+#define SIMD_SSE2 1
+#define SIMD_AVX2 2
+
+#if !defined(HEATMAP_NO_SIMD) && (defined(__x86_64__) || defined(__i386__) || \
+                                  defined(_M_X64) || defined(_M_IX86))
+#define HEATMAP_SIMD
+#include <immintrin.h>
+#if defined(__GNUC__)
+#define TARGET_SSE2 __attribute__((target("sse2")))
+#define TARGET_AVX2 __attribute__((target("avx2")))
+#else
+#include <intrin.h>
+#define TARGET_SSE2
+#define TARGET_AVX2
+#endif
+#endif
+
+struct kernels
+{
+    int level;  // SIMD_*
+    // row[u] = row[u] * stamp[u] / 255
+    void (*blend)(unsigned char *row, const unsigned char *stamp, int count);
+    // the same with the stamp value falloff[u] / weight, clamped to 0 - 255
+    void (*blendWeighted)(unsigned char *row, const float *falloff, float weight, int count);
+    // row[u] += intensity[u] * weight
+    void (*add)(float *row, const float *intensity, float weight, int count);
+    // out[i] = lut[levels[i]], returns how many levels are below SATURATED_LEVEL
+    int (*colorize)(const unsigned char *levels, const unsigned int *lut,
+                    unsigned int *out, int count);
+    // falloff[u] = multiplier*(dist/radius)+constant for the pixel d0 + u
+    // across and dy down from a dot offset ox from the pixel grid, -1 beyond
+    // radius.  no fused multiply-adds, every step rounds as calcDensity's did
+    void (*falloff)(float *falloff, int d0, float ox, float dy, float radius, int count);
+    // out[u] = the pixel value of an unweighted dot at squared distance
+    // dx2[u] + dy2 from the pixel, 255 from outside on, exactly as the
+    // falloff gives it
+    void (*squared)(unsigned char *out, const float *dx2, float dy2, float outside,
+                    float radius, int count);
+};
+
+//stamp value of a weighted dot, NaN and a negative falloff (beyond the
+//radius) count as no dot at all
+int weightedPixVal(float falloff, float weight)
+{
+    float value = falloff / weight;
+
+    if (falloff < 0 || !(value < 255.f)) return 255;
+    if (value > 0) return (int)value;
+    return 0;
+}
+
+void blendScalar(unsigned char *row, const unsigned char *stamp, int count)
+{
+    int u = 0;
+
+    for (u = 0; u < count; u++)
+        row[u] = (row[u] * stamp[u]) / 255;
+}
+
+void blendWeightedScalar(unsigned char *row, const float *falloff, float weight, int count)
+{
+    int u = 0;
+
+    for (u = 0; u < count; u++)
+        row[u] = (row[u] * weightedPixVal(falloff[u], weight)) / 255;
+}
+
+void addScalar(float *row, const float *intensity, float weight, int count)
+{
+    int u = 0;
+
+    for (u = 0; u < count; u++)
+        row[u] += intensity[u] * weight;
+}
+
+int colorizeScalar(const unsigned char *levels, const unsigned int *lut,
+                   unsigned int *out, int count)
+{
+    int highCount = 0;
+    int i = 0;
+
+    for (i = 0; i < count; i++)
+    {
+        if (levels[i] < SATURATED_LEVEL) highCount++;
+        out[i] = lut[levels[i]];
+    }
+    return highCount;
+}
+
+void falloffScalar(float *falloff, int d0, float ox, float dy, float radius, int count)
+{
+    float dx = 0.0;
+    float dist = 0.0;
+    int u = 0;
+
+    for (u = 0; u < count; u++)
+    {
+        dx = (float)(d0 + u) - ox;
+        dist = sqrt(dx*dx + dy*dy);
+        falloff[u] = (dist > radius) ? -1.f : multiplier*(dist/radius)+constant;
+    }
+}
+
+void squaredScalar(unsigned char *out, const float *dx2, float dy2, float outside,
+                   float radius, int count)
+{
+    float s = 0.0;
+    float dist = 0.0;
+    int u = 0;
+
+    for (u = 0; u < count; u++)
+    {
+        s = dx2[u] + dy2;
+        dist = sqrt(s);
+        out[u] = (s >= outside) ? 255 : (unsigned char)(int)(multiplier*(dist/radius)+constant);
+    }
+}
+
+struct kernels scalarKernels = {SIMD_SCALAR, blendScalar, blendWeightedScalar,
+                                addScalar, colorizeScalar, falloffScalar, squaredScalar};
+
+#ifdef HEATMAP_SIMD
+
+// x / 255 rounded down for 16 bit x <= 255*255, as (x + 1 + (x >> 8)) >> 8
+TARGET_SSE2 __m128i div255SSE2(__m128i x)
+{
+    x = _mm_add_epi16(x, _mm_add_epi16(_mm_set1_epi16(1), _mm_srli_epi16(x, 8)));
+    return _mm_srli_epi16(x, 8);
+}
+
+TARGET_SSE2 __m128i pixValSSE2(__m128 falloff, __m128 weight)
+{
+    __m128 max = _mm_set1_ps(255.f);
+    __m128 zero = _mm_setzero_ps();
+    // min first so NaN turns into 255 as in weightedPixVal(), as does a
+    // negative falloff
+    __m128 value = _mm_max_ps(_mm_min_ps(_mm_div_ps(falloff, weight), max), zero);
+    __m128 none = _mm_cmplt_ps(falloff, zero);
+    return _mm_cvttps_epi32(_mm_or_ps(_mm_and_ps(none, max), _mm_andnot_ps(none, value)));
+}
+
+TARGET_SSE2 __m128i pixValsSSE2(const float *falloff, __m128 weight)
+{
+    return _mm_packs_epi32(pixValSSE2(_mm_loadu_ps(falloff), weight),
+                           pixValSSE2(_mm_loadu_ps(falloff + 4), weight));
+}
+
+TARGET_SSE2 void blendSSE2(unsigned char *row, const unsigned char *stamp, int count)
+{
+    __m128i zero = _mm_setzero_si128();
+    __m128i p, s, lo, hi;
+    int u = 0;
+
+    for (u = 0; u + 16 <= count; u += 16)
+    {
+        p = _mm_loadu_si128((const __m128i *)(row + u));
+        s = _mm_loadu_si128((const __m128i *)(stamp + u));
+        lo = div255SSE2(_mm_mullo_epi16(_mm_unpacklo_epi8(p, zero), _mm_unpacklo_epi8(s, zero)));
+        hi = div255SSE2(_mm_mullo_epi16(_mm_unpackhi_epi8(p, zero), _mm_unpackhi_epi8(s, zero)));
+        _mm_storeu_si128((__m128i *)(row + u), _mm_packus_epi16(lo, hi));
+    }
+    blendScalar(row + u, stamp + u, count - u);
+}
+
+TARGET_SSE2 void blendWeightedSSE2(unsigned char *row, const float *falloff, float weight, int count)
+{
+    __m128i zero = _mm_setzero_si128();
+    __m128 w = _mm_set1_ps(weight);
+    __m128i p, lo, hi;
+    int u = 0;
+
+    for (u = 0; u + 16 <= count; u += 16)
+    {
+        p = _mm_loadu_si128((const __m128i *)(row + u));
+        lo = div255SSE2(_mm_mullo_epi16(_mm_unpacklo_epi8(p, zero), pixValsSSE2(falloff + u, w)));
+        hi = div255SSE2(_mm_mullo_epi16(_mm_unpackhi_epi8(p, zero), pixValsSSE2(falloff + u + 8, w)));
+        _mm_storeu_si128((__m128i *)(row + u), _mm_packus_epi16(lo, hi));
+    }
+    blendWeightedScalar(row + u, falloff + u, weight, count - u);
+}
+
+TARGET_SSE2 void addSSE2(float *row, const float *intensity, float weight, int count)
+{
+    __m128 w = _mm_set1_ps(weight);
+    int u = 0;
+
+    // multiply then add, never fused, like the scalar loop
+    for (u = 0; u + 4 <= count; u += 4)
+        _mm_storeu_ps(row + u, _mm_add_ps(_mm_loadu_ps(row + u),
+                                          _mm_mul_ps(_mm_loadu_ps(intensity + u), w)));
+    addScalar(row + u, intensity + u, weight, count - u);
+}
+
+// sqrtps and divps round exactly as the scalar float sqrt and division do
+TARGET_SSE2 void falloffSSE2(float *falloff, int d0, float ox, float dy, float radius, int count)
+{
+    __m128 steps = _mm_set_ps(3.f, 2.f, 1.f, 0.f);
+    __m128 offset = _mm_set1_ps(ox);
+    __m128 dy2 = _mm_set1_ps(dy*dy);
+    __m128 r = _mm_set1_ps(radius);
+    __m128 m = _mm_set1_ps(multiplier);
+    __m128 c = _mm_set1_ps(constant);
+    __m128 outside = _mm_set1_ps(-1.f);
+    __m128 dx, dist, beyond;
+    int u = 0;
+
+    for (u = 0; u + 4 <= count; u += 4)
+    {
+        dx = _mm_sub_ps(_mm_add_ps(_mm_set1_ps((float)(d0 + u)), steps), offset);
+        dist = _mm_sqrt_ps(_mm_add_ps(_mm_mul_ps(dx, dx), dy2));
+        beyond = _mm_cmpgt_ps(dist, r);
+        dist = _mm_add_ps(_mm_mul_ps(m, _mm_div_ps(dist, r)), c);
+        _mm_storeu_ps(falloff + u, _mm_or_ps(_mm_and_ps(beyond, outside),
+                                             _mm_andnot_ps(beyond, dist)));
+    }
+    falloffScalar(falloff + u, d0 + u, ox, dy, radius, count - u);
+}
+
+// the pixel value estimated from rsqrtps with a Newton step is within 2e-4 of
+// the exact falloff, so where it truncates the same this either side of it,
+// the falloff does too.  the (rare) others are worked out exactly.
+#define PIXVAL_MARGIN (1.f/512)
+// squared distances are taken as at least this for rsqrtps, which has no
+// answer for 0.  the pixel value for 0 is a whole number, worked out exactly.
+#define PIXVAL_TINY 1e-30f
+
+TARGET_SSE2 void squaredSSE2(unsigned char *out, const float *dx2, float dy2, float outside,
+                             float radius, int count)
+{
+    __m128 vdy2 = _mm_set1_ps(dy2);
+    __m128 beyond = _mm_set1_ps(outside);
+    __m128 tiny = _mm_set1_ps(PIXVAL_TINY);
+    __m128 scale = _mm_set1_ps(1.5f * multiplier / radius);
+    __m128 halfScale = _mm_set1_ps(0.5f * multiplier / radius);
+    __m128 r = _mm_set1_ps(radius);
+    __m128 m = _mm_set1_ps(multiplier);
+    __m128 c = _mm_set1_ps(constant);
+    __m128 margin = _mm_set1_ps(PIXVAL_MARGIN);
+    __m128i top = _mm_set1_epi32(255);
+    __m128 f, y, t, v, inside;
+    __m128i lo, hi, values;
+    float tail[4];
+    int u = 0;
+    int i = 0;
+
+    for (u = 0; u < count; u += 4)
+    {
+        // the last few padded out beyond the radius to make up the four
+        if (u + 4 > count)
+        {
+            for (i = 0; i < 4; i++)
+                tail[i] = (u + i < count) ? dx2[u + i] : outside;
+            f = _mm_add_ps(_mm_loadu_ps(tail), vdy2);
+        }
+        else
+            f = _mm_add_ps(_mm_loadu_ps(dx2 + u), vdy2);
+        // sqrt(f) as t = f*rsqrt(f) and a Newton step, t*(1.5 - 0.5*t*y),
+        // scaled on the way
+        y = _mm_rsqrt_ps(_mm_max_ps(f, tiny));
+        t = _mm_mul_ps(f, y);
+        v = _mm_mul_ps(t, _mm_sub_ps(scale, _mm_mul_ps(halfScale, _mm_mul_ps(t, y))));
+        v = _mm_add_ps(v, c);
+        lo = _mm_cvttps_epi32(_mm_sub_ps(v, margin));
+        hi = _mm_cvttps_epi32(_mm_add_ps(v, margin));
+        inside = _mm_cmplt_ps(f, beyond);
+        if (_mm_movemask_ps(_mm_andnot_ps(_mm_castsi128_ps(_mm_cmpeq_epi32(lo, hi)), inside)))
+            lo = _mm_cvttps_epi32(_mm_add_ps(_mm_mul_ps(m, _mm_div_ps(_mm_sqrt_ps(f), r)), c));
+        values = _mm_or_si128(_mm_and_si128(_mm_castps_si128(inside), lo),
+                              _mm_andnot_si128(_mm_castps_si128(inside), top));
+        values = _mm_packs_epi32(values, values);
+        values = _mm_packus_epi16(values, values);
+        i = _mm_cvtsi128_si32(values);
+        memcpy(out + u, &i, (u + 4 > count) ? count - u : 4);
+    }
+}
+
+// SSE2 has no gather, the lookups stay scalar
+struct kernels sse2Kernels = {SIMD_SSE2, blendSSE2, blendWeightedSSE2,
+                              addSSE2, colorizeScalar, falloffSSE2, squaredSSE2};
+
+TARGET_AVX2 __m256i div255AVX2(__m256i x)
+{
+    x = _mm256_add_epi16(x, _mm256_add_epi16(_mm256_set1_epi16(1), _mm256_srli_epi16(x, 8)));
+    return _mm256_srli_epi16(x, 8);
+}
+
+TARGET_AVX2 void blendAVX2(unsigned char *row, const unsigned char *stamp, int count)
+{
+    __m256i zero = _mm256_setzero_si256();
+    __m256i p, s, lo, hi;
+    int u = 0;
+
+    // unpack and pack both work within 128 bit lanes, so the order holds
+    for (u = 0; u + 32 <= count; u += 32)
+    {
+        p = _mm256_loadu_si256((const __m256i *)(row + u));
+        s = _mm256_loadu_si256((const __m256i *)(stamp + u));
+        lo = div255AVX2(_mm256_mullo_epi16(_mm256_unpacklo_epi8(p, zero), _mm256_unpacklo_epi8(s, zero)));
+        hi = div255AVX2(_mm256_mullo_epi16(_mm256_unpackhi_epi8(p, zero), _mm256_unpackhi_epi8(s, zero)));
+        _mm256_storeu_si256((__m256i *)(row + u), _mm256_packus_epi16(lo, hi));
+    }
+    blendScalar(row + u, stamp + u, count - u);
+}
+
+TARGET_AVX2 __m256i pixValAVX2(__m256 falloff, __m256 weight)
+{
+    __m256 max = _mm256_set1_ps(255.f);
+    __m256 zero = _mm256_setzero_ps();
+    __m256 value = _mm256_max_ps(_mm256_min_ps(_mm256_div_ps(falloff, weight), max), zero);
+    return _mm256_cvttps_epi32(_mm256_blendv_ps(value, max, _mm256_cmp_ps(falloff, zero, _CMP_LT_OQ)));
+}
+
+TARGET_AVX2 void blendWeightedAVX2(unsigned char *row, const float *falloff, float weight, int count)
+{
+    __m256 w = _mm256_set1_ps(weight);
+    __m256i a, b, vals, p;
+    int u = 0;
+
+    for (u = 0; u + 16 <= count; u += 16)
+    {
+        a = pixValAVX2(_mm256_loadu_ps(falloff + u), w);
+        b = pixValAVX2(_mm256_loadu_ps(falloff + u + 8), w);
+        // packs works within lanes, put the 16 values back in order
+        vals = _mm256_permute4x64_epi64(_mm256_packs_epi32(a, b), 0xD8);
+        p = _mm256_cvtepu8_epi16(_mm_loadu_si128((const __m128i *)(row + u)));
+        p = div255AVX2(_mm256_mullo_epi16(p, vals));
+        p = _mm256_permute4x64_epi64(_mm256_packus_epi16(p, p), 0xD8);
+        _mm_storeu_si128((__m128i *)(row + u), _mm256_castsi256_si128(p));
+    }
+    blendWeightedScalar(row + u, falloff + u, weight, count - u);
+}
+
+TARGET_AVX2 void addAVX2(float *row, const float *intensity, float weight, int count)
+{
+    __m256 w = _mm256_set1_ps(weight);
+    int u = 0;
+
+    for (u = 0; u + 8 <= count; u += 8)
+        _mm256_storeu_ps(row + u, _mm256_add_ps(_mm256_loadu_ps(row + u),
+                                                _mm256_mul_ps(_mm256_loadu_ps(intensity + u), w)));
+    addScalar(row + u, intensity + u, weight, count - u);
+}
+
+TARGET_AVX2 int colorizeAVX2(const unsigned char *levels, const unsigned int *lut,
+                             unsigned int *out, int count)
+{
+    __m256i saturated = _mm256_set1_epi32(SATURATED_LEVEL);
+    __m256i high = _mm256_setzero_si256();
+    __m256i idx;
+    int counts[8];
+    int highCount = 0;
+    int i = 0;
+
+    for (i = 0; i + 8 <= count; i += 8)
+    {
+        idx = _mm256_cvtepu8_epi32(_mm_loadl_epi64((const __m128i *)(levels + i)));
+        _mm256_storeu_si256((__m256i *)(out + i), _mm256_i32gather_epi32((const int *)lut, idx, 4));
+        // the compare gives -1 for every level below SATURATED_LEVEL
+        high = _mm256_sub_epi32(high, _mm256_cmpgt_epi32(saturated, idx));
+    }
+    _mm256_storeu_si256((__m256i *)counts, high);
+    highCount = counts[0] + counts[1] + counts[2] + counts[3] +
+                counts[4] + counts[5] + counts[6] + counts[7];
+    return highCount + colorizeScalar(levels + i, lut, out + i, count - i);
+}
+
+TARGET_AVX2 void falloffAVX2(float *falloff, int d0, float ox, float dy, float radius, int count)
+{
+    __m256 steps = _mm256_set_ps(7.f, 6.f, 5.f, 4.f, 3.f, 2.f, 1.f, 0.f);
+    __m256 offset = _mm256_set1_ps(ox);
+    __m256 dy2 = _mm256_set1_ps(dy*dy);
+    __m256 r = _mm256_set1_ps(radius);
+    __m256 m = _mm256_set1_ps(multiplier);
+    __m256 c = _mm256_set1_ps(constant);
+    __m256 outside = _mm256_set1_ps(-1.f);
+    __m256 dx, dist, beyond;
+    int u = 0;
+
+    for (u = 0; u + 8 <= count; u += 8)
+    {
+        dx = _mm256_sub_ps(_mm256_add_ps(_mm256_set1_ps((float)(d0 + u)), steps), offset);
+        dist = _mm256_sqrt_ps(_mm256_add_ps(_mm256_mul_ps(dx, dx), dy2));
+        beyond = _mm256_cmp_ps(dist, r, _CMP_GT_OQ);
+        dist = _mm256_add_ps(_mm256_mul_ps(m, _mm256_div_ps(dist, r)), c);
+        _mm256_storeu_ps(falloff + u, _mm256_blendv_ps(dist, outside, beyond));
+    }
+    falloffScalar(falloff + u, d0 + u, ox, dy, radius, count - u);
+}
+
+TARGET_AVX2 void squaredAVX2(unsigned char *out, const float *dx2, float dy2, float outside,
+                             float radius, int count)
+{
+    __m256 vdy2 = _mm256_set1_ps(dy2);
+    __m256 beyond = _mm256_set1_ps(outside);
+    __m256 tiny = _mm256_set1_ps(PIXVAL_TINY);
+    __m256 scale = _mm256_set1_ps(1.5f * multiplier / radius);
+    __m256 halfScale = _mm256_set1_ps(0.5f * multiplier / radius);
+    __m256 r = _mm256_set1_ps(radius);
+    __m256 m = _mm256_set1_ps(multiplier);
+    __m256 c = _mm256_set1_ps(constant);
+    __m256 margin = _mm256_set1_ps(PIXVAL_MARGIN);
+    __m256i top = _mm256_set1_epi32(255);
+    __m256 f, y, t, v, inside;
+    __m256i lo, hi, values;
+    __m128i packed;
+    float tail[8];
+    unsigned char last[8];
+    int u = 0;
+    int i = 0;
+
+    for (u = 0; u < count; u += 8)
+    {
+        // the last few padded out beyond the radius to make up the eight
+        if (u + 8 > count)
+        {
+            for (i = 0; i < 8; i++)
+                tail[i] = (u + i < count) ? dx2[u + i] : outside;
+            f = _mm256_add_ps(_mm256_loadu_ps(tail), vdy2);
+        }
+        else
+            f = _mm256_add_ps(_mm256_loadu_ps(dx2 + u), vdy2);
+        // sqrt(f) as t = f*rsqrt(f) and a Newton step, t*(1.5 - 0.5*t*y),
+        // scaled on the way
+        y = _mm256_rsqrt_ps(_mm256_max_ps(f, tiny));
+        t = _mm256_mul_ps(f, y);
+        v = _mm256_mul_ps(t, _mm256_sub_ps(scale, _mm256_mul_ps(halfScale, _mm256_mul_ps(t, y))));
+        v = _mm256_add_ps(v, c);
+        lo = _mm256_cvttps_epi32(_mm256_sub_ps(v, margin));
+        hi = _mm256_cvttps_epi32(_mm256_add_ps(v, margin));
+        inside = _mm256_cmp_ps(f, beyond, _CMP_LT_OQ);
+        if (_mm256_movemask_ps(_mm256_andnot_ps(_mm256_castsi256_ps(_mm256_cmpeq_epi32(lo, hi)), inside)))
+            lo = _mm256_cvttps_epi32(_mm256_add_ps(_mm256_mul_ps(m, _mm256_div_ps(_mm256_sqrt_ps(f), r)), c));
+        values = _mm256_blendv_epi8(top, lo, _mm256_castps_si256(inside));
+        packed = _mm_packs_epi32(_mm256_castsi256_si128(values), _mm256_extracti128_si256(values, 1));
+        if (u + 8 > count)
+        {
+            _mm_storel_epi64((__m128i *)last, _mm_packus_epi16(packed, packed));
+            memcpy(out + u, last, count - u);
+        }
+        else
+            _mm_storel_epi64((__m128i *)(out + u), _mm_packus_epi16(packed, packed));
+    }
+}
+
+struct kernels avx2Kernels = {SIMD_AVX2, blendAVX2, blendWeightedAVX2,
+                              addAVX2, colorizeAVX2, falloffAVX2, squaredAVX2};
+
+#endif
+
+//best SIMD_* level the CPU (and the build) supports
+int cpuSimd(void)
+{
+#ifdef HEATMAP_SIMD
+#if defined(__GNUC__)
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx2")) return SIMD_AVX2;
+    if (__builtin_cpu_supports("sse2")) return SIMD_SSE2;
+#elif defined(_MSC_VER)
+    int info[4];
+    int avx2 = 0;
+
+    __cpuid(info, 0);
+    if (info[0] >= 7)
+    {
+        __cpuid(info, 1);
+        // AVX registers have to be saved by the OS too
+        if ((info[2] & (1 << 27)) && (_xgetbv(0) & 6) == 6)
+        {
+            __cpuidex(info, 7, 0);
+            avx2 = (info[1] & (1 << 5)) != 0;
+        }
+    }
+    if (avx2) return SIMD_AVX2;
+    __cpuid(info, 1);
+    if (info[3] & (1 << 26)) return SIMD_SSE2;
+#endif
+#endif
+    return SIMD_SCALAR;
+}
+
+struct kernels *kernels = NULL;
+
+//switch kernels to level, one of SIMD_*, capped at what the CPU supports.
+//SIMD_AUTO takes the HEATMAP_SIMD environment variable (scalar, sse2 or avx2)
+//if set, the best level available otherwise.  returns the level in use.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int setSimd(int level)
+{
+    int best = cpuSimd();
+    const char *env = NULL;
+
+    if (level == SIMD_AUTO)
+    {
+        level = best;
+        env = getenv("HEATMAP_SIMD");
+        if (env != NULL && strcmp(env, "scalar") == 0) level = SIMD_SCALAR;
+        if (env != NULL && strcmp(env, "sse2") == 0) level = SIMD_SSE2;
+    }
+    if (level > best) level = best;
+
+    #ifdef HEATMAP_SIMD
+    if (level == SIMD_AVX2)
+        kernels = &avx2Kernels;
+    else if (level == SIMD_SSE2)
+        kernels = &sse2Kernels;
+    else
+    #endif
+        kernels = &scalarKernels;
+
+    return kernels->level;
+}
+
+//the SIMD_* level of the kernels in use, picking them on first call
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int getSimd(void)
+{
+    if (NULL == kernels) setSimd(SIMD_AUTO);
+    return kernels->level;
+}
+
+//bounds of a set of points, as handed back to python
+struct bounds
+{
+    float minX;
+    float minY;
+    float maxX;
+    float maxY;
+};
+
+//walk the list of points, get the boundary values.  points with a NaN or
+//infinite coordinate are left out, returns the number of points counted.
+//the bounds are all 0 without any.
+int getBounds(struct info *inf, float *points, unsigned int cPoints, int weighted)
 {
     unsigned int i = 0;
+    int counted = 0;
 
-    // first init the global counts
-    float minX = points[i];
-    float minY = points[i+1];
-    float maxX = points[i];
-    float maxY = points[i+1];
+    float minX = 0.0;
+    float minY = 0.0;
+    float maxX = 0.0;
+    float maxY = 0.0;
 
     int inc = 2;
     if (weighted) inc = 3;
 
-    //then iterate over the list and find the max/min values
-    for(i = 0; i < cPoints; i=i+inc)
+    //iterate over the list and find the max/min values, x - x is only 0 for
+    //finite x
+    for(i = 0; i + 1 < cPoints; i=i+inc)
     {
         float x = points[i];
         float y = points[i+1];
 
+        if (!(x - x == 0 && y - y == 0)) continue;
+        if (counted++ == 0)
+        {
+            minX = maxX = x;
+            minY = maxY = y;
+            continue;
+        }
+
         if (x > maxX) maxX = x;
         if (x < minX) minX = x;
 
@@ -68,7 +686,39 @@ void getBounds(struct info *inf, float *points, unsigned int cPoints, int weight
     inf->maxX = maxX;
     inf->maxY = maxY;
 
-    return;
+    return counted;
+}
+
+//the bounds used for inf, into out if not NULL
+void putBounds(struct info *inf, struct bounds *out)
+{
+    if (NULL == out) return;
+    out->minX = inf->minX;
+    out->minY = inf->minY;
+    out->maxX = inf->maxX;
+    out->maxY = inf->maxY;
+}
+
+//bounds of the points as getBounds() finds them for a render, for python to
+//autoscale with or to learn the extent of points without rendering them.
+//returns the number of points counted, 0 leaving out untouched.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int pointBounds(float *points, int cPoints, int weighted, struct bounds *out)
+{
+    struct info inf = {0};
+    int counted = 0;
+
+    if (NULL == points || NULL == out || cPoints < 0)
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+
+    counted = getBounds(&inf, points, cPoints, weighted);
+    if (counted > 0) putBounds(&inf, out);
+    return counted;
 }
 
 //transform from dataset coordinates into image coordinates
@@ -93,142 +743,1702 @@ struct point translate(struct info *inf, struct point pt)
     return pt;
 }
 
-unsigned char* calcDensity(struct info *inf, float *points, int cPoints, int weighted)
+//falloff of the pixels of row v of a stamp, columns [*lo, *hi), for a dot
+//whose centre is offset (ox, oy) from the pixel grid.  falloff receives the
+//multiplier*(dist/radius)+constant of calcDensity, -1 outside the radius, out
+//what the stamp holds for them, see STAMP_*.  outside the radius every kind
+//of stamp holds a value that leaves the pixel untouched, a NULL out just
+//wants the falloff.  with trim the columns are narrowed down to the ones
+//within the radius, and only those are filled in.
+void stampRow(struct stamp *st, float ox, float oy, int v, int *lo, int *hi, int trim,
+              float *falloff, void *out)
 {
-    int width = inf->width;
-    int height = inf->height;
-    int cPixels = inf->cPixels;
-    int dotsize = inf->dotsize;
-    
-    unsigned char* pixels = (unsigned char *)malloc(cPixels*sizeof(char)); 
-
-    float midpt = dotsize / 2.f;
-    float radius = sqrt(midpt*midpt + midpt*midpt) / 2.f;
-    float dist = 0.0;
-    int pixVal = 0;
-    int j = 0;
+    unsigned char *bout = (unsigned char *)out;
+    float *fout = (float *)out;
+    float top = multiplier * LOG_STEPS;
+    float t = 0.0;
     int k = 0;
-    int i = 0;
-    int ndx = 0;
-    struct point pt = {0};  
+    int u = 0;
 
-    int inc = 2;
-    if (weighted) inc = 3;
+    if (*lo >= *hi) return;
+    kernels->falloff(falloff + *lo, *lo - st->radius, ox, (float)(v - st->radius) - oy,
+                     st->fradius, *hi - *lo);
+    //the pixels within the radius are all in one run
+    for (; trim && *lo < *hi && falloff[*lo] < 0; (*lo)++);
+    for (; trim && *hi > *lo && falloff[*hi - 1] < 0; (*hi)--);
 
-    // initialize image data to white
-    for(i = 0; i < cPixels; i++) 
+    if (out == NULL) return;
+    if (st->kind == STAMP_FALLOFF)
+        memcpy(fout + *lo, falloff + *lo, (*hi - *lo)*sizeof(float));
+    else if (st->kind == STAMP_INTENSITY)
     {
-        pixels[i] = 0xff;
+        //-log(falloff/255) interpolated from the table, falloff is at least
+        //constant within the radius
+        for (u = *lo; u < *hi; u++)
+        {
+            t = (falloff[u] < 0) ? 0.f : (falloff[u] - constant) * LOG_STEPS;
+            if (t > top) t = top;
+            k = (int)t;
+            fout[u] = (falloff[u] < 0) ? 0.f : st->logs[k] + (st->logs[k+1] - st->logs[k]) * (t - k);
+        }
+    }
+    else
+    {
+        for (u = *lo; u < *hi; u++)
+            bout[u] = (falloff[u] < 0 || falloff[u] >= 255.f) ? 255 : (unsigned char)(int)falloff[u];
     }
+}
 
+//the least squared distance whose float sqrt lies beyond radius, as
+//calcDensity tested it.  bisects the float bits, which order positive floats.
+float outsideSquared(float radius)
+{
+    float far = 4.f*radius*radius + 1.f;
+    float s = 0.0;
+    unsigned int lo = 0;
+    unsigned int hi = 0;
+    unsigned int mid = 0;
 
-    for(i = 0; i < cPoints; i=i+inc)
+    memcpy(&hi, &far, sizeof(float));
+    while (lo < hi)
     {
-        pt.x = points[i];
-        pt.y = points[i+1];
-        pt = translate(inf, pt);
+        mid = lo + (hi - lo) / 2;
+        memcpy(&s, &mid, sizeof(float));
+        if ((float)sqrt(s) > radius)
+            hi = mid;
+        else
+            lo = mid + 1;
+    }
+    memcpy(&s, &lo, sizeof(float));
+    return s;
+}
 
-        for (j = (int)pt.x - midpt; j < (int)pt.x + midpt; j++)
-        {   
-            for (k = (int)(pt.y - midpt); k < (int)(pt.y + midpt); k++)
-            {
-                if (j < 0 || k < 0 || j >= width || k >= height) continue; 
-
-                dist = sqrt( (j-pt.x)*(j-pt.x) + (k-pt.y)*(k-pt.y) );
-                
-                if(dist>radius) continue; // stop point contributing to pixels outside its radius
-
-                ndx = k*width + j;
-                if(ndx >= cPixels) continue;   // ndx can be greater than array bounds
-
-                if(weighted)
-                {
-                  pixVal = (int)((multiplier*(dist/radius)+constant)/points[i+2]);
-                }
-                else
-                {
-                  pixVal = (int)(multiplier*(dist/radius)+constant);
-                }
-                if (pixVal > 255) pixVal = 255;
-
-                #ifdef DEBUG
-                printf("pt.x: %.2f pt.y: %.2f j: %d k: %d ndx: %d\n", pt.x, pt.y, j, k, ndx);
-                #endif 
-
-                pixels[ndx] = (pixels[ndx] * pixVal) / 255;
-            } // for k
-        } //for j
-    } // for i
+void initStamp(struct stamp *st, int dotsize, int kind)
+{
+    int elem = (kind == STAMP_PIXVAL) ? sizeof(unsigned char) : sizeof(float);
+    float *falloff = NULL;
+    int lo = 0;
+    int hi = 0;
+    int v = 0;
 
-    return pixels;
+    st->midpt = dotsize / 2.f;
+    st->fradius = sqrt(st->midpt*st->midpt + st->midpt*st->midpt) / 2.f;
+    st->radius = (int)ceil(st->fradius);
+    st->side = 2*st->radius + 2;
+    st->kind = kind;
+
+    //pick the kernels before any thread wants them
+    getSimd();
+    st->logs = NULL;
+    st->buckets = NULL;
+    st->spans = NULL;
+    st->subpixel = 0;
+    st->outside = outsideSquared(st->fradius);
+    if (kind == STAMP_INTENSITY)
+    {
+        st->logs = (float *)malloc(((int)(multiplier*LOG_STEPS) + 2)*sizeof(float));
+        for (v = 0; v < (int)(multiplier*LOG_STEPS) + 2; v++)
+            st->logs[v] = -log((constant + (double)v/LOG_STEPS)/255.0);
+
+        st->subpixel = STAMP_SUBPIXEL;
+        while (st->subpixel > 1 &&
+               (double)(st->subpixel+1)*(st->subpixel+1)*st->side*st->side*elem > STAMP_MAXBYTES)
+        {
+            st->subpixel /= 2;
+        }
+        st->buckets = (float **)calloc((st->subpixel+1)*(st->subpixel+1), sizeof(float *));
+        st->spans = (int **)calloc((st->subpixel+1)*(st->subpixel+1), sizeof(int *));
+        st->aligned = NULL;
+        return;
+    }
+    falloff = (float *)malloc(st->side*sizeof(float));
+    st->aligned = malloc(st->side*st->side*elem);
+    for (v = 0; v < st->side; v++)
+    {
+        lo = 0;
+        hi = st->side;
+        stampRow(st, 0.f, 0.f, v, &lo, &hi, 0, falloff, (char *)st->aligned + v*st->side*elem);
+    }
+    free(falloff);
 }
 
-unsigned char *colorize(struct info *inf, unsigned char* pixels_bw, int *scheme, unsigned char* pixels_color, 
-              int opacity)
+void freeStamp(struct stamp *st)
 {
-    int cPixels = inf->cPixels;
-    
     int i = 0;
-    int pix = 0;
-    int highCount = 0;
-    int alpha = opacity;
 
-    for(i = 0; i < cPixels; i++)
+    for (i = 0; NULL != st->buckets && i < (st->subpixel+1)*(st->subpixel+1); i++)
     {
-        pix = pixels_bw[i];
+        free(st->buckets[i]);
+        free(st->spans[i]);
+    }
+    free(st->buckets);
+    free(st->spans);
+    free(st->aligned);
+    free(st->logs);
+    st->buckets = NULL;
+    st->spans = NULL;
+    st->aligned = NULL;
+    st->logs = NULL;
+}
+
+//where the stamp of a translated point goes: *base receives the image
+//coordinates of its top left corner and *offset where the dot's centre falls
+//within its pixel.  returns 1 for a dot on a pixel corner, which can use the
+//aligned stamp.
+int locateStamp(struct stamp *st, struct point pt, int *baseX, int *baseY, struct point *offset)
+{
+    float fx = floor(pt.x);
+    float fy = floor(pt.y);
 
-        if (pix < 0x10) highCount++;
-        if (pix <= 252) 
-            alpha = opacity; 
-        else 
-            alpha = 0;
+    //exact, the fraction of a float always fits in one
+    offset->x = pt.x - fx;
+    offset->y = pt.y - fy;
+    *baseX = (int)fx - st->radius;
+    *baseY = (int)fy - st->radius;
+    return offset->x == 0 && offset->y == 0;
+}
 
-        pixels_color[i*4] = scheme[pix*3];
-        pixels_color[i*4+1] = scheme[pix*3+1];
-        pixels_color[i*4+2] = scheme[pix*3+2];
-        pixels_color[i*4+3] = alpha;
-    } 
-    
-    if (highCount > cPixels*0.8)
-    {   
-        fprintf(stderr, "Warning: 80%% of output pixels are over 95%% density.\n");
-        fprintf(stderr, "Decrease dotsize or increase output image resolution?\n");
-    }
+//locateStamp() for the bucketed stamps, *offset receiving the offset of the
+//stamp, pt's rounded to a multiple of 1/subpixel.  returns the bucket.
+int locateBucket(struct stamp *st, struct point pt, int *baseX, int *baseY, struct point *offset)
+{
+    int bx = 0;
+    int by = 0;
 
-    return pixels_color;
+    locateStamp(st, pt, baseX, baseY, offset);
+    bx = (int)(offset->x * st->subpixel + 0.5f);
+    by = (int)(offset->y * st->subpixel + 0.5f);
+    offset->x = (float)bx / st->subpixel;
+    offset->y = (float)by / st->subpixel;
+    return by*(st->subpixel+1) + bx;
 }
 
-#ifdef WIN32
-__declspec(dllexport)
-#endif
-unsigned char *tx(float *points, 
-                  int cPoints, 
-                  int w, int h, 
-                  int dotsize, 
-                  int *scheme, 
-                  unsigned char *pix_color, 
-                  int opacity, 
-                  int boundsOverride, 
-                  float minX, float minY, float maxX, float maxY, int weighted)
+//intensity stamp of a bucket, built on first use along with its spans.  not
+//thread safe, stampBands() builds the ones it needs up front.
+float *getStamp(struct stamp *st, int bucket)
 {
-    unsigned char *pixels_bw = NULL;
-    struct info inf = {0};
+    float *falloff = NULL;
+    int *spans = NULL;
+    int side = st->side;
+    int v = 0;
 
-    //basic sanity checks to keep from segfaulting
-    if (NULL == points || NULL == scheme || NULL == pix_color ||
-        w <= 0 || h <= 0 || cPoints <= 1+weighted || cPoints % (2+weighted) != 0 ||
-        opacity < 0 || opacity > 255 || dotsize <= 0)
+    if (NULL == st->buckets[bucket])
     {
-        fprintf(stderr, "Invalid parameter; aborting.\n");
-        return NULL;
+        falloff = (float *)malloc(side*sizeof(float));
+        spans = (int *)malloc(2*side*sizeof(int));
+        st->buckets[bucket] = (float *)malloc(side*side*sizeof(float));
+        for (v = 0; v < side; v++)
+        {
+            spans[2*v] = 0;
+            spans[2*v+1] = side;
+            stampRow(st, (float)(bucket % (st->subpixel+1)) / st->subpixel,
+                     (float)(bucket / (st->subpixel+1)) / st->subpixel,
+                     v, &spans[2*v], &spans[2*v+1], 1, falloff, st->buckets[bucket] + v*side);
+        }
+        free(falloff);
+        st->spans[bucket] = spans;
     }
-    
-    inf.dotsize = dotsize;
-    inf.width = w;
-    inf.height = h;
+    return st->buckets[bucket];
+}
+
+//clipStamp() for a bucketed stamp: its spans cut down to the image and the
+//rows [rowStart, rowEnd)
+void clipBucket(struct info *inf, struct stamp *st, int bucket, int baseX, int baseY,
+                int rowStart, int rowEnd, int *first, int *last, int *clip)
+{
+    int *spans = st->spans[bucket];
+    int v = 0;
+
+    *first = rowStart - baseY > 0 ? rowStart - baseY : 0;
+    *last = rowEnd - baseY < st->side ? rowEnd - baseY : st->side;
+
+    for (v = *first; v < *last; v++)
+    {
+        clip[2*v] = spans[2*v] > -baseX ? spans[2*v] : -baseX;
+        clip[2*v+1] = spans[2*v+1] < inf->width - baseX ? spans[2*v+1] : inf->width - baseX;
+    }
+}
+
+//rows [*first, *last) of the stamp of pt placed at base that fall within
+//[rowStart, rowEnd), and per row the columns to visit: [clip[2*v],
+//clip[2*v+1]).  these are the pixels calcDensity visited, from (int)pt.x -
+//midpt across and (int)(pt.y - midpt) down to the image edge, cut down to a
+//pixel either side of the radius.  empty spans come out with first >= last.
+void clipStamp(struct info *inf, struct stamp *st, struct point pt, struct point offset,
+               int baseX, int baseY, int rowStart, int rowEnd, int *first, int *last, int *clip)
+{
+    int left = (int)((int)pt.x - st->midpt) - baseX;
+    int right = (int)ceil((int)pt.x + st->midpt) - baseX;
+    int top = (int)(pt.y - st->midpt) - baseY;
+    int bottom = (int)(pt.y + st->midpt) - baseY;
+    double dy = 0.0;
+    double half = 0.0;
+    int v = 0;
+
+    if (left < -baseX) left = -baseX;
+    if (left < 0) left = 0;
+    if (right > inf->width - baseX) right = inf->width - baseX;
+    if (right > st->side) right = st->side;
+    if (top < rowStart - baseY) top = rowStart - baseY;
+    if (top < 0) top = 0;
+    if (bottom > rowEnd - baseY) bottom = rowEnd - baseY;
+    if (bottom > st->side) bottom = st->side;
+    *first = top;
+    *last = bottom;
+
+    for (v = *first; v < *last; v++)
+    {
+        //the pixel of slack covers any rounding of the exact test the
+        //falloff kernels make
+        dy = v - st->radius - offset.y;
+        half = st->fradius*st->fradius - dy*dy;
+        half = (half > 0 ? sqrt(half) : 0.0) + 1.0;
+        clip[2*v] = (int)floor(st->radius + offset.x - half);
+        clip[2*v+1] = (int)ceil(st->radius + offset.x + half) + 1;
+        if (fabs(dy) > st->fradius + 1.0) clip[2*v+1] = clip[2*v];
+        if (clip[2*v] < left) clip[2*v] = left;
+        if (clip[2*v+1] > right) clip[2*v+1] = right;
+    }
+}
+
+//dots entirely off the canvas contribute nothing
+int onCanvas(struct info *inf, struct stamp *st, struct point pt)
+{
+    return pt.x > -st->side && pt.x < inf->width + st->side &&
+           pt.y > -st->side && pt.y < inf->height + st->side;
+}
+
+//table of what stamping a pixel value repeats times over comes to,
+//255 * (value/255)^repeats rounded
+void repeatTable(unsigned char *table, unsigned int repeats)
+{
+    int value = 0;
+
+    for (value = 0; value < 256; value++)
+        table[value] = (unsigned char)(255.0 * pow(value / 255.0, (double)repeats) + 0.5);
+}
+
+//stamp a list of points onto the rows [rowStart, rowEnd) of pixels.  indices
+//selects the points to use, or all of them if NULL.  counts, if not NULL,
+//holds how many times over each point is stamped, see aggregatePoints().
+void stampPoints(struct info *inf, struct stamp *st, float *points, int cPoints,
+                 unsigned int *indices, int cIndices, int weighted,
+                 unsigned int *counts, unsigned char *pixels, int rowStart, int rowEnd)
+{
+    int width = inf->width;
+    int side = st->side;
+    unsigned char *bstamp = NULL;
+    float *fstamp = NULL;
+    float weight = 1.0;
+    int *clip = (int *)malloc(2*side*sizeof(int));
+    float *falloff = (float *)malloc(side*sizeof(float));
+    float *dx2 = (float *)malloc(side*sizeof(float));
+    unsigned char *values = (unsigned char *)malloc(side);
+    struct kernels *kern = &scalarKernels;
+    unsigned char table[256];
+    float dx = 0.0;
+    float dy = 0.0;
+    int squared = 0;
+    unsigned char *repeated = NULL;
+    unsigned int repeats = 1;
+    unsigned int tableRepeats = 0;
+    int aligned = 0;
+    int row = 0;
+    int baseX = 0;
+    int baseY = 0;
+    int first = 0;
+    int last = 0;
+    int u = 0;
+    int v = 0;
+    int x = 0;
+    int i = 0;
+    int n = 0;
+    struct point pt = {0};  
+    struct point offset = {0};
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == indices) cIndices = cPoints / inc;
+    getSimd();
+    kern = kernels;
+
+    for(n = 0; n < cIndices; n++)
+    {
+        i = (NULL == indices) ? n*inc : (int)indices[n]*inc;
+        pt.x = points[i];
+        pt.y = points[i+1];
+        pt = translate(inf, pt);
+
+        if (!onCanvas(inf, st, pt)) continue;
+
+        aligned = locateStamp(st, pt, &baseX, &baseY, &offset);
+        if (weighted) weight = points[i+2];
+        clipStamp(inf, st, pt, offset, baseX, baseY, rowStart, rowEnd, &first, &last, clip);
+
+        //an unweighted dot off the pixel corners gets its pixel values from
+        //the squared distances, dx*dx worked out once per column of the dot
+        squared = !aligned && !weighted;
+        for (u = 0; squared && u < side; u++)
+        {
+            dx = (float)(u - st->radius) - offset.x;
+            dx2[u] = dx*dx;
+        }
+
+        #ifdef DEBUG
+        printf("pt.x: %.2f pt.y: %.2f base: %d, %d\n", pt.x, pt.y, baseX, baseY);
+        #endif 
+
+        if (NULL != counts) repeats = counts[i / inc];
+        if (repeats > 1 && repeats != tableRepeats)
+        {
+            repeatTable(table, repeats);
+            tableRepeats = repeats;
+            if (NULL == repeated) repeated = (unsigned char *)malloc(side);
+        }
+
+        //only the columns about the radius and within the image are visited,
+        //the stamp would leave the others untouched anyway
+        for (v = first; v < last; v++)
+        {
+            if (clip[2*v] >= clip[2*v+1]) continue;
+            row = (baseY + v)*width + baseX + clip[2*v];
+            if (aligned)
+            {
+                u = v*side + clip[2*v];
+                fstamp = (float *)st->aligned + u;
+                bstamp = (unsigned char *)st->aligned + u;
+            }
+            else if (squared)
+            {
+                dy = (float)(v - st->radius) - offset.y;
+                kern->squared(values + clip[2*v], dx2 + clip[2*v], dy*dy, st->outside,
+                              st->fradius, clip[2*v+1] - clip[2*v]);
+                bstamp = values + clip[2*v];
+            }
+            else
+            {
+                //an unweighted dot's falloff blends as a dot of weight 1,
+                //skipping the pass turning it into pixel values
+                stampRow(st, offset.x, offset.y, v, &clip[2*v], &clip[2*v+1], 1, falloff, NULL);
+                if (clip[2*v] >= clip[2*v+1]) continue;
+                row = (baseY + v)*width + baseX + clip[2*v];
+                fstamp = falloff + clip[2*v];
+            }
+
+            if (repeats > 1)
+            {
+                //stamp values for all the repeats, blended once
+                for (x = 0; x < clip[2*v+1] - clip[2*v]; x++)
+                    repeated[x] = table[(weighted || !(aligned || squared)) ?
+                                        weightedPixVal(fstamp[x], weight) : bstamp[x]];
+                kern->blend(pixels + row, repeated, clip[2*v+1] - clip[2*v]);
+            }
+            else if (weighted || !(aligned || squared))
+                kern->blendWeighted(pixels + row, fstamp, weight, clip[2*v+1] - clip[2*v]);
+            else
+                kern->blend(pixels + row, bstamp, clip[2*v+1] - clip[2*v]);
+        } //for v
+    } // for n
+
+    free(repeated);
+    free(values);
+    free(dx2);
+    free(falloff);
+    free(clip);
+}
+
+//additive counterpart of stampPoints, adds each point's intensity stamp
+//(times its weight) to a float grid.  the stamps are the bucketed ones, see
+//STAMP_SUBPIXEL.
+void addPoints(struct info *inf, struct stamp *st, float *points, int cPoints,
+               unsigned int *indices, int cIndices, int weighted,
+               float *grid, int rowStart, int rowEnd)
+{
+    int width = inf->width;
+    int side = st->side;
+    float *fstamp = NULL;
+    float weight = 1.0;
+    int *clip = (int *)malloc(2*side*sizeof(int));
+    struct kernels *kern = &scalarKernels;
+    int bucket = 0;
+    int row = 0;
+    int baseX = 0;
+    int baseY = 0;
+    int first = 0;
+    int last = 0;
+    int v = 0;
+    int i = 0;
+    int n = 0;
+    struct point pt = {0};
+    struct point offset = {0};
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == indices) cIndices = cPoints / inc;
+    getSimd();
+    kern = kernels;
+
+    for(n = 0; n < cIndices; n++)
+    {
+        i = (NULL == indices) ? n*inc : (int)indices[n]*inc;
+        pt.x = points[i];
+        pt.y = points[i+1];
+        pt = translate(inf, pt);
+
+        if (!onCanvas(inf, st, pt)) continue;
+
+        if (weighted) weight = points[i+2];
+        bucket = locateBucket(st, pt, &baseX, &baseY, &offset);
+        fstamp = getStamp(st, bucket);
+        clipBucket(inf, st, bucket, baseX, baseY, rowStart, rowEnd, &first, &last, clip);
+
+        for (v = first; v < last; v++)
+        {
+            if (clip[2*v] >= clip[2*v+1]) continue;
+            row = (baseY + v)*width + baseX + clip[2*v];
+            kern->add(grid + row, fstamp + v*side + clip[2*v], weight, clip[2*v+1] - clip[2*v]);
+        } //for v
+    } // for n
+
+    free(clip);
+}
+
+//build the bucketed stamps the points, or those listed in subset, use, so
+//that threads stamping them only ever read them
+void prepareStamps(struct info *inf, struct stamp *st, float *points, int cPoints,
+                   unsigned int *subset, int cSubset, int weighted, int threads)
+{
+    int cStamps = (st->subpixel+1)*(st->subpixel+1);
+    char *needed = (char *)calloc(cStamps, sizeof(char));
+    int baseX = 0;
+    int baseY = 0;
+    int i = 0;
+    int m = 0;
+    int n = 0;
+    struct point pt = {0};
+    struct point offset = {0};
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == subset) cSubset = cPoints / inc;
+    for(m = 0; m < cSubset; m++)
+    {
+        n = (NULL == subset) ? m : (int)subset[m];
+        pt.x = points[n*inc];
+        pt.y = points[n*inc+1];
+        pt = translate(inf, pt);
+        if (!onCanvas(inf, st, pt)) continue;
+
+        needed[locateBucket(st, pt, &baseX, &baseY, &offset)] = 1;
+    }
+
+    #pragma omp parallel for schedule(dynamic) num_threads(threads)
+    for (i = 0; i < cStamps; i++)
+    {
+        if (needed[i]) getStamp(st, i);
+    }
+
+    free(needed);
+}
+
+//file the points whose stamp reaches each band of bandHeight rows, band b's
+//being indices[offsets[b]] to indices[offsets[b+1] - 1] in point order.  a
+//point is filed in every band it reaches.  called twice: with indices NULL
+//it fills in offsets, then given those it fills in indices.  returns the
+//number of indices.
+unsigned int bandPoints(struct info *inf, struct stamp *st, float *points, int cPoints,
+                        unsigned int *subset, int cSubset, int weighted,
+                        int cBands, int bandHeight, unsigned int *offsets, unsigned int *indices)
+{
+    unsigned int *next = NULL;
+    int baseX = 0;
+    int baseY = 0;
+    int first = 0;
+    int last = 0;
+    int b = 0;
+    int m = 0;
+    int n = 0;
+    struct point pt = {0};
+    struct point offset = {0};
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == subset) cSubset = cPoints / inc;
+    if (NULL == indices)
+        memset(offsets, 0, (cBands + 1) * sizeof(unsigned int));
+    else
+    {
+        next = (unsigned int *)malloc((cBands + 1) * sizeof(unsigned int));
+        memcpy(next, offsets, (cBands + 1) * sizeof(unsigned int));
+    }
+
+    for(m = 0; m < cSubset; m++)
+    {
+        n = (NULL == subset) ? m : (int)subset[m];
+        pt.x = points[n*inc];
+        pt.y = points[n*inc+1];
+        pt = translate(inf, pt);
+        if (!onCanvas(inf, st, pt)) continue;
+
+        locateStamp(st, pt, &baseX, &baseY, &offset);
+        first = baseY < 0 ? 0 : baseY / bandHeight;
+        last = (baseY + st->side - 1) / bandHeight;
+        if (last >= cBands) last = cBands - 1;
+        //counted shifted by one so the running sum gives the start of each band
+        for (b = first; b <= last; b++)
+        {
+            if (NULL == indices)
+                offsets[b+1]++;
+            else
+                indices[next[b]++] = n;
+        }
+    }
+
+    if (NULL == indices)
+    {
+        for (b = 0; b < cBands; b++) offsets[b+1] += offsets[b];
+    }
+    free(next);
+    return offsets[cBands];
+}
+
+//bin points into horizontal bands of the image by the rows their stamp
+//touches, then stamp each band on its own thread.  points keep their order
+//within a band so the output is identical to a single threaded pass.
+void stampBands(struct info *inf, struct stamp *st, float *points, int cPoints,
+                unsigned int *subset, int cSubset, int weighted, unsigned int *repeats,
+                void *pixels, int threads)
+{
+    int height = inf->height;
+    int cBands = threads * 4;
+    int bandHeight = 0;
+    unsigned int *offsets = NULL;
+    unsigned int *indices = NULL;
+    int b = 0;
+
+    if (cBands > height) cBands = height;
+    //pick the kernels before the threads want them
+    getSimd();
+    bandHeight = (height + cBands - 1) / cBands;
+
+    offsets = (unsigned int *)malloc((cBands + 1) * sizeof(unsigned int));
+    indices = (unsigned int *)malloc((bandPoints(inf, st, points, cPoints, subset, cSubset, weighted,
+                                                 cBands, bandHeight, offsets, NULL) + 1) *
+                                     sizeof(unsigned int));
+    bandPoints(inf, st, points, cPoints, subset, cSubset, weighted, cBands, bandHeight,
+               offsets, indices);
+    if (st->kind == STAMP_INTENSITY)
+        prepareStamps(inf, st, points, cPoints, subset, cSubset, weighted, threads);
+
+    #pragma omp parallel for schedule(dynamic) num_threads(threads)
+    for (b = 0; b < cBands; b++)
+    {
+        int rowEnd = (b+1)*bandHeight < height ? (b+1)*bandHeight : height;
+
+        if (st->kind == STAMP_INTENSITY)
+            addPoints(inf, st, points, cPoints, indices + offsets[b],
+                      offsets[b+1] - offsets[b], weighted, (float *)pixels,
+                      b*bandHeight, rowEnd);
+        else
+            stampPoints(inf, st, points, cPoints, indices + offsets[b],
+                        offsets[b+1] - offsets[b], weighted, repeats,
+                        (unsigned char *)pixels, b*bandHeight, rowEnd);
+    }
+
+    free(indices);
+    free(offsets);
+}
+
+//a point as sorted by aggregatePoints(), key being the cell it lands in
+struct cell
+{
+    unsigned long long key;
+    float weight;
+    unsigned int index;
+};
+
+int compareCells(const void *a, const void *b)
+{
+    const struct cell *ca = (const struct cell *)a;
+    const struct cell *cb = (const struct cell *)b;
+
+    if (ca->key != cb->key) return (ca->key < cb->key) ? -1 : 1;
+    if (ca->weight != cb->weight) return (ca->weight < cb->weight) ? -1 : 1;
+    if (ca->index != cb->index) return (ca->index < cb->index) ? -1 : 1;
+    return 0;
+}
+
+//the cell of a translated point, its 1/AGGREGATE_SUBPIXEL of a pixel per
+//axis.  floored, so a cell never straddles two pixels: its points share a
+//stamp base and reach the same rows.
+unsigned long long cellKey(struct point pt)
+{
+    unsigned int cx = (unsigned int)(int)floor(pt.x * AGGREGATE_SUBPIXEL);
+    unsigned int cy = (unsigned int)(int)floor(pt.y * AGGREGATE_SUBPIXEL);
+
+    return ((unsigned long long)cy << 32) | cx;
+}
+
+//the point that translates to the centre of the cell of the translated point
+//pt, or orig where float rounding puts that centre in another cell
+struct point cellCentre(struct info *inf, struct point pt, struct point orig)
+{
+    double sx = (floor(pt.x * AGGREGATE_SUBPIXEL) + 0.5) / AGGREGATE_SUBPIXEL;
+    double sy = (floor(pt.y * AGGREGATE_SUBPIXEL) + 0.5) / AGGREGATE_SUBPIXEL;
+    struct point centre = {0};
+
+    //translate() undone
+    centre.x = (float)(inf->minX + sx / inf->width * ((double)inf->maxX - inf->minX));
+    centre.y = (float)(inf->minY + (1 - sy / inf->height) * ((double)inf->maxY - inf->minY));
+    if (cellKey(translate(inf, centre)) != cellKey(pt)) return orig;
+    return centre;
+}
+
+//merge the points, or those listed in subset, that land in the same cell of
+//1/AGGREGATE_SUBPIXEL of a pixel once translated.  *merged receives one point
+//per cell in the layout of weighted, in the order of the first point of each.
+//a cell of several points is stamped at its centre, which moves each of them
+//by up to 1/(2*AGGREGATE_SUBPIXEL) of a pixel per axis, while a point alone in
+//its cell stays put, so without near duplicates nothing changes.  with sum
+//the cell is given the total weight of its points (and so is always
+//weighted), otherwise only points of equal weight are merged and *repeats
+//receives how many each cell stands for.  points off the canvas are dropped.
+//returns the number of cells.
+int aggregatePoints(struct info *inf, struct stamp *st, float *points, int cPoints,
+                    unsigned int *subset, int cSubset, int weighted, int sum,
+                    float **merged, unsigned int **repeats)
+{
+    struct cell *cells = NULL;
+    struct cell *firsts = NULL;
+    int cCells = 0;
+    int cMerged = 0;
+    int outInc = (weighted || sum) ? 3 : 2;
+    int i = 0;
+    int m = 0;
+    int n = 0;
+    struct point pt = {0};
+    struct point orig = {0};
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == subset) cSubset = cPoints / inc;
+    cells = (struct cell *)malloc((cSubset + 1) * sizeof(struct cell));
+
+    for(m = 0; m < cSubset; m++)
+    {
+        n = (NULL == subset) ? m : (int)subset[m];
+        pt.x = points[n*inc];
+        pt.y = points[n*inc+1];
+        pt = translate(inf, pt);
+        if (!onCanvas(inf, st, pt)) continue;
+
+        cells[cCells].key = cellKey(pt);
+        //summed weights don't need telling apart
+        cells[cCells].weight = (weighted && !sum) ? points[n*inc+2] : 1.f;
+        cells[cCells].index = n;
+        cCells++;
+    }
+
+    qsort(cells, cCells, sizeof(struct cell), compareCells);
+
+    //runs of equal cells are merged into the first point of the run, which
+    //stands for the rest.  firsts holds that point and where the run starts,
+    //sorted back into point order.
+    firsts = (struct cell *)malloc((cCells + 1) * sizeof(struct cell));
+    for(m = 0; m < cCells; m = n)
+    {
+        for(n = m; n < cCells && cells[n].key == cells[m].key &&
+                   (sum || cells[n].weight == cells[m].weight); n++);
+        firsts[cMerged].key = cells[m].index;
+        firsts[cMerged].weight = 0.f;
+        firsts[cMerged].index = m;
+        cMerged++;
+    }
+    qsort(firsts, cMerged, sizeof(struct cell), compareCells);
+
+    *merged = (float *)malloc((cMerged + 1) * outInc * sizeof(float));
+    *repeats = sum ? NULL : (unsigned int *)malloc((cMerged + 1) * sizeof(unsigned int));
+
+    for(i = 0; i < cMerged; i++)
+    {
+        m = firsts[i].index;
+        n = (int)firsts[i].key * inc;
+        if (sum)
+        {
+            (*merged)[i*outInc+2] = 0.f;
+            for(n = m; n < cCells && cells[n].key == cells[m].key; n++)
+                (*merged)[i*outInc+2] += weighted ? points[cells[n].index*inc+2] : 1.f;
+        }
+        else
+        {
+            if (weighted) (*merged)[i*outInc+2] = points[n+2];
+            for(n = m; n < cCells && cells[n].key == cells[m].key &&
+                       cells[n].weight == cells[m].weight; n++);
+            (*repeats)[i] = n - m;
+        }
+
+        orig.x = points[cells[m].index*inc];
+        orig.y = points[cells[m].index*inc+1];
+        pt = (n - m > 1) ? cellCentre(inf, translate(inf, orig), orig) : orig;
+        (*merged)[i*outInc] = pt.x;
+        (*merged)[i*outInc+1] = pt.y;
+    }
+
+    free(firsts);
+    free(cells);
+    return cMerged;
+}
+
+void stampDensity(struct info *inf, float *points, int cPoints,
+                  unsigned int *subset, int cSubset, int weighted, int aggregate,
+                  unsigned char *pixels, int threads);
+
+unsigned char* calcDensity(struct info *inf, float *points, int cPoints, int weighted, int threads)
+{
+    int cPixels = inf->cPixels;
+    
+    unsigned char* pixels = (unsigned char *)malloc(cPixels*sizeof(char)); 
+
+    int i = 0;
+
+    // initialize image data to white
+    for(i = 0; i < cPixels; i++) 
+    {
+        pixels[i] = 0xff;
+    }
+
+    stampDensity(inf, points, cPoints, NULL, 0, weighted, 0, pixels, threads);
+
+    return pixels;
+}
+
+//stamp every point, or those listed in subset, onto pixels as left by earlier
+//calls.  stamping points in several calls gives the same image as stamping
+//them all at once.  with aggregate points of the same weight landing within
+//1/AGGREGATE_SUBPIXEL of a pixel of each other are merged by aggregatePoints()
+//and stamped once for all of them, which differs from stamping them one by
+//one in how the levels round and in the up to 1/(2*AGGREGATE_SUBPIXEL) pixel
+//the cell's stamp is moved by.
+void stampDensity(struct info *inf, float *points, int cPoints,
+                  unsigned int *subset, int cSubset, int weighted, int aggregate,
+                  unsigned char *pixels, int threads)
+{
+    struct stamp st = {0};
+    float *merged = NULL;
+    unsigned int *repeats = NULL;
+
+    initStamp(&st, inf->dotsize, weighted ? STAMP_FALLOFF : STAMP_PIXVAL);
+
+    if (aggregate)
+    {
+        cPoints = aggregatePoints(inf, &st, points, cPoints, subset, cSubset, weighted, 0,
+                                  &merged, &repeats) * (weighted ? 3 : 2);
+        points = merged;
+        subset = NULL;
+    }
+
+    if (threads > 1)
+        stampBands(inf, &st, points, cPoints, subset, cSubset, weighted, repeats, pixels, threads);
+    else
+        stampPoints(inf, &st, points, cPoints, subset, cSubset, weighted, repeats, pixels, 0, inf->height);
+
+    free(merged);
+    free(repeats);
+    freeStamp(&st);
+}
+
+//add the intensity of every point, or those listed in subset, to grid, which
+//is not cleared first so grids accumulated from separate sets of points can
+//simply be summed.  with aggregate points landing in the same cell are added
+//once with their weights summed, see aggregatePoints().
+void calcIntensity(struct info *inf, float *points, int cPoints,
+                   unsigned int *subset, int cSubset, int weighted, int aggregate,
+                   float *grid, int threads)
+{
+    struct stamp st = {0};
+    float *merged = NULL;
+    unsigned int *repeats = NULL;
+
+    initStamp(&st, inf->dotsize, STAMP_INTENSITY);
+
+    if (aggregate)
+    {
+        cPoints = aggregatePoints(inf, &st, points, cPoints, subset, cSubset, weighted, 1,
+                                  &merged, &repeats) * 3;
+        points = merged;
+        subset = NULL;
+        weighted = 1;
+    }
+
+    if (threads > 1)
+        stampBands(inf, &st, points, cPoints, subset, cSubset, weighted, NULL, grid, threads);
+    else
+        addPoints(inf, &st, points, cPoints, subset, cSubset, weighted, grid, 0, inf->height);
+
+    free(merged);
+    freeStamp(&st);
+}
+
+//the intensity to scale to so that no more than target pixels come out
+//saturated, as near to target as the bins tell.  bins hold the non empty
+//pixels by intensity up to maxI, see normalize().
+float saturationClip(unsigned int *bins, float maxI, float target)
+{
+    unsigned int seen = 0;
+    int bin = 0;
+
+    for(bin = NORMALIZE_BINS - 1; bin > 0; bin--)
+    {
+        if (seen + bins[bin] > target) break;
+        seen += bins[bin];
+    }
+
+    //the pixels from bin + 1 up are within target, their lowest intensity is
+    //scaled onto the last saturated level: scaled * 255 + 0.5 >= 256 - 16
+    return maxI * (bin + 1) / (NORMALIZE_BINS - 1) *
+           255.f / (255.5f - SATURATED_LEVEL);
+}
+
+//map accumulated intensities onto pixel values 0 - 255 in the same sense as
+//calcDensity, 255 for no intensity down to 0 for the maximum.  with
+//NORMALIZE_PERCENTILE intensities above that percentile of the non empty
+//pixels are clipped to the maximum, with NORMALIZE_SATURATION the clip is
+//picked so that value percent of all the pixels come out saturated.
+//minI and maxI receive the lowest and highest intensity of the non empty
+//pixels, before any clipping.
+unsigned char *normalize(struct info *inf, float *grid, int mode, float value,
+                         float *minI, float *maxI)
+{
+    int cPixels = inf->cPixels;
+    unsigned char *pixels = (unsigned char *)malloc(cPixels*sizeof(char));
+    unsigned int *bins = NULL;
+    unsigned int cNonEmpty = 0;
+    unsigned int seen = 0;
+    float low = 0.0;
+    float high = 0.0;
+    float scale = 0.0;
+    float scaled = 0.0;
+    float v = 0.0;
+    int i = 0;
+    int bin = 0;
+
+    for(i = 0; i < cPixels; i++)
+    {
+        if (grid[i] > high) high = grid[i];
+        if (grid[i] > 0 && (grid[i] < low || low == 0)) low = grid[i];
+    }
+    *minI = low;
+    *maxI = scale = high;
+
+    if ((mode == NORMALIZE_PERCENTILE || mode == NORMALIZE_SATURATION) && high > 0)
+    {
+        bins = (unsigned int *)calloc(NORMALIZE_BINS, sizeof(unsigned int));
+        for(i = 0; i < cPixels; i++)
+        {
+            if (grid[i] <= 0) continue;
+            bin = (int)(grid[i] / high * (NORMALIZE_BINS - 1));
+            bins[bin]++;
+            cNonEmpty++;
+        }
+        if (mode == NORMALIZE_SATURATION)
+            scale = saturationClip(bins, high, value / 100.f * cPixels);
+        else
+        {
+            for(bin = 0; bin < NORMALIZE_BINS; bin++)
+            {
+                seen += bins[bin];
+                if (seen >= cNonEmpty * (value / 100.f)) break;
+            }
+            if (bin < NORMALIZE_BINS - 1) scale = high * (bin + 1) / (NORMALIZE_BINS - 1);
+        }
+        free(bins);
+    }
+
+    for(i = 0; i < cPixels; i++)
+    {
+        v = grid[i];
+        if (v <= 0 || scale <= 0)
+        {
+            pixels[i] = 0xff;
+            continue;
+        }
+
+        if (mode == NORMALIZE_LOG)
+            scaled = log1p(v) / log1p(scale);
+        else
+            scaled = v / scale;
+        if (scaled > 1) scaled = 1;
+
+        pixels[i] = (unsigned char)(255 - (int)(scaled * 255 + 0.5f));
+    }
+
+    return pixels;
+}
+
+//pixels colorized by one kernel call
+#define COLORIZE_CHUNK 65536
+
+//what colorizing found, for callers to report on or tune with.  levels are
+//the pixel values colorized, 0 the densest and 255 empty.  the intensities
+//are those of the grid for colorizeGrid() and the density 255 - level for
+//colorizePixels(), both 0 without any.
+struct diagnostics
+{
+    float saturation;               //fraction of the pixels saturated
+    unsigned int saturated;         //pixels below SATURATED_LEVEL, over 95% density
+    unsigned int touched;           //pixels with any density at all
+    float minIntensity;             //lowest intensity of those
+    float maxIntensity;             //highest intensity of those
+    unsigned int histogram[256];    //pixels per level
+};
+
+//adds the count of every level in levels to histogram, which other threads
+//may be adding to as well
+void countLevels(const unsigned char *levels, int count, unsigned int *histogram)
+{
+    //four sets of counts so runs of the same level don't wait on each other
+    unsigned int counts[4][256];
+    int i = 0;
+    int level = 0;
+
+    memset(counts, 0, sizeof(counts));
+    for(i = 0; i + 4 <= count; i += 4)
+    {
+        counts[0][levels[i]]++;
+        counts[1][levels[i+1]]++;
+        counts[2][levels[i+2]]++;
+        counts[3][levels[i+3]]++;
+    }
+    for(; i < count; i++)
+        counts[0][levels[i]]++;
+
+    #pragma omp critical
+    for(level = 0; level < 256; level++)
+        histogram[level] += counts[0][level] + counts[1][level] + counts[2][level] + counts[3][level];
+}
+
+//lut holds the color of each of the 256 density levels as one packed RGBA
+//word, laid out in memory as the bytes r, g, b, a with the opacity already
+//applied, so every pixel is a single 32 bit load and store.  diag, if not
+//NULL, receives the struct diagnostics of pixels_bw bar the intensities.
+unsigned char *colorize(struct info *inf, unsigned char* pixels_bw, unsigned int *lut,
+                        unsigned char* pixels_color, int threads, struct diagnostics *diag)
+{
+    int cPixels = inf->cPixels;
+    unsigned int *words = (unsigned int *)pixels_color;
+
+    struct kernels *kern = NULL;
+    int chunks = (cPixels + COLORIZE_CHUNK - 1) / COLORIZE_CHUNK;
+    int chunk = 0;
+    int start = 0;
+    int count = 0;
+    int highCount = 0;
+
+    getSimd();
+    kern = kernels;
+    if (NULL != diag) memset(diag, 0, sizeof(struct diagnostics));
+
+    //the levels are counted while the chunk is still in cache
+    #pragma omp parallel for private(start, count) reduction(+:highCount) num_threads(threads)
+    for(chunk = 0; chunk < chunks; chunk++)
+    {
+        start = chunk * COLORIZE_CHUNK;
+        count = (cPixels - start < COLORIZE_CHUNK) ? cPixels - start : COLORIZE_CHUNK;
+        highCount += kern->colorize(pixels_bw + start, lut, words + start, count);
+        if (NULL != diag) countLevels(pixels_bw + start, count, diag->histogram);
+    }
+
+    if (NULL != diag)
+    {
+        diag->saturated = highCount;
+        diag->saturation = cPixels > 0 ? (float)highCount / cPixels : 0.f;
+        diag->touched = cPixels - diag->histogram[0xff];
+    }
+
+    return pixels_color;
+}
+
+//pixels with their levels spread out again so that about target of them come
+//out saturated: the densest levels holding as near to target pixels as they
+//can are spread over the saturated levels and the rest over the others, 255
+//staying empty.  pixels of one level can't be told apart, so a level holding
+//more than target on its own is saturated or not as a whole.
+unsigned char *spreadLevels(struct info *inf, unsigned char *pixels, float target, int threads)
+{
+    int cPixels = inf->cPixels;
+    unsigned char *spread = (unsigned char *)malloc(cPixels*sizeof(char));
+    unsigned int histogram[256] = {0};
+    unsigned char table[256];
+    unsigned int seen = 0;
+    int sat = SATURATED_LEVEL;
+    int first = 0;
+    int level = 0;
+    int i = 0;
+
+    countLevels(pixels, cPixels, histogram);
+
+    //levels below first are the densest pixels, up to the level that brings
+    //them nearest to target
+    for(first = 0; first < 0xff && seen + histogram[first] / 2.f <= target; first++)
+        seen += histogram[first];
+
+    for(level = 0; level < 256; level++)
+    {
+        if (level == 0xff)
+            table[level] = 0xff;
+        else if (level < first)
+            table[level] = (unsigned char)(level * sat / first);
+        else
+            table[level] = (unsigned char)(sat + ((level - first) * (0xff - sat) +
+                                                  (0xff - first) / 2) / (0xff - first));
+    }
+
+    #pragma omp parallel for num_threads(threads)
+    for(i = 0; i < cPixels; i++)
+        spread[i] = table[pixels[i]];
+
+    return spread;
+}
+
+// threads <= 0 uses every core, without OpenMP everything runs on one
+int resolveThreads(int threads)
+{
+    #ifdef _OPENMP
+    if (threads <= 0) threads = omp_get_max_threads();
+    #else
+    threads = 1;
+    #endif
+    return threads;
+}
+
+//density and colorize stages in one call.  used, if not NULL, receives the
+//bounds the points were scaled to, found by getBounds() unless overridden,
+//and diag, if not NULL, the struct diagnostics of colorizing.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+unsigned char *tx(float *points, 
+                  int cPoints, 
+                  int w, int h, 
+                  int dotsize, 
+                  unsigned int *lut, 
+                  unsigned char *pix_color, 
+                  int boundsOverride, 
+                  float minX, float minY, float maxX, float maxY, int weighted,
+                  int threads,
+                  struct bounds *used,
+                  struct diagnostics *diag)
+{
+    unsigned char *pixels_bw = NULL;
+    struct info inf = {0};
+
+    //basic sanity checks to keep from segfaulting
+    if (NULL == points || NULL == lut || NULL == pix_color ||
+        w <= 0 || h <= 0 || cPoints <= 1+weighted || cPoints % (2+weighted) != 0 ||
+        dotsize <= 0)
+    {
+        INVALID_PARAMETER();
+        return NULL;
+    }
+    
+    inf.dotsize = dotsize;
+    inf.width = w;
+    inf.height = h;
+    inf.cPixels = w*h;
+    threads = resolveThreads(threads);
+ 
+    // get min/max x/y values from point list
+    if (boundsOverride == 1)
+    {
+        inf.maxX = maxX; inf.minX = minX;
+        inf.maxY = maxY; inf.minY = minY;
+    }
+    else
+    {
+        getBounds(&inf, points, cPoints, weighted);
+    }
+
+    #ifdef DEBUG
+    printf("min: (%.2f, %.2f) max: (%.2f, %.2f)\n", inf.minX, inf.minY, inf.maxX, inf.maxY);
+    #endif
+
+    //so the caller knows the bounds without walking the points again
+    putBounds(&inf, used);
+
+    //iterate through points, place a dot at each center point
+    //and set pix value from 0 - 255 using multiply method for radius [dotsize].
+    pixels_bw = calcDensity(&inf, points, cPoints, weighted, threads);
+
+    //using provided color scheme lookup table, update pixel value to RGBA values
+    pix_color = colorize(&inf, pixels_bw, lut, pix_color, threads, diag);
+
+    free(pixels_bw);
+    pixels_bw = NULL;
+
+    //return list of RGBA values
+    return pix_color;
+}
+
+//additive density stage: adds the intensity of the points to grid, a w*h
+//float array the caller has zeroed or accumulated into before.  a non NULL
+//subset limits it to the cSubset points listed there, aggregate merges
+//points sharing a stamp first, see calcIntensity().
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int accumulate(float *points,
+               int cPoints,
+               int w, int h,
+               int dotsize,
+               int boundsOverride,
+               float minX, float minY, float maxX, float maxY, int weighted,
+               float *grid,
+               int threads,
+               unsigned int *subset, int cSubset,
+               int aggregate)
+{
+    struct info inf = {0};
+
+    if (NULL == points || NULL == grid ||
+        w <= 0 || h <= 0 || cPoints <= 1+weighted || cPoints % (2+weighted) != 0 ||
+        dotsize <= 0)
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+
+    inf.dotsize = dotsize;
+    inf.width = w;
+    inf.height = h;
+    inf.cPixels = w*h;
+
+    if (boundsOverride == 1)
+    {
+        inf.maxX = maxX; inf.minX = minX;
+        inf.maxY = maxY; inf.minY = minY;
+    }
+    else
+    {
+        getBounds(&inf, points, cPoints, weighted);
+    }
+
+    calcIntensity(&inf, points, cPoints, subset, cSubset, weighted, aggregate, grid,
+                  resolveThreads(threads));
+    return 1;
+}
+
+//colorize stage for an accumulated intensity grid, normalized once here
+//with one of NORMALIZE_*.  value is the percentile for NORMALIZE_PERCENTILE
+//and the percent of pixels to saturate for NORMALIZE_SATURATION.  diag, if not
+//NULL, receives the struct diagnostics.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+unsigned char *colorizeGrid(float *grid,
+                            int w, int h,
+                            unsigned int *lut,
+                            unsigned char *pix_color,
+                            int mode, float value,
+                            int threads,
+                            struct diagnostics *diag)
+{
+    unsigned char *pixels_bw = NULL;
+    struct info inf = {0};
+    float minI = 0.0;
+    float maxI = 0.0;
+
+    if (NULL == grid || NULL == lut || NULL == pix_color || w <= 0 || h <= 0 ||
+        mode < NORMALIZE_LINEAR || mode > NORMALIZE_SATURATION ||
+        value < 0 || value > 100 || (mode == NORMALIZE_PERCENTILE && value == 0))
+    {
+        INVALID_PARAMETER();
+        return NULL;
+    }
+
+    inf.width = w;
+    inf.height = h;
+    inf.cPixels = w*h;
+
+    pixels_bw = normalize(&inf, grid, mode, value, &minI, &maxI);
+    pix_color = colorize(&inf, pixels_bw, lut, pix_color, resolveThreads(threads), diag);
+    if (NULL != diag)
+    {
+        diag->minIntensity = minI;
+        diag->maxIntensity = maxI;
+    }
+
+    free(pixels_bw);
+    pixels_bw = NULL;
+
+    return pix_color;
+}
+
+//multiply density stage: stamps the points onto pixels, a w*h buffer the
+//caller has set to 0xff or stamped into before.  a non NULL subset limits it
+//to the cSubset points listed there, aggregate merges points sharing a stamp
+//first, see stampDensity().
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int multiply(float *points,
+             int cPoints,
+             int w, int h,
+             int dotsize,
+             int boundsOverride,
+             float minX, float minY, float maxX, float maxY, int weighted,
+             unsigned char *pixels,
+             int threads,
+             unsigned int *subset, int cSubset,
+             int aggregate)
+{
+    struct info inf = {0};
+
+    if (NULL == points || NULL == pixels ||
+        w <= 0 || h <= 0 || cPoints <= 1+weighted || cPoints % (2+weighted) != 0 ||
+        dotsize <= 0)
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+
+    inf.dotsize = dotsize;
+    inf.width = w;
+    inf.height = h;
+    inf.cPixels = w*h;
+
+    if (boundsOverride == 1)
+    {
+        inf.maxX = maxX; inf.minX = minX;
+        inf.maxY = maxY; inf.minY = minY;
+    }
+    else
+    {
+        getBounds(&inf, points, cPoints, weighted);
+    }
+
+    stampDensity(&inf, points, cPoints, subset, cSubset, weighted, aggregate, pixels,
+                 resolveThreads(threads));
+    return 1;
+}
+
+//how many of the points, or of those listed in subset, the density stage
+//drops for falling off the image: with dotsize > 0 the points whose dots
+//miss it entirely as multiply() and accumulate() do, otherwise the points
+//more than pad pixels off it as histogram() does.  points that aren't
+//finite are dropped too.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int offCanvas(float *points,
+              int cPoints,
+              int w, int h,
+              int dotsize, int pad,
+              float minX, float minY, float maxX, float maxY, int weighted,
+              unsigned int *subset, int cSubset)
+{
+    struct info inf = {0};
+    struct stamp st = {0};
+    struct point pt = {0};
+    int culled = 0;
+    int i = 0;
+    int n = 0;
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == points || w <= 0 || h <= 0 || cPoints % (2+weighted) != 0)
+    {
+        INVALID_PARAMETER();
+        return -1;
+    }
+
+    inf.width = w;
+    inf.height = h;
     inf.cPixels = w*h;
- 
-    // get min/max x/y values from point list
+    inf.maxX = maxX; inf.minX = minX;
+    inf.maxY = maxY; inf.minY = minY;
+    //only the size of the stamp is needed, none are built
+    if (dotsize > 0) initStamp(&st, dotsize, STAMP_PIXVAL);
+
+    if (NULL == subset) cSubset = cPoints / inc;
+
+    for(n = 0; n < cSubset; n++)
+    {
+        i = (NULL == subset) ? n*inc : (int)subset[n]*inc;
+        pt.x = points[i];
+        pt.y = points[i+1];
+        pt = translate(&inf, pt);
+        if (dotsize > 0)
+            culled += !onCanvas(&inf, &st, pt);
+        else
+            culled += !(pt.x >= -pad && pt.x < w + pad && pt.y >= -pad && pt.y < h + pad);
+    }
+
+    if (dotsize > 0) freeStamp(&st);
+    return culled;
+}
+
+//info and stamp of a density stage drawn apart from tx(), bounds given
+void shardInfo(struct info *inf, struct stamp *st, int w, int h, int dotsize,
+               float minX, float minY, float maxX, float maxY, int kind)
+{
+    inf->dotsize = dotsize;
+    inf->width = w;
+    inf->height = h;
+    inf->cPixels = w*h;
+    inf->maxX = maxX; inf->minX = minX;
+    inf->maxY = maxY; inf->minY = minY;
+    initStamp(st, dotsize, kind);
+}
+
+//bins the points into cBands bands of (h + cBands - 1) / cBands rows by the
+//rows their stamp reaches, for densityRows() to draw each band from its own
+//points alone.  offsets (cBands + 1 of them) receives where each band's points
+//start in indices, and indices, if not NULL, the point indices of each band in
+//point order.  call it with indices NULL first to learn how many there are.
+//returns that number, -1 on invalid parameters.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int shardPoints(float *points,
+                int cPoints,
+                int w, int h,
+                int dotsize,
+                float minX, float minY, float maxX, float maxY, int weighted,
+                int cBands,
+                unsigned int *offsets,
+                unsigned int *indices)
+{
+    struct info inf = {0};
+    struct stamp st = {0};
+    int count = 0;
+
+    if (NULL == points || NULL == offsets || w <= 0 || h <= 0 || cPoints < 0 ||
+        cPoints % (2+weighted) != 0 || dotsize <= 0 || cBands <= 0 || cBands > h)
+    {
+        INVALID_PARAMETER();
+        return -1;
+    }
+
+    shardInfo(&inf, &st, w, h, dotsize, minX, minY, maxX, maxY, STAMP_PIXVAL);
+    count = (int)bandPoints(&inf, &st, points, cPoints, NULL, 0, weighted,
+                            cBands, (h + cBands - 1) / cBands, offsets, indices);
+    freeStamp(&st);
+    return count;
+}
+
+//how many stamps multiply() or accumulate() with additive lay with aggregate
+//for the points, or those listed in subset: one per cell aggregatePoints()
+//merges the points on the canvas into.  returns -1 on invalid parameters.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int countCells(float *points,
+               int cPoints,
+               int w, int h,
+               int dotsize,
+               float minX, float minY, float maxX, float maxY, int weighted,
+               int additive,
+               unsigned int *subset, int cSubset)
+{
+    struct info inf = {0};
+    struct stamp st = {0};
+    float *merged = NULL;
+    unsigned int *repeats = NULL;
+    int count = 0;
+
+    if (NULL == points || w <= 0 || h <= 0 || cPoints < 0 || cPoints % (2+weighted) != 0 ||
+        dotsize <= 0)
+    {
+        INVALID_PARAMETER();
+        return -1;
+    }
+
+    shardInfo(&inf, &st, w, h, dotsize, minX, minY, maxX, maxY, STAMP_PIXVAL);
+    count = aggregatePoints(&inf, &st, points, cPoints, subset, cSubset, weighted, additive,
+                            &merged, &repeats);
+
+    free(merged);
+    free(repeats);
+    freeStamp(&st);
+    return count;
+}
+
+//density stage of the rows [rowStart, rowEnd) alone: stamps the points, or
+//the cSubset of them listed in subset, onto those rows of pixels, w*h bytes as
+//for multiply(), or adds them to those rows of a w*h float grid as for
+//accumulate() with additive.  the other rows are left untouched.  the rows
+//come out exactly as multiply() or accumulate() would draw them with the same
+//bounds, so separate processes can each draw a band of one shared image from
+//the points shardPoints() filed for it.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int densityRows(float *points,
+                int cPoints,
+                int w, int h,
+                int dotsize,
+                float minX, float minY, float maxX, float maxY, int weighted,
+                int additive, int aggregate,
+                void *pixels,
+                int rowStart, int rowEnd,
+                unsigned int *subset, int cSubset)
+{
+    struct info inf = {0};
+    struct stamp st = {0};
+    float *merged = NULL;
+    unsigned int *repeats = NULL;
+
+    if (NULL == points || NULL == pixels ||
+        w <= 0 || h <= 0 || cPoints <= 1+weighted || cPoints % (2+weighted) != 0 ||
+        dotsize <= 0 || (NULL != subset && cSubset < 0))
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+
+    if (rowStart < 0) rowStart = 0;
+    if (rowEnd > h) rowEnd = h;
+    if (rowStart >= rowEnd || (NULL != subset && cSubset == 0)) return 1;
+
+    shardInfo(&inf, &st, w, h, dotsize, minX, minY, maxX, maxY,
+              additive ? STAMP_INTENSITY : (weighted ? STAMP_FALLOFF : STAMP_PIXVAL));
+
+    //merged the same way as stampDensity() and calcIntensity() do.  the
+    //points of a cell and its centre share a stamp base so they all reach
+    //the rows or none do, merging just the subset gives the same rows.
+    if (aggregate)
+    {
+        cPoints = aggregatePoints(&inf, &st, points, cPoints, subset, cSubset, weighted, additive,
+                                  &merged, &repeats) * ((weighted || additive) ? 3 : 2);
+        points = merged;
+        subset = NULL;
+        if (additive) weighted = 1;
+    }
+
+    if (additive)
+        addPoints(&inf, &st, points, cPoints, subset, cSubset, weighted, (float *)pixels,
+                  rowStart, rowEnd);
+    else
+        stampPoints(&inf, &st, points, cPoints, subset, cSubset, weighted, repeats,
+                    (unsigned char *)pixels, rowStart, rowEnd);
+
+    free(merged);
+    free(repeats);
+    freeStamp(&st);
+    return 1;
+}
+
+//colorize stage for pixels built by multiply().  they are colorized as they
+//are but for NORMALIZE_SATURATION, which spreads their levels out so that
+//value percent of them come out saturated.  diag, if not NULL, receives the
+//struct diagnostics.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+unsigned char *colorizePixels(unsigned char *pixels,
+                              int w, int h,
+                              unsigned int *lut,
+                              unsigned char *pix_color,
+                              int mode, float value,
+                              int threads,
+                              struct diagnostics *diag)
+{
+    struct info inf = {0};
+    unsigned char *spread = NULL;
+    int level = 0;
+
+    if (NULL == pixels || NULL == lut || NULL == pix_color || w <= 0 || h <= 0 ||
+        mode < NORMALIZE_LINEAR || mode > NORMALIZE_SATURATION || value < 0 || value > 100)
+    {
+        INVALID_PARAMETER();
+        return NULL;
+    }
+
+    inf.width = w;
+    inf.height = h;
+    inf.cPixels = w*h;
+
+    threads = resolveThreads(threads);
+
+    if (mode == NORMALIZE_SATURATION)
+    {
+        spread = spreadLevels(&inf, pixels, value / 100.f * inf.cPixels, threads);
+        pixels = spread;
+    }
+
+    pix_color = colorize(&inf, pixels, lut, pix_color, threads, diag);
+    free(spread);
+
+    if (NULL != diag && diag->touched > 0)
+    {
+        for(level = 0; diag->histogram[level] == 0; level++);
+        diag->maxIntensity = (float)(0xff - level);
+        for(level = 0xfe; diag->histogram[level] == 0; level--);
+        diag->minIntensity = (float)(0xff - level);
+    }
+    return pix_color;
+}
+
+//box blurs run by blurGrid(), three come close enough to a gaussian
+#define GAUSSIAN_PASSES 3
+
+//radii of the GAUSSIAN_PASSES box blurs that together approximate a gaussian
+//of sigma, boxes of two neighbouring odd widths mixed so the variances add
+//up to sigma^2.  returns the sum, how far the blur reaches in pixels.
+int gaussianBoxes(float sigma, int *radii)
+{
+    int n = GAUSSIAN_PASSES;
+    float ideal = sqrt(12.f*sigma*sigma/n + 1);
+    int lower = (int)floor(ideal);
+    int m = 0;
+    int reach = 0;
+    int i = 0;
+
+    if (lower % 2 == 0) lower--;
+    if (lower < 1) lower = 1;
+    m = (int)floor((12.f*sigma*sigma - n*lower*lower - 4*n*lower - 3*n) / (-4.f*lower - 4) + 0.5f);
+
+    for (i = 0; i < n; i++)
+    {
+        radii[i] = (i < m) ? (lower - 1) / 2 : (lower + 1) / 2;
+        reach += radii[i];
+    }
+    return reach;
+}
+
+//columns blurred together by blurGrid(), walking them a row at a time
+#define BLUR_COLUMNS 256
+
+//box blur of radius r along a row of count values.  the window sum is kept
+//in double, and reset whenever the window only holds zeros so empty areas
+//stay exactly empty.
+void blurRow(const float *src, float *dst, int count, int r)
+{
+    double sum = 0.0;
+    double norm = 1.0 / (2*r + 1);
+    int nonZero = 0;
+    int i = 0;
+
+    for (i = 0; i < r && i < count; i++)
+    {
+        sum += src[i];
+        nonZero += (src[i] != 0);
+    }
+    for (i = 0; i < count; i++)
+    {
+        if (i + r < count)
+        {
+            sum += src[i + r];
+            nonZero += (src[i + r] != 0);
+        }
+        if (i - r - 1 >= 0)
+        {
+            sum -= src[i - r - 1];
+            nonZero -= (src[i - r - 1] != 0);
+        }
+        if (nonZero == 0) sum = 0.0;
+        dst[i] = (float)(sum * norm);
+    }
+}
+
+//blurRow() down columns x0 to x1 of a width*height grid, with a window per
+//column so the grid is still read row by row
+void blurColumns(const float *src, float *dst, int width, int height, int x0, int x1, int r)
+{
+    double sums[BLUR_COLUMNS];
+    int nonZero[BLUR_COLUMNS];
+    double norm = 1.0 / (2*r + 1);
+    const float *row = NULL;
+    int x = 0;
+    int y = 0;
+
+    for (x = x0; x < x1; x++)
+    {
+        sums[x - x0] = 0.0;
+        nonZero[x - x0] = 0;
+    }
+    for (y = 0; y < r && y < height; y++)
+    {
+        for (x = x0; x < x1; x++)
+        {
+            sums[x - x0] += src[y*width + x];
+            nonZero[x - x0] += (src[y*width + x] != 0);
+        }
+    }
+    for (y = 0; y < height; y++)
+    {
+        if (y + r < height)
+        {
+            row = src + (y + r)*width;
+            for (x = x0; x < x1; x++)
+            {
+                sums[x - x0] += row[x];
+                nonZero[x - x0] += (row[x] != 0);
+            }
+        }
+        if (y - r - 1 >= 0)
+        {
+            row = src + (y - r - 1)*width;
+            for (x = x0; x < x1; x++)
+            {
+                sums[x - x0] -= row[x];
+                nonZero[x - x0] -= (row[x] != 0);
+            }
+        }
+        for (x = x0; x < x1; x++)
+        {
+            if (nonZero[x - x0] == 0) sums[x - x0] = 0.0;
+            dst[y*width + x] = (float)(sums[x - x0] * norm);
+        }
+    }
+}
+
+//gaussian density stage: adds the weight of every point, or those listed in
+//subset, to the pixel it falls on.  grid is (w+2*pad)*(h+2*pad) floats, the
+//w*h image with a margin of pad pixels all round so points just off the
+//image still blur into it.  like accumulate() the grid is not cleared.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int histogram(float *points,
+              int cPoints,
+              int w, int h,
+              int pad,
+              int boundsOverride,
+              float minX, float minY, float maxX, float maxY, int weighted,
+              float *grid,
+              unsigned int *subset, int cSubset)
+{
+    struct info inf = {0};
+    struct point pt = {0};
+    int width = w + 2*pad;
+    int height = h + 2*pad;
+    float weight = 1.0;
+    float fx = 0.0;
+    float fy = 0.0;
+    int i = 0;
+    int n = 0;
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == points || NULL == grid ||
+        w <= 0 || h <= 0 || pad < 0 || cPoints <= 1+weighted || cPoints % (2+weighted) != 0)
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+
+    inf.width = w;
+    inf.height = h;
+    inf.cPixels = w*h;
+
     if (boundsOverride == 1)
     {
         inf.maxX = maxX; inf.minX = minX;
@@ -239,20 +2449,333 @@ unsigned char *tx(float *points,
         getBounds(&inf, points, cPoints, weighted);
     }
 
-    #ifdef DEBUG
-    printf("min: (%.2f, %.2f) max: (%.2f, %.2f)\n", inf.minX, inf.minY, inf.maxX, inf.maxY);
-    #endif
+    if (NULL == subset) cSubset = cPoints / inc;
 
-    //iterate through points, place a dot at each center point
-    //and set pix value from 0 - 255 using multiply method for radius [dotsize].
-    pixels_bw = calcDensity(&inf, points, cPoints, weighted);
+    for(n = 0; n < cSubset; n++)
+    {
+        i = (NULL == subset) ? n*inc : (int)subset[n]*inc;
+        pt.x = points[i];
+        pt.y = points[i+1];
+        pt = translate(&inf, pt);
 
-    //using provided color scheme and opacity, update pixel value to RGBA values
-    pix_color = colorize(&inf, pixels_bw, scheme, pix_color, opacity);
+        //the pixel a dot would be centered on, NaN fails both tests
+        fx = floor(pt.x) + pad;
+        fy = floor(pt.y) + pad;
+        if (!(fx >= 0 && fx < width && fy >= 0 && fy < height)) continue;
 
-    free(pixels_bw);
-    pixels_bw = NULL;
+        if (weighted) weight = points[i+2];
+        grid[(int)fy*width + (int)fx] += weight;
+    }
 
-    //return list of RGBA values
-    return pix_color;
+    return 1;
+}
+
+//blurs a histogram() grid with a gaussian of sigma pixels and writes the w*h
+//image part of it to out, scaled so a lone point peaks at about its weight.
+//the grid is left as is.  rows and columns are each blurred on their own so
+//the output is the same whatever the thread count.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int blurGrid(float *grid,
+             int w, int h,
+             int pad,
+             float sigma,
+             float *out,
+             int threads)
+{
+    int width = w + 2*pad;
+    int height = h + 2*pad;
+    int radii[GAUSSIAN_PASSES];
+    float *a = NULL;
+    float *b = NULL;
+    float scale = 6.2831853f*sigma*sigma;
+    int blocks = (width + BLUR_COLUMNS - 1) / BLUR_COLUMNS;
+    int block = 0;
+    int pass = 0;
+    int x = 0;
+    int y = 0;
+
+    if (NULL == grid || NULL == out || w <= 0 || h <= 0 || pad < 0 || !(sigma > 0))
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+    if (gaussianBoxes(sigma, radii) > pad)
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+    threads = resolveThreads(threads);
+
+    a = (float *)malloc(width*height*sizeof(float));
+    b = (float *)malloc(width*height*sizeof(float));
+    memcpy(a, grid, width*height*sizeof(float));
+
+    for (pass = 0; pass < GAUSSIAN_PASSES; pass++)
+    {
+        #pragma omp parallel for num_threads(threads)
+        for (y = 0; y < height; y++)
+            blurRow(a + y*width, b + y*width, width, radii[pass]);
+
+        #pragma omp parallel for num_threads(threads)
+        for (block = 0; block < blocks; block++)
+            blurColumns(b, a, width, height, block*BLUR_COLUMNS,
+                        (block + 1)*BLUR_COLUMNS < width ? (block + 1)*BLUR_COLUMNS : width,
+                        radii[pass]);
+    }
+
+    #pragma omp parallel for private(x) num_threads(threads)
+    for (y = 0; y < h; y++)
+    {
+        for (x = 0; x < w; x++)
+            out[y*w + x] = a[(y + pad)*width + x + pad] * scale;
+    }
+
+    free(a);
+    free(b);
+    return 1;
+}
+
+//how far blurGrid() reaches for sigma, the margin its grid needs
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int gaussianReach(float sigma)
+{
+    int radii[GAUSSIAN_PASSES];
+
+    return gaussianBoxes(sigma, radii);
+}
+
+//x,y[,w] float32 points given their coordinates relative to (originX,
+//originY): point n gets xs[n] - originX and ys[n] - originY, worked out in
+//double, its weight left as is.  keeps points far from (0, 0) as precise as
+//float32 is near their origin.  returns 1, 0 on invalid parameters.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int offsetPoints(float *points,
+                 int cPoints,
+                 int weighted,
+                 double *xs, double *ys,
+                 double originX, double originY)
+{
+    int n = 0;
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == points || NULL == xs || NULL == ys || cPoints < 0 || cPoints % inc != 0)
+    {
+        INVALID_PARAMETER();
+        return 0;
+    }
+
+    for (n = 0; n < cPoints / inc; n++)
+    {
+        points[n*inc] = (float)(xs[n] - originX);
+        points[n*inc+1] = (float)(ys[n] - originY);
+    }
+    return 1;
+}
+
+//spatial index: counting sort of the points into a cols x rows grid of cells
+//over [minX, maxX) x [minY, maxY), row 0 at maxY as in the image.  offsets
+//(cols*rows+1 entries) receives where each cell starts in indices, which lists
+//the point indices cell by cell, ascending within a cell.  points off the grid
+//are left out.  returns the number of points binned, -1 on invalid parameters.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int binPoints(float *points,
+              int cPoints,
+              int weighted,
+              float minX, float minY, float maxX, float maxY,
+              int cols, int rows,
+              unsigned int *offsets,
+              unsigned int *indices)
+{
+    double cellW = 0.0;
+    double cellH = 0.0;
+    double fx = 0.0;
+    double fy = 0.0;
+    int cCells = 0;
+    int cell = 0;
+    int n = 0;
+    int pass = 0;
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == points || NULL == offsets || NULL == indices ||
+        cPoints < 0 || cPoints % inc != 0 || cols <= 0 || rows <= 0 ||
+        !(maxX > minX) || !(maxY > minY))
+    {
+        INVALID_PARAMETER();
+        return -1;
+    }
+
+    cCells = cols * rows;
+    cellW = ((double)maxX - minX) / cols;
+    cellH = ((double)maxY - minY) / rows;
+    memset(offsets, 0, (cCells + 1) * sizeof(unsigned int));
+
+    // first pass counts the points per cell (shifted by one so the running
+    // sum gives the start of each cell), second pass files them
+    for (pass = 0; pass < 2; pass++)
+    {
+        for (n = 0; n < cPoints / inc; n++)
+        {
+            fx = (points[n*inc] - (double)minX) / cellW;
+            fy = ((double)maxY - points[n*inc+1]) / cellH;
+            // also rejects NaN and infinite coordinates
+            if (!(fx >= 0 && fx < cols && fy >= 0 && fy < rows)) continue;
+
+            cell = (int)fy * cols + (int)fx;
+            if (pass == 0)
+                offsets[cell+1]++;
+            else
+                indices[offsets[cell]++] = n;
+        }
+
+        if (pass == 0)
+        {
+            for (cell = 0; cell < cCells; cell++) offsets[cell+1] += offsets[cell];
+        }
+    }
+
+    // filing moved every start up to the next cell's, shift them back
+    for (cell = cCells; cell > 0; cell--) offsets[cell] = offsets[cell-1];
+    offsets[0] = 0;
+
+    return offsets[cCells];
+}
+
+int compareIndices(const void *a, const void *b)
+{
+    unsigned int ia = *(const unsigned int *)a;
+    unsigned int ib = *(const unsigned int *)b;
+    return (ia > ib) - (ia < ib);
+}
+
+//collects the point indices binPoints() filed in the cells [col0, col1] x
+//[row0, row1], clipped to the grid, into out in ascending order so the points
+//stamp in their original order.  with out NULL only counts them.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int gatherCells(unsigned int *offsets,
+                unsigned int *indices,
+                int cols, int rows,
+                int col0, int row0, int col1, int row1,
+                unsigned int *out)
+{
+    int count = 0;
+    int row = 0;
+    int first = 0;
+    int last = 0;
+
+    if (NULL == offsets || NULL == indices || cols <= 0 || rows <= 0)
+    {
+        INVALID_PARAMETER();
+        return -1;
+    }
+
+    if (col0 < 0) col0 = 0;
+    if (row0 < 0) row0 = 0;
+    if (col1 >= cols) col1 = cols - 1;
+    if (row1 >= rows) row1 = rows - 1;
+    if (col0 > col1 || row0 > row1) return 0;
+
+    for (row = row0; row <= row1; row++)
+    {
+        first = offsets[row*cols + col0];
+        last = offsets[row*cols + col1 + 1];
+        if (NULL != out)
+            memcpy(out + count, indices + first, (last - first) * sizeof(unsigned int));
+        count += last - first;
+    }
+
+    if (NULL != out && (row1 > row0 || col1 > col0))
+        qsort(out, count, sizeof(unsigned int), compareIndices);
+
+    return count;
+}
+
+int compareKeys(const void *a, const void *b)
+{
+    unsigned long long ka = *(const unsigned long long *)a;
+    unsigned long long kb = *(const unsigned long long *)b;
+    return (ka > kb) - (ka < kb);
+}
+
+//the cells of a cols x rows grid laid out as for binPoints() that any of the
+//points, or of those listed in subset, fall in, for grids far too fine to
+//bin into, e.g. the tiles of a deep zoom level.  out, if not NULL, receives
+//the column and row of each, row by row.  returns the number of cells, -1 on
+//invalid parameters.
+#ifdef WIN32
+__declspec(dllexport)
+#endif
+int occupiedCells(float *points,
+                  int cPoints,
+                  int weighted,
+                  float minX, float minY, float maxX, float maxY,
+                  int cols, int rows,
+                  unsigned int *subset, int cSubset,
+                  unsigned int *out)
+{
+    unsigned long long *keys = NULL;
+    double cellW = 0.0;
+    double cellH = 0.0;
+    double fx = 0.0;
+    double fy = 0.0;
+    int cKeys = 0;
+    int count = 0;
+    int i = 0;
+    int m = 0;
+    int n = 0;
+
+    int inc = 2;
+    if (weighted) inc = 3;
+
+    if (NULL == points || cPoints < 0 || cPoints % inc != 0 || cols <= 0 || rows <= 0 ||
+        !(maxX > minX) || !(maxY > minY) || (NULL != subset && cSubset < 0))
+    {
+        INVALID_PARAMETER();
+        return -1;
+    }
+
+    if (NULL == subset) cSubset = cPoints / inc;
+    cellW = ((double)maxX - minX) / cols;
+    cellH = ((double)maxY - minY) / rows;
+    keys = (unsigned long long *)malloc((cSubset + 1) * sizeof(unsigned long long));
+
+    for (m = 0; m < cSubset; m++)
+    {
+        n = (NULL == subset) ? m : (int)subset[m];
+        fx = (points[n*inc] - (double)minX) / cellW;
+        fy = ((double)maxY - points[n*inc+1]) / cellH;
+        // also rejects NaN and infinite coordinates
+        if (!(fx >= 0 && fx < cols && fy >= 0 && fy < rows)) continue;
+
+        keys[cKeys++] = (unsigned long long)(int)fy * cols + (int)fx;
+    }
+
+    qsort(keys, cKeys, sizeof(unsigned long long), compareKeys);
+
+    for (i = 0; i < cKeys; i++)
+    {
+        if (i > 0 && keys[i] == keys[i-1]) continue;
+        if (NULL != out)
+        {
+            out[2*count] = (unsigned int)(keys[i] % cols);
+            out[2*count+1] = (unsigned int)(keys[i] / cols);
+        }
+        count++;
+    }
+
+    free(keys);
+    return count;
 }
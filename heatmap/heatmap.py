@@ -1,18 +1,316 @@
 import os
 import sys
 import ctypes
-import platform
 import math
+import time
+import array
+import warnings
+import itertools
+import threading
 from . import colorschemes
-from PIL import Image
-import glob
 
-use_pyproj = False
-try:
-  import pyproj
-  use_pyproj = True
-except:
-  pass
+# PIL, pyproj and the modules only a few calls need are imported on first use,
+# importing heatmap has to stay cheap
+
+_pyprojModule = None
+
+def _pyproj():
+    """ the pyproj module, imported on first use.  None if it is not available, or
+    turned off by setting heatmap.heatmap.use_pyproj = False """
+    global _pyprojModule
+    if not globals().get('use_pyproj', True):
+        return None
+    if _pyprojModule is None:
+        try:
+            import pyproj
+            _pyprojModule = pyproj
+        except Exception:
+            _pyprojModule = False
+    return _pyprojModule or None
+
+def __getattr__(name):
+    # use_pyproj used to be set on import, it is worked out when first asked for.
+    # once set it is a plain module global, which _pyproj() honours
+    if name == 'use_pyproj':
+        return _pyproj() is not None
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def _bufferView(points):
+    """ return a flat memoryview over points in their own format if they expose a
+    numeric buffer (numpy arrays, array.array, memoryview...), otherwise None.
+    strided buffers, e.g. numpy slices, are copied once into a contiguous one """
+    try:
+        view = memoryview(points)
+    except TypeError:
+        return None
+    fmt = view.format.lstrip('@=')
+    if fmt[:1] == ('<' if sys.byteorder == 'little' else '>'):
+        fmt = fmt[1:]
+    if len(fmt) != 1 or fmt not in 'hHiIlLqQfd':
+        return None
+    if not view.c_contiguous:
+        numpy = sys.modules.get('numpy')
+        if numpy is not None and isinstance(points, numpy.ndarray):
+            view = memoryview(numpy.ascontiguousarray(points))
+        else:
+            view = memoryview(bytearray(view.tobytes()))
+    return view.cast('B').cast(fmt)
+
+def _floatView(view):
+    """ flat float32 memoryview of a _bufferView(), itself if already float32 """
+    if view.format != 'f':
+        # not float32, one conversion pass but still no python objects per value
+        view = memoryview(array.array('f', view))
+    return view
+
+def _floatArray(view):
+    """ wrap a flat float32 memoryview as a ctypes array without copying """
+    if view.readonly:
+        return (ctypes.c_float * len(view)).from_buffer_copy(view)
+    return (ctypes.c_float * len(view)).from_buffer(view)
+
+def _flattenPoints(points):
+    """ flatten points given as a buffer, a flat sequence or a sequence of tuples.
+    returns the flat points, a memoryview in their own format for a buffer, along
+    with their float32 view, None if not a buffer """
+    view = _bufferView(points)
+    if view is not None:
+      return view, _floatView(view)
+    if isinstance(points,tuple):
+      points = list(points)
+    if isinstance(points[0],(tuple,list)):
+      points = list(itertools.chain.from_iterable(points))
+    return points, None
+
+def _mapPoints(path, weighted):
+    """ memory map a file of little-endian float32 x,y[,w] values as a flat float32
+    memoryview.  heatmap.c reads the pages straight from the page cache, no copy is
+    made (except on big-endian machines, where the values have to be swapped). """
+    import mmap
+
+    inc = 3 if weighted else 2
+    fh = open(path, 'rb')
+    try:
+        size = os.fstat(fh.fileno()).st_size
+        if size == 0 or size % (4 * inc) != 0:
+            raise Exception("%s does not hold a whole number of float32 %s" % (
+                path, "x,y,w triples" if weighted else "x,y pairs"))
+        # copy on write so ctypes can wrap it, nothing ever writes to it
+        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_COPY)
+    finally:
+        fh.close()
+
+    if sys.byteorder != 'little':
+        swapped = array.array('f')
+        swapped.frombytes(mapped)
+        swapped.byteswap()
+        mapped.close()
+        return memoryview(swapped)
+    return memoryview(mapped).cast('f')
+
+_libraries = {}
+_librariesLock = threading.Lock()
+
+def _findLibrary():
+    """ locate the cHeatmap shared library, returns its absolute path or None """
+    # if you're reading this, it's probably because this
+    # hacktastic garbage failed.  sorry.  I deserve a jab or two via @jjguy.
+    import glob
+    import platform
+    from importlib.machinery import EXTENSION_SUFFIXES
+
+    # establish the right library name, based on platform and arch.  setup.py
+    # compiles it everywhere, Windows included; build.bat's DLLs built by hand
+    # are looked for after that.
+    libname = "cHeatmap"
+    if "cygwin" in platform.system().lower():
+        libname = "cHeatmap.dll"
+    names = [libname] + [libname + suffix for suffix in EXTENSION_SUFFIXES]
+    if "windows" in platform.system().lower():
+        names.append("cHeatmap-x64.dll" if "64" in platform.architecture()[0] else "cHeatmap-x86.dll")
+
+    # setup.py puts it next to the package (or in it, for in place builds), so
+    # look there before ripping through everything in sys.path
+    here = os.path.dirname(os.path.abspath(__file__))
+    dirs = [here, os.path.dirname(here)] + [os.path.abspath(d or os.curdir) for d in sys.path]
+    for d in dirs:
+        for name in names:
+            if os.path.isfile(os.path.join(d, name)):
+                return os.path.join(d, name)
+    # check for cpython-*.so prefix for object files which seems to be the ones
+    # copied on install in the travis python3 environment (even with the same version of setuptools)
+    for d in dirs:
+        file = glob.glob(os.path.join(d,libname+'.cpython-*.so'))
+        if file:
+            return file[0]
+    return None
+
+def _loadLibrary(libpath=None):
+    """ load the cHeatmap library once per process, it is only looked for the first
+    time and the handle is shared by every Heatmap instance.  ctypes drops the GIL
+    while tx() runs so calls can overlap. """
+    with _librariesLock:
+        lib = _libraries.get(libpath)
+        if lib is None:
+            path = libpath or _findLibrary()
+            if not path:
+                raise Exception("Heatmap shared library not found in PYTHONPATH.")
+            lib = ctypes.cdll.LoadLibrary(path)
+            lib.tx.restype = ctypes.c_void_p
+            lib.colorizeGrid.restype = ctypes.c_void_p
+            lib.colorizePixels.restype = ctypes.c_void_p
+            _libraries[libpath] = lib
+    return lib
+
+class _Bounds(ctypes.Structure):
+    """ struct bounds in heatmap.c """
+    _fields_ = [('minX', ctypes.c_float), ('minY', ctypes.c_float),
+                ('maxX', ctypes.c_float), ('maxY', ctypes.c_float)]
+
+def _pointBounds(lib, arrPoints, weighted):
+    """ ((minX, minY), (maxX, maxY)) of a ctypes float array of points as the render
+    autoscales to them, None without any finite points """
+    bounds = _Bounds()
+    if lib.pointBounds(arrPoints, len(arrPoints), weighted, ctypes.byref(bounds)) <= 0:
+        return None
+    return ((bounds.minX, bounds.minY), (bounds.maxX, bounds.maxY))
+
+class _Diagnostics(ctypes.Structure):
+    """ struct diagnostics in heatmap.c """
+    _fields_ = [('saturation', ctypes.c_float), ('saturated', ctypes.c_uint),
+                ('touched', ctypes.c_uint), ('minIntensity', ctypes.c_float),
+                ('maxIntensity', ctypes.c_float), ('histogram', ctypes.c_uint * 256)]
+
+class SaturationWarning(UserWarning):
+    """ warned by colorizing when most of the image is saturated """
+
+class _Stage:
+    """ times its with block as stage of a RenderStats, does nothing for None """
+
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        if self.stats is not None and excType is None:
+            self.stats.record(self.stage, time.perf_counter() - self.start)
+
+def _ranges(points, weighted):
+    """ ((minX, minY), (maxX, maxY)) of flattened points, found by numpy when the
+    points are a buffer and numpy is already loaded, otherwise by min() and max()
+    over slices of them.  Either way points that aren't finite are skipped, as
+    pointBounds() in heatmap.c does, and without any finite ones the area is
+    ((0, 0), (0, 0)) """
+    inc = 3 if weighted else 2
+    numpy = sys.modules.get('numpy')
+    if numpy is not None and isinstance(points, memoryview):
+        xy = numpy.frombuffer(points, dtype=points.format).reshape(-1, inc)[:, :2]
+        if xy.dtype.kind == 'f':
+            xy = xy[numpy.isfinite(xy).all(axis=1)]
+        if len(xy):
+            (minX, minY) = xy.min(axis=0)
+            (maxX, maxY) = xy.max(axis=0)
+            return ((float(minX), float(minY)), (float(maxX), float(maxY)))
+    xs = points[0::inc]
+    ys = points[1::inc]
+    # x - x is only 0 for finite x
+    if not all(v - v == 0 for v in itertools.chain(xs, ys)):
+        finite = [(x, y) for (x, y) in zip(xs, ys) if x - x == 0 and y - y == 0]
+        xs = [x for (x, y) in finite]
+        ys = [y for (x, y) in finite]
+    if len(xs) == 0:
+        return ((0, 0), (0, 0))
+    return ((min(xs), min(ys)), (max(xs), max(ys)))
+
+# normalize modes of colorizeGrid() in heatmap.c
+_normalizations = {'linear' : 0, 'log' : 1, 'percentile' : 2, 'saturation' : 3}
+
+# kernel levels of setSimd() in heatmap.c
+_simdLevels = {'auto' : -1, 'scalar' : 0, 'sse2' : 1, 'avx2' : 2}
+
+def simd(level=None, libpath=None):
+    """
+    Returns the instruction set heatmap.c stamps and colorizes with: 'scalar',
+    'sse2' or 'avx2'.  Every one gives identical images, the scalar one being the
+    reference the others are checked against.
+
+    level   -> switch to this one first, capped at what the CPU supports.  'auto'
+               picks the best one, or the HEATMAP_SIMD environment variable when set.
+               Applies to every Heatmap using the same library.
+    libpath -> as for Heatmap()
+    """
+    lib = _loadLibrary(libpath)
+    if level is not None:
+        if level not in _simdLevels:
+            raise Exception("Unknown SIMD level: %s. Valid levels are: %s"
+                            % (level, ', '.join(_simdLevels.keys())))
+        lib.setSimd(_simdLevels[level])
+    current = lib.getSimd()
+    return [name for (name, value) in _simdLevels.items() if value == current][0]
+
+# color lookup tables for colorize() in heatmap.c, (scheme, opacity) -> (the
+# scheme's bytes they were built from, table)
+_luts = {}
+
+def _schemeLUT(scheme, opacity):
+    """ the colors of scheme as 256 packed RGBA words, levels above 252 transparent
+    and the rest at opacity.  built once per scheme and opacity, and again if the
+    scheme is registered anew """
+    rgb = colorschemes._rgb(scheme)
+    key = (scheme, opacity)
+    cached = _luts.get(key)
+    if cached is None or cached[0] is not rgb:
+        if not 0 <= opacity <= 255:
+            raise Exception("Invalid opacity: %s.  Opacity must be 0-255" % opacity)
+        rgba = bytearray(1024)
+        for i in range(3):
+            rgba[i::4] = rgb[i::3]
+        rgba[3::4] = bytearray([opacity]) * 253 + bytearray(3)
+        # the bytes are already in memory order, whatever the endianness
+        cached = _luts[key] = (rgb, (ctypes.c_uint * 256).from_buffer_copy(rgba))
+    return cached[1]
+
+_transformers = threading.local()
+
+def _transformer(srcepsg, dstepsg):
+    """ pyproj Transformer from srcepsg to dstepsg, built once per pair and thread
+    as building them is slow and they shouldn't be shared between threads """
+    cache = _transformers.__dict__
+    key = (srcepsg, dstepsg)
+    if key not in cache:
+        cache[key] = _pyproj().Transformer.from_crs(srcepsg, dstepsg, always_xy=True)
+    return cache[key]
+
+def _reproject(points, weighted, srcepsg, dstepsg):
+    """ reproject flat x,y[,w] points in a single call, weights are left as is.
+    returns the reprojected points as a new float32 array """
+    inc = 3 if weighted else 2
+    xs, ys = _transformer(srcepsg, dstepsg).transform(
+        array.array('d', points[0::inc]), array.array('d', points[1::inc]))
+    converted = array.array('f', points)
+    converted[0::inc] = array.array('f', xs)
+    converted[1::inc] = array.array('f', ys)
+    return converted
+
+def _checkPyproj(srcepsg, dstepsg=None):
+    """ raise when points in srcepsg may need reprojecting to dstepsg without
+    pyproj around to do it """
+    if srcepsg and srcepsg != dstepsg and not _pyproj():
+        raise Exception('srcepsg entered but pyproj is not available')
+
+def _projectArea(area, srcepsg, dstepsg):
+    """ area ((east, south), (west, north)) given in srcepsg converted to dstepsg,
+    the projection heatmap.c sees the points in """
+    ((east, south), (west, north)) = area
+    if srcepsg is not None and srcepsg != dstepsg and _pyproj():
+        transformer = _transformer(srcepsg, dstepsg)
+        (east, south) = transformer.transform(east, south)
+        (west, north) = transformer.transform(west, north)
+    return ((east, south), (west, north))
 
 class Heatmap:
     """
@@ -55,45 +353,13 @@ class Heatmap:
 
     def __init__(self, libpath=None):
         self.img = None
-        # if you're reading this, it's probably because this
-        # hacktastic garbage failed.  sorry.  I deserve a jab or two via @jjguy.
-
-        if libpath:
-            self._heatmap = ctypes.cdll.LoadLibrary(libpath)
-
-        else:
-            # establish the right library name, based on platform and arch.  Windows
-            # are pre-compiled binaries; linux machines are compiled during setup.
-            self._heatmap = None
-            libname = "cHeatmap"
-            if "cygwin" in platform.system().lower():
-                libname = "cHeatmap.dll"
-            if "windows" in platform.system().lower():
-                libname = "cHeatmap-x86.dll"
-                if "64" in platform.architecture()[0]:
-                    libname = "cHeatmap-x64.dll"
-            # now rip through everything in sys.path to find 'em.  Should be in site-packages
-            # or local dir
-            for d in sys.path:
-                #if os.path.isfile(os.path.join(d, libname+'.so')):
-                if os.path.isfile(os.path.join(d, libname)):
-                    self._heatmap = ctypes.cdll.LoadLibrary(
-                        #os.path.join(d, libname+'.so'))
-                      os.path.join(d, libname))
-            # check for cpython-*.so prefix for object files which seems to be the ones
-            # copied on install in the travis python3 environment (even with the same version of setuptools)
-            # may investigate further and do the test based on execution environment
-            if not self._heatmap:
-              for d in sys.path:
-                file = glob.glob(os.path.join(d,libname+'.cpython-*.so'))
-                if file:
-                    self._heatmap = ctypes.cdll.LoadLibrary(file[0])
-
-        if not self._heatmap:
-            raise Exception("Heatmap shared library not found in PYTHONPATH.")
+        self._result = None
+        self._heatmap = _loadLibrary(libpath)
 
     def heatmap(self, points, dotsize=150, opacity=128, size=(1024, 1024), scheme="classic", area=None, 
-                weighted=0, srcepsg=None, dstepsg='EPSG:3857'):
+                weighted=0, srcepsg=None, dstepsg='EPSG:3857', threads=1,
+                engine='multiply', normalize='linear', percentile=99.0, kernel='dot',
+                aggregate=False, stats=None, saturation=5.0, _stacklevel=2):
         """
         points   -> A representation of the points (x,y values) to process.
                     Can be a flattened array/tuple or any combination of 2 dimensional 
@@ -103,8 +369,9 @@ class Heatmap:
                     flat array/tuple i.e. (x1,y1,z1,x2,y2,z2), ([x1,y1,z1],[x2,y2,z2]) etc.
                     The third (weight) value can be anything but it is
                     best to have a normalised weight between 0 and 1.
-                    For best performance, if convenient use a flattened array 
-                    as this is what is used internally and requires no conversion.
+                    For best performance pass a contiguous float32 buffer, i.e. a
+                    numpy array of shape (N,2)/(N,3) or N*2/N*3, array.array('f')
+                    or a memoryview, which is handed to heatmap.c without copying.
         dotsize  -> the size of a single coordinate in the output image in
                     pixels, default is 150px.  Tweak this parameter to adjust
                     the resulting heatmap.
@@ -113,6 +380,8 @@ class Heatmap:
         size     -> tuple with the width, height in pixels of the output PNG
         scheme   -> Name of color scheme to use to color the output image.
                     Use schemes() to get list.  (images are in source distro)
+                    Add your own with colorschemes.register_gradient(),
+                    register_image() or register_scheme().
         area     -> Specify bounding coordinates of the output image. Tuple of
                     tuples: ((minX, minY), (maxX, maxY)).  If None or unspecified,
                     these values are calculated based on the input data.
@@ -125,140 +394,677 @@ class Heatmap:
                     Due to linear interpolation in heatmap.c it only makes sense to use linear 
                     output projections. If outputting to KML for google earth client overlay use 
                     EPSG:4087 (World Equidistant Cylindrical).
+        threads  -> number of threads used to render, 0 for one per core.  The image
+                    is split into row bands rendered independently, the output is
+                    the same whatever the thread count.  Needs heatmap.c to be
+                    built with OpenMP, otherwise renders on a single thread.
+        engine   -> 'multiply' (default) darkens an 8 bit image with every dot, which
+                    saturates quickly on dense data.  'additive' sums the dots (times
+                    their weight) into a float intensity grid instead, only scaled
+                    onto the color scheme once all points are in, see normalize.
+        normalize -> how the 'additive' engine maps intensity onto the color scheme.
+                    'linear' (default) or 'log' scale up to the highest intensity,
+                    'percentile' clips everything above the given percentile of
+                    the non empty pixels, for maps dominated by a few hot spots.
+                    'saturation' picks the clip from the histogram of the
+                    intensities so that the given percent of the pixels come out
+                    saturated (over 95% density), and applies to the multiply
+                    engine too, spreading its levels out to the same end as far
+                    as they allow (pixels it left at full density stay
+                    saturated).  That tunes dense and sparse data alike in one
+                    render, see also HeatmapResult.diagnostics.
+        percentile -> percentile used by normalize='percentile', default 99.
+        kernel   -> 'dot' (default) stamps a dot of dotsize per point.  'gaussian'
+                    counts the points (times their weight) per pixel and blurs the
+                    counts with a gaussian of sigma dotsize/6 instead, so it fades out
+                    about where a dot would.  That takes one pass over the points
+                    and one over the pixels whatever the dotsize, for data sets far
+                    too big to stamp.  The result is always summed and normalized
+                    as for the additive engine, whatever engine is given.
+        aggregate -> merge the points that land within the same 1/16 of a pixel
+                    each way (with the same weight, for the multiply engine) and
+                    stamp each of those cells once for all of them, at its centre,
+                    so data full of duplicate or near duplicate points renders in
+                    time proportional to the distinct cells.  The image differs
+                    from stamping them one by one in how the levels round and in
+                    the merged points being moved by up to 1/32 of a pixel each
+                    way; a point alone in its cell is stamped where it is.  The
+                    gaussian kernel needs no merging and ignores it.
+        stats    -> a RenderStats to record the time each stage takes and what the
+                    render counted in, see RenderStats.  Costs an extra pass over
+                    the points, None (default) records nothing.
+        saturation -> percent of the pixels normalize='saturation' aims to saturate,
+                    0-100, default 5.
         """
         self.dotsize = dotsize
         self.opacity = opacity
         self.size = size
-        self.points = points
         self.weighted = weighted
         self.srcepsg = srcepsg
         self.dstepsg = dstepsg
 
-        if self.srcepsg and not use_pyproj:
-          raise Exception('srcepsg entered but pyproj is not available')
+        self._result = self.render(points, dotsize, opacity, size, scheme, area,
+                                   weighted, srcepsg, dstepsg, threads,
+                                   engine, normalize, percentile, kernel, aggregate, stats,
+                                   saturation, _stacklevel + 1)
+        self.points = self._result.points
+        self.override = self._result.override
+        self.area = area if self.override else ((0, 0), (0, 0))
+        self.img = self._result.img
+        return self.img
+
+    def heatmap_from_file(self, path, weighted=0, **kwargs):
+        """
+        Same as heatmap() but reads the points from a binary file of raw little-endian
+        float32 values, x,y pairs or x,y,w triples when weighted.  The file is memory
+        mapped and handed to heatmap.c as is, so memory use stays close to the image
+        size rather than the data set size.  Other arguments are as for heatmap().
+        """
+        return self.heatmap(_mapPoints(path, weighted), weighted=weighted, _stacklevel=3, **kwargs)
+
+    def render(self, points, dotsize=150, opacity=128, size=(1024, 1024), scheme="classic", area=None,
+               weighted=0, srcepsg=None, dstepsg='EPSG:3857', threads=1,
+               engine='multiply', normalize='linear', percentile=99.0, kernel='dot',
+               aggregate=False, stats=None, saturation=5.0, _stacklevel=2):
+        """
+        Same as heatmap() but nothing is kept on the Heatmap instance, so one instance
+        can be shared by many threads rendering at once.  Takes the same arguments and
+        returns a HeatmapResult with the image, its bounds and saveKML().
+        """
+        self._checkScheme(scheme)
+        self._checkNormalize(normalize, saturation)
+
+        grid = self.density(points, dotsize, size, area, weighted, srcepsg, dstepsg,
+                            threads, engine, kernel, aggregate, stats)
+        return self.colorize(grid, scheme, opacity, normalize, percentile, stats, saturation,
+                             _stacklevel + 1)
+
+    def density(self, points, dotsize=150, size=(1024, 1024), area=None, weighted=0,
+                srcepsg=None, dstepsg='EPSG:3857', threads=1, engine='multiply', kernel='dot',
+                aggregate=False, stats=None):
+        """
+        The density stage of render() on its own: stamps the points and returns the
+        DensityGrid, to colorize() in as many schemes and opacities as needed without
+        stamping the points again.  Takes the same arguments as heatmap().
+        """
+        index = None
+        if isinstance(points, PointIndex):
+            index = points
+            (weighted, srcepsg, dstepsg) = (index.weighted, index.srcepsg, index.dstepsg)
+
+        _checkPyproj(srcepsg)
 
         if area is not None:
-            self.area = area
-            self.override = 1
+            override = 1
         else:
-            self.area = ((0, 0), (0, 0))
-            self.override = 0
+            area = ((0, 0), (0, 0))
+            override = 0
 
-        #convert area for heatmap.c if required
-        ((east, south), (west, north)) = self.area
-        if use_pyproj and self.srcepsg is not None and self.srcepsg != self.dstepsg:
-          source = pyproj.Proj(init=self.srcepsg)
-          dest = pyproj.Proj(init=self.dstepsg)
-          (east,south) = pyproj.transform(source,dest,east,south)
-          (west,north) = pyproj.transform(source,dest,west,north)
+        ((east, south), (west, north)) = _projectArea(area, srcepsg, dstepsg)
 
-        if scheme not in self.schemes():
-            tmp = "Unknown color scheme: %s.  Available schemes: %s" % (
-                scheme, self.schemes())
-            raise Exception(tmp)
+        grid = self._densityGrid(size, engine, weighted, area if override else None, srcepsg,
+                                 threads, kernel, dotsize)
+        subset = None
+        if index is not None:
+            (points, arrPoints) = (index.points, index.array)
+            if override:
+                # query() takes the reach of a dot, half its size
+                subset = index.query(((east, south), (west, north)), size, max(dotsize, 2*grid.pad))
+        else:
+            points, arrPoints = self._convertPoints(points, weighted, srcepsg, dstepsg, stats)
+        grid.points = points
+        grid.dstepsg = dstepsg
+        if override:
+            grid.bounds = ((east, south), (west, north))
+        else:
+            # autoscaled here rather than in heatmap.c so the result knows its
+            # bounds without walking the points again
+            with _Stage(stats, 'bounds'):
+                grid.bounds = _pointBounds(self._heatmap, arrPoints, weighted)
+            if grid.bounds is not None:
+                ((east, south), (west, north)) = grid.bounds
+                override = 1
+        bounds = [ctypes.c_float(v) for v in (east, south, west, north)]
+        with _Stage(stats, 'density'):
+            self._stamp(grid, arrPoints, dotsize, override, bounds, subset, aggregate)
+        if stats is not None:
+            stats._countPoints(self._heatmap, grid, arrPoints, dotsize, bounds, subset, aggregate)
+        return grid
+
+    def _densityGrid(self, size, engine, weighted, area, srcepsg, threads, kernel, dotsize):
+        """ empty DensityGrid for kernel, with the blur and margin of the gaussian one """
+        if kernel == 'gaussian':
+            sigma = dotsize / 6.0
+            pad = self._heatmap.gaussianReach(ctypes.c_float(sigma))
+            return DensityGrid(size, 'additive', weighted, area, srcepsg, threads, kernel, sigma, pad)
+        return DensityGrid(size, engine, weighted, area, srcepsg, threads, kernel)
+
+    def _stamp(self, grid, arrPoints, dotsize, override, bounds, subset=None, aggregate=False):
+        """ run the density stage of grid's engine over arrPoints, or the ones listed
+        in subset, into grid """
+        if subset is not None and len(subset) == 0:
+            return
+        if grid.kernel == 'gaussian':
+            ret = self._heatmap.histogram(arrPoints, len(arrPoints), grid.size[0], grid.size[1],
+                                          grid.pad, override, bounds[0], bounds[1], bounds[2], bounds[3],
+                                          grid.weighted, grid.data,
+                                          subset, len(subset) if subset is not None else 0)
+            if not ret:
+                raise Exception("Unexpected error during processing.")
+            return
+        stage = self._heatmap.accumulate if grid.engine == 'additive' else self._heatmap.multiply
+        ret = stage(arrPoints, len(arrPoints), grid.size[0], grid.size[1], dotsize, override,
+                    bounds[0], bounds[1], bounds[2], bounds[3],
+                    grid.weighted, grid.data, grid.threads,
+                    subset, len(subset) if subset is not None else 0, int(bool(aggregate)))
+        if not ret:
+            raise Exception("Unexpected error during processing.")
+
+    def colorize(self, grid, scheme="classic", opacity=128, normalize='linear', percentile=99.0,
+                 stats=None, saturation=5.0, _stacklevel=2):
+        """
+        The colorize stage of render() on its own: colors a DensityGrid returned by
+        density(), returns a HeatmapResult.  The grid is left as is so it can be
+        colorized again.  scheme, opacity, normalize, percentile, stats and
+        saturation are as for heatmap(), normalize and percentile only apply to
+        the additive engine bar normalize='saturation'.  Warns a SaturationWarning
+        when over 80% of the pixels come out saturated.
+        """
+        self._checkScheme(scheme)
+        self._checkNormalize(normalize, saturation)
+
+        (width, height) = grid.size
+        lut = self._convertScheme(scheme, opacity)
+        arrFinalImage = self._allocOutputBuffer(grid.size)
 
-        arrPoints = self._convertPoints()
-        arrScheme = self._convertScheme(scheme)
-        arrFinalImage = self._allocOutputBuffer()
+        data = grid.data
+        if grid.kernel == 'gaussian':
+            data = (ctypes.c_float * (width * height))()
+            with _Stage(stats, 'blur'):
+                if not self._heatmap.blurGrid(grid.data, width, height, grid.pad,
+                                              ctypes.c_float(grid.sigma), data, grid.threads):
+                    raise Exception("Unexpected error during processing.")
 
-        ret = self._heatmap.tx(
-            arrPoints, len(arrPoints), size[0], size[1], dotsize,
-            arrScheme, arrFinalImage, opacity, self.override,
-            ctypes.c_float(east), ctypes.c_float(south),
-            ctypes.c_float(west), ctypes.c_float(north), weighted)
+        mode = _normalizations[normalize]
+        value = ctypes.c_float(saturation if normalize == 'saturation' else percentile)
+        diag = _Diagnostics()
+        with _Stage(stats, 'colorize'):
+            if grid.engine == 'additive':
+                ret = self._heatmap.colorizeGrid(
+                    data, width, height, lut, arrFinalImage, mode, value, grid.threads,
+                    ctypes.byref(diag))
+            else:
+                # only normalize='saturation' changes the levels of the multiply engine
+                ret = self._heatmap.colorizePixels(
+                    grid.data, width, height, lut, arrFinalImage,
+                    mode if normalize == 'saturation' else 0, value, grid.threads,
+                    ctypes.byref(diag))
 
         if not ret:
             raise Exception("Unexpected error during processing.")
+        diagnostics = Diagnostics(diag, width * height)
+        if stats is not None:
+            stats._countPixels(diagnostics)
+        if diagnostics.saturation > 0.8:
+            warnings.warn("%d%% of output pixels are over 95%% density.  Decrease dotsize "
+                          "or increase output image resolution?" % (100 * diagnostics.saturation),
+                          SaturationWarning, stacklevel=_stacklevel)
 
-        self.img = Image.frombuffer('RGBA', (self.size[0], self.size[1]), 
-                                    arrFinalImage, 'raw', 'RGBA', 0, 1)
-        return self.img
+        from PIL import Image
+        with _Stage(stats, 'image'):
+            img = Image.frombuffer('RGBA', (width, height),
+                                   arrFinalImage, 'raw', 'RGBA', 0, 1)
+        return HeatmapResult(img, grid.points, grid.weighted, grid.area, grid.srcepsg,
+                             grid.bounds, grid.dstepsg, diagnostics)
 
-    def _allocOutputBuffer(self):
-        return (ctypes.c_ubyte * (self.size[0] * self.size[1] * 4))()
+    def _checkScheme(self, scheme):
+        if scheme not in self.schemes():
+            tmp = "Unknown color scheme: %s.  Available schemes: %s" % (
+                scheme, self.schemes())
+            raise Exception(tmp)
 
-    def _convertPoints(self):
-        """ flatten the list of tuples, convert into ctypes array """
+    def _checkNormalize(self, normalize, saturation=5.0):
+        if normalize not in _normalizations:
+            raise Exception("Unknown normalization: %s.  Available normalizations: %s" % (
+                normalize, sorted(_normalizations)))
+        if normalize == 'saturation' and not 0 <= saturation <= 100:
+            raise Exception("Invalid saturation: %s.  Saturation must be 0-100" % saturation)
 
-        if isinstance(self.points,tuple):
-          self.points = list(self.points)
-        if isinstance(self.points[0],tuple):
-          self.points = list(sum(self.points,()))
-        elif isinstance(self.points[0],list):
-          self.points = sum(self.points,[])
+    def _allocOutputBuffer(self, size):
+        return (ctypes.c_ubyte * (size[0] * size[1] * 4))()
 
-        #convert if required, need to copy as may use points later for _range.
-        if use_pyproj and self.srcepsg is not None and self.srcepsg != self.dstepsg:
-          converted =list(self.points)
-          source = pyproj.Proj(init=self.srcepsg)
-          dest = pyproj.Proj(init=self.dstepsg) 
-          #nicer way? map/lambda will retun 2/3 tuple so need to flatten again
-          inc = 3 if self.weighted else 2
-          for i in range(0, len(self.points), inc):
-            (x,y) = pyproj.transform(source,dest,self.points[i],self.points[i+1])
-            converted[i] = x
-            converted[i+1] = y
-          arr_pts = (ctypes.c_float * (len(converted))) (*converted)
-        else:
-          arr_pts = (ctypes.c_float * (len(self.points))) (*self.points)
-        return arr_pts
+    def _convertPoints(self, points, weighted, srcepsg, dstepsg, stats=None):
+        """ flatten the list of tuples, convert into ctypes array.
+        returns the flattened points along with the array """
 
-    def _convertScheme(self, scheme):
-        """ flatten the list of RGB tuples, convert into ctypes array """
+        reproject = srcepsg is not None and srcepsg != dstepsg and _pyproj()
+        with _Stage(stats, 'convert'):
+            points, view = _flattenPoints(points)
+            if view is not None and not reproject:
+              arr_pts = _floatArray(view)
+            elif not reproject:
+              arr_pts = (ctypes.c_float * (len(points))) (*points)
 
-        flat = list(sum(colorschemes.schemes[scheme],()))
-        arr_cs = (ctypes.c_int * (len(flat)))(*flat)
-        return arr_cs
+        #convert if required, need to copy as may use points later for _range.
+        if reproject:
+          with _Stage(stats, 'reproject'):
+            arr_pts = _floatArray(memoryview(_reproject(points, weighted, srcepsg, dstepsg)))
+        return points, arr_pts
 
-    def _ranges(self):
-        """ walks the list of points and finds the
-        max/min x & y values in the set """
-        minX = self.points[0]
-        minY = self.points[1]
-        maxX = minX
-        maxY = minY
-        inc = 3 if self.weighted else 2
-        for i in range(0,len(self.points),inc):
-            minX = min(self.points[i], minX)
-            minY = min(self.points[i+1], minY)
-            maxX = max(self.points[i], maxX)
-            maxY = max(self.points[i+1], maxY)
-
-        return ((minX, minY), (maxX, maxY))
-
-    def saveKML(self, kmlFile):
+    def _convertScheme(self, scheme, opacity):
+        """ packed RGBA lookup table of scheme at opacity, see _schemeLUT() """
+        return _schemeLUT(scheme, opacity)
+
+    def saveKML(self, kmlFile, stats=None):
         """
         Saves a KML template to use with google earth.  Assumes x/y coordinates
         are lat/long, and creates an overlay to display the heatmap within Google
         Earth.
 
         kmlFile ->  output filename for the KML.
+        stats   ->  a RenderStats to record the time saving takes in, see heatmap().
         """
         if self.img is None:
             raise Exception("Must first run heatmap() to generate image file.")
 
-        tilePath = os.path.splitext(kmlFile)[0] + ".png"
-        self.img.save(tilePath)
-
-        if self.override:
-            ((west, south), (east, north)) = self.area
-        else:
-            ((west, south), (east, north)) = self._ranges()
-
-        #convert overlay BBOX if required
-        if use_pyproj and self.srcepsg is not None and self.srcepsg != 'EPSG:4326':
-          source = pyproj.Proj(init=self.srcepsg)
-          dest = pyproj.Proj(init='EPSG:4326')
-          (east,south) = pyproj.transform(source,dest,east,south)
-          (west,north) = pyproj.transform(source,dest,west,north)
-
-        bytes = self.KML % (tilePath, north, south, east, west)
-        fh = open(kmlFile, "w")
-        fh.write(bytes)
-        fh.close()
+        self._result.saveKML(kmlFile, stats)
 
     def schemes(self):
         """
         Return a list of available color scheme names.
         """
         return colorschemes.valid_schemes()
+
+class DensityGrid:
+    """
+    The output of the density stage, as returned by Heatmap.density(), before any
+    color scheme is applied.  Pass it to Heatmap.colorize().
+
+    size     -> (width, height) in pixels.
+    engine   -> 'multiply' or 'additive', see Heatmap.heatmap().
+    kernel   -> 'dot' or 'gaussian', see Heatmap.heatmap().
+    data     -> the ctypes buffer of width*height pixels, bytes from 255 (empty)
+                down to 0 for the multiply engine, float intensities for additive.
+                For the gaussian kernel the weight of the points per pixel, not yet
+                blurred, over (width + 2*pad)*(height + 2*pad) pixels.
+    sigma    -> blur of the gaussian kernel in pixels.
+    pad      -> margin round the image the gaussian kernel counts points in, as
+                far as the blur reaches.
+    points, weighted, area, srcepsg, bounds, dstepsg -> as for HeatmapResult.
+    """
+
+    def __init__(self, size, engine, weighted, area, srcepsg, threads=1, kernel='dot',
+                 sigma=0.0, pad=0):
+        if engine not in ('multiply', 'additive'):
+            raise Exception("Unknown engine: %s.  Available engines: multiply, additive" % engine)
+        if kernel not in ('dot', 'gaussian'):
+            raise Exception("Unknown kernel: %s.  Available kernels: dot, gaussian" % kernel)
+        if kernel == 'gaussian' and engine != 'additive':
+            raise Exception("The gaussian kernel needs the additive engine")
+
+        self.size = size
+        self.engine = engine
+        self.weighted = weighted
+        self.area = area
+        self.srcepsg = srcepsg
+        self.threads = threads
+        self.kernel = kernel
+        self.sigma = sigma
+        self.pad = pad
+        self.points = None
+        self.bounds = None
+        self.dstepsg = None
+
+        cPixels = (size[0] + 2*pad) * (size[1] + 2*pad)
+        if engine == 'additive':
+            self.data = (ctypes.c_float * cPixels)()
+        else:
+            self.data = (ctypes.c_ubyte * cPixels)()
+            ctypes.memset(self.data, 0xff, cPixels)
+
+class PointIndex:
+    """
+    Points binned into a uniform grid once, to render many windows of the same
+    data set.  Pass it to Heatmap.heatmap() (or render(), density()) in place of
+    the points: with an area only the points in the grid cells under the area and
+    a dot around it are visited, instead of every point.  Images are the same as
+    rendering the points themselves.
+
+    index = PointIndex(points, srcepsg='EPSG:4326')
+    for area in windows:
+        hm.heatmap(index, area=area).save(...)
+
+    points, weighted, srcepsg and dstepsg are as for Heatmap.heatmap().  The
+    points are projected once here and the index's weighted, srcepsg and dstepsg
+    are used whatever heatmap() is given.
+
+    cells -> (columns, rows) of the grid, by default about 16 points per cell up
+             to 1024x1024 cells
+    """
+
+    def __init__(self, points, weighted=0, srcepsg=None, dstepsg='EPSG:3857', cells=None,
+                 libpath=None):
+        self.weighted = weighted
+        self.srcepsg = srcepsg
+        self.dstepsg = dstepsg
+        self._heatmap = _loadLibrary(libpath)
+
+        self.points, self.array = Heatmap(libpath)._convertPoints(points, weighted, srcepsg, dstepsg)
+        inc = 3 if weighted else 2
+        cPoints = len(self.array) // inc
+        ((minX, minY), (maxX, maxY)) = (_pointBounds(self._heatmap, self.array, weighted)
+                                         or ((0., 0.), (0., 0.)))
+
+        if cells is None:
+            side = min(max(int(math.sqrt(cPoints / 16.)), 1), 1024)
+            cells = (side, side)
+        (self.cols, self.rows) = cells
+        # pad half a cell so the points on the far edges stay inside the grid
+        # through the float32 rounding of its bounds
+        padX = ((maxX - minX) or 1.) / self.cols / 2.
+        padY = ((maxY - minY) or 1.) / self.rows / 2.
+        self.bounds = ((minX - padX, minY - padY), (maxX + padX, maxY + padY))
+
+        self._offsets = (ctypes.c_uint * (self.cols * self.rows + 1))()
+        self._indices = (ctypes.c_uint * cPoints)()
+        ret = self._heatmap.binPoints(
+            self.array, len(self.array), weighted,
+            ctypes.c_float(self.bounds[0][0]), ctypes.c_float(self.bounds[0][1]),
+            ctypes.c_float(self.bounds[1][0]), ctypes.c_float(self.bounds[1][1]),
+            self.cols, self.rows, self._offsets, self._indices)
+        if ret < 0:
+            raise Exception("Unexpected error during processing.")
+
+    def query(self, area, size, dotsize):
+        """
+        Returns the indices of the points that may show on an image of size pixels
+        covering area (in the index's projection) with dots of dotsize, in their
+        original order, as a ctypes array for heatmap.c.
+        """
+        ((minX, minY), (maxX, maxY)) = area
+        (minX, maxX) = (min(minX, maxX), max(minX, maxX))
+        (minY, maxY) = (min(minY, maxY), max(minY, maxY))
+        # a dot reaches at most half its size (and a pixel of rounding) from its point
+        reach = dotsize // 2 + 2
+        marginX = (maxX - minX) * reach / float(size[0])
+        marginY = (maxY - minY) * reach / float(size[1])
+
+        ((gridMinX, gridMinY), (gridMaxX, gridMaxY)) = self.bounds
+        cellW = (gridMaxX - gridMinX) / self.cols
+        cellH = (gridMaxY - gridMinY) / self.rows
+        # clamped before converting, an area far outside the grid still needs an int
+        cells = [int(math.floor(max(min(v, 1 << 30), -(1 << 30)))) for v in (
+            (minX - marginX - gridMinX) / cellW, (gridMaxY - maxY - marginY) / cellH,
+            (maxX + marginX - gridMinX) / cellW, (gridMaxY - minY + marginY) / cellH)]
+
+        args = [self._offsets, self._indices, self.cols, self.rows] + cells
+        count = self._heatmap.gatherCells(*(args + [None]))
+        subset = (ctypes.c_uint * max(count, 0))()
+        if count > 0:
+            self._heatmap.gatherCells(*(args + [subset]))
+        return subset
+
+class Diagnostics:
+    """
+    What colorizing a heatmap found, as HeatmapResult.diagnostics, to check or
+    tune renders with rather than rendering again.
+
+    pixels     -> pixels colorized.
+    saturation -> fraction of them saturated, over 95% density.
+    saturated  -> number of those.
+    touched    -> pixels with any density at all.
+    histogram  -> list of the number of pixels per density level as colorized,
+                  256 of them from the densest level 0 to 255 for empty pixels.
+    minIntensity, maxIntensity -> lowest and highest density of the touched
+                  pixels: their summed intensity for the additive engine and the
+                  gaussian kernel, 0-255 for the multiply engine.  0 if none.
+    """
+
+    def __init__(self, diag, pixels):
+        self.pixels = pixels
+        self.saturation = diag.saturation
+        self.saturated = diag.saturated
+        self.touched = diag.touched
+        self.minIntensity = diag.minIntensity
+        self.maxIntensity = diag.maxIntensity
+        self.histogram = list(diag.histogram)
+
+class HeatmapResult:
+    """
+    A rendered heatmap as returned by Heatmap.render().
+
+    img      -> the PIL image.
+    points   -> the flattened points the image was rendered from.
+    weighted -> whether the points carry a weight.
+    area     -> bounding coordinates of the image ((minX, minY), (maxX, maxY)),
+                in the source projection.  Found on first use when the render was
+                autoscaled, straight from bounds when those are exact.
+    srcepsg  -> epsg code of the points, None if not projected.
+    bounds   -> bounding coordinates the points were scaled to in heatmap.c, in
+                the dstepsg projection when srcepsg is set.  None if unknown, the
+                area is then found from the points.
+    dstepsg  -> epsg code of bounds when srcepsg is set.
+    diagnostics -> the Diagnostics of colorizing the image, None if unknown.
+    """
+
+    def __init__(self, img, points, weighted, area, srcepsg, bounds=None, dstepsg='EPSG:3857',
+                 diagnostics=None):
+        self.img = img
+        self.points = points
+        self.weighted = weighted
+        self.override = 1 if area is not None else 0
+        self.srcepsg = srcepsg
+        self.bounds = bounds
+        self.dstepsg = dstepsg
+        self.diagnostics = diagnostics
+        self._area = area
+
+    @property
+    def area(self):
+        if self._area is None:
+            self._area = self._ranges()
+        return self._area
+
+    def _ranges(self):
+        """ max/min x & y values of the points.  the bounds of the render are those
+        of float32 points as given unless they were projected or rounded to float32
+        first, only then the points have to be walked again """
+        projected = self.srcepsg is not None and self.srcepsg != self.dstepsg and _pyproj()
+        if (self.bounds is not None and isinstance(self.points, memoryview) and
+                self.points.format == 'f' and not projected):
+            return self.bounds
+        return _ranges(self.points, self.weighted)
+
+    def saveKML(self, kmlFile, stats=None):
+        """
+        Saves the image alongside a KML template to use with google earth, see
+        Heatmap.saveKML().
+
+        kmlFile ->  output filename for the KML.
+        stats   ->  a RenderStats to record the time saving takes in, see
+                    Heatmap.heatmap().
+        """
+        tilePath = os.path.splitext(kmlFile)[0] + ".png"
+        with _Stage(stats, 'save'):
+            self.img.save(tilePath)
+
+        with _Stage(stats, 'kml'):
+            ((west, south), (east, north)) = self.area
+
+            #convert overlay BBOX if required
+            if self.srcepsg is not None and self.srcepsg != 'EPSG:4326' and _pyproj():
+              transformer = _transformer(self.srcepsg, 'EPSG:4326')
+              (east,south) = transformer.transform(east,south)
+              (west,north) = transformer.transform(west,north)
+
+            bytes = Heatmap.KML % (tilePath, north, south, east, west)
+            fh = open(kmlFile, "w")
+            fh.write(bytes)
+            fh.close()
+
+class RenderStats:
+    """
+    Time taken per stage and what a render counted, filled in when passed as
+    stats to Heatmap.heatmap(), render(), density(), colorize() or saveKML().
+
+    stats = RenderStats()
+    hm.heatmap(points, stats=stats)
+    hm.saveKML("map.kml", stats=stats)
+    metrics.send(stats.asDict())
+
+    A RenderStats keeps adding up over as many calls as it is passed to, call
+    reset() to start again.
+
+    stages    -> seconds per stage in the order they first ran: 'convert' (points
+                 to a float32 array), 'reproject' (pyproj), 'bounds' (autoscaling),
+                 'density', 'blur' (the gaussian kernel), 'colorize', 'image'
+                 (wrapping the pixels as a PIL image), then 'save' (writing the
+                 PNG) and 'kml' from saveKML()
+    points    -> points handed to the density stage
+    culled    -> of those, the ones off the image far enough to be dropped
+    stamped   -> stamps laid for the rest, fewer than them when aggregate merges
+                 points
+    pixels    -> pixels colorized
+    touched   -> of those, the ones any point reached
+    saturated -> of those, the ones over 95% density
+    callback  -> called as callback(stage, seconds) as every stage ends, to pass
+                 the timings on as they come
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.points = 0
+        self.culled = 0
+        self.stamped = 0
+        self.pixels = 0
+        self.touched = 0
+        self.saturated = 0
+
+    @property
+    def saturation(self):
+        """ fraction of the pixels over 95% density, 0 before colorizing """
+        return self.saturated / float(self.pixels) if self.pixels else 0.0
+
+    @property
+    def seconds(self):
+        """ time taken by all the stages """
+        return sum(self.stages.values())
+
+    def record(self, stage, seconds):
+        """ adds seconds to the time of stage """
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        if self.callback is not None:
+            self.callback(stage, seconds)
+
+    def asDict(self):
+        """ everything recorded as a flat dict of numbers, stage times as
+        'seconds.<stage>' """
+        d = dict(('seconds.' + stage, seconds) for (stage, seconds) in self.stages.items())
+        d.update(points=self.points, culled=self.culled, stamped=self.stamped, pixels=self.pixels,
+                 touched=self.touched, saturated=self.saturated, saturation=self.saturation)
+        return d
+
+    def _countPoints(self, lib, grid, arrPoints, dotsize, bounds, subset, aggregate=False):
+        """ counts the points of a density stage, the ones it dropped and the
+        stamps it laid """
+        inc = 3 if grid.weighted else 2
+        count = len(subset) if subset is not None else len(arrPoints) // inc
+        self.points += count
+        if count == 0:
+            return
+        if grid.bounds is None:
+            # no finite points to autoscale to, nothing was drawn
+            self.culled += count
+            return
+        culled = lib.offCanvas(arrPoints, len(arrPoints), grid.size[0], grid.size[1],
+                               0 if grid.kernel == 'gaussian' else dotsize, grid.pad,
+                               bounds[0], bounds[1], bounds[2], bounds[3], grid.weighted,
+                               subset, count if subset is not None else 0)
+        if culled < 0:
+            raise Exception("Unexpected error during processing.")
+        self.culled += culled
+        if not aggregate or grid.kernel == 'gaussian':
+            self.stamped += count - culled
+            return
+        cells = lib.countCells(arrPoints, len(arrPoints), grid.size[0], grid.size[1], dotsize,
+                               bounds[0], bounds[1], bounds[2], bounds[3], grid.weighted,
+                               int(grid.engine == 'additive'),
+                               subset, count if subset is not None else 0)
+        if cells < 0:
+            raise Exception("Unexpected error during processing.")
+        self.stamped += cells
+
+    def _countPixels(self, diagnostics):
+        """ adds the pixels of a colorize stage from its Diagnostics """
+        self.pixels += diagnostics.pixels
+        self.touched += diagnostics.touched
+        self.saturated += diagnostics.saturated
+
+class HeatmapAccumulator:
+    """
+    Builds a heatmap from points fed in chunks, for data sets too large to hold
+    in memory at once.  Only the density buffer (size[0]*size[1] bytes, 4 times
+    that for the additive engine) is kept between chunks and colorizing happens
+    once, in render().
+
+    As the points are never all seen the area has to be given up front.
+
+    acc = HeatmapAccumulator((1024, 1024), ((minX, minY), (maxX, maxY)))
+    for chunk in chunks:
+        acc.add(chunk)
+    img = acc.render("fire").img
+
+    size, area, dotsize, weighted, srcepsg, dstepsg, threads, engine, kernel and
+    aggregate are as for Heatmap.heatmap().  With the multiply engine or the
+    gaussian kernel the image is identical to rendering all the points in one go,
+    bar the rounding of aggregate, which merges points within each chunk only.
+    add() and render() must not be called from several threads at once.  The
+    DensityGrid built so far is kept as grid.
+    """
+
+    def __init__(self, size, area, dotsize=150, weighted=0, srcepsg=None, dstepsg='EPSG:3857',
+                 threads=1, engine='multiply', libpath=None, kernel='dot', aggregate=False):
+        _checkPyproj(srcepsg)
+
+        self.size = size
+        self.area = area
+        self.dotsize = dotsize
+        self.weighted = weighted
+        self.srcepsg = srcepsg
+        self.dstepsg = dstepsg
+        self.threads = threads
+        self.engine = engine
+        self.kernel = kernel
+        self.aggregate = aggregate
+        self.count = 0
+        self._hm = Heatmap(libpath)
+
+        ((east, south), (west, north)) = _projectArea(area, srcepsg, dstepsg)
+        self._bounds = [ctypes.c_float(v) for v in (east, south, west, north)]
+        self.grid = self._hm._densityGrid(size, engine, weighted, area, srcepsg, threads,
+                                          kernel, dotsize)
+
+    def add(self, points):
+        """
+        Adds a chunk of points, in any of the formats Heatmap.heatmap() accepts.
+        """
+        if len(points) == 0:
+            return
+
+        points, arrPoints = self._hm._convertPoints(points, self.weighted, self.srcepsg, self.dstepsg)
+        self._hm._stamp(self.grid, arrPoints, self.dotsize, 1, self._bounds, None, self.aggregate)
+        self.count += len(arrPoints) // (3 if self.weighted else 2)
+
+    def render(self, scheme="classic", opacity=128, normalize='linear', percentile=99.0,
+               saturation=5.0):
+        """
+        Colorizes the points added so far, returns a HeatmapResult.  scheme, opacity,
+        normalize, percentile and saturation are as for Heatmap.heatmap().  Can be
+        called again after adding more points.
+        """
+        return self._hm.colorize(self.grid, scheme, opacity, normalize, percentile,
+                                 saturation=saturation, _stacklevel=3)
@@ -0,0 +1,113 @@
+import io
+import re
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image
+from . import colorschemes
+from .tiles import TILE_SIZE, MAX_ZOOM, LRUCache
+
+class _TileHandler(BaseHTTPRequestHandler):
+
+    path_re = re.compile(r'^/([^/]+)/(\d+)/(\d+)/(\d+)\.png$')
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        match = self.path_re.match(url.path)
+        if match is None:
+            self.send_error(404)
+            return
+        scheme = match.group(1)
+        (z, x, y) = [int(v) for v in match.groups()[1:]]
+        if not (z <= MAX_ZOOM and x < (1 << z) and y < (1 << z)):
+            self.send_error(404, "No such tile: %d/%d/%d" % (z, x, y))
+            return
+        try:
+            opacity = int(parse_qs(url.query).get('opacity', [self.server.opacity])[0])
+        except ValueError:
+            opacity = -1
+        if not 0 <= opacity <= 255:
+            self.send_error(400, "opacity must be 0-255")
+            return
+        if scheme not in self.server.renderer._hm.schemes():
+            self.send_error(404, "Unknown color scheme: %s" % scheme)
+            return
+
+        png = self.server.tilePNG(scheme, z, x, y, opacity)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(png)))
+        self.end_headers()
+        self.wfile.write(png)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class TileServer(ThreadingHTTPServer):
+    """
+    HTTP server for the tiles of a TileRenderer, serving /{scheme}/{z}/{x}/{y}.png
+    with an optional ?opacity=0-255.
+
+    tr = TileRenderer(points, srcepsg='EPSG:4326')
+    TileServer(tr, ('127.0.0.1', 8080)).serve_forever()
+
+    Rendered PNGs are kept in one LRU cache and the density pixels they were
+    colorized from in another, so asking for the same tile in another scheme or
+    opacity only colorizes it again, as does asking for it after its scheme was
+    registered anew with colorschemes.register_scheme().  Tiles without dots are
+    served transparent, tiles off the map or deeper than MAX_ZOOM are not found.
+
+    renderer          -> TileRenderer holding the points
+    address           -> (host, port) to listen on, port 0 picks a free one
+    tileCacheBytes    -> bytes of PNGs to keep
+    densityCacheBytes -> bytes of density pixels to keep, TILE_SIZE**2 per tile
+    opacity           -> opacity when the request doesn't give one
+    verbose           -> log every request to stderr
+    """
+
+    daemon_threads = True
+
+    def __init__(self, renderer, address=('127.0.0.1', 8080), tileCacheBytes=64*1024*1024,
+                 densityCacheBytes=64*1024*1024, opacity=128, verbose=False):
+        self.renderer = renderer
+        self.opacity = opacity
+        self.verbose = verbose
+        self.tiles = LRUCache(tileCacheBytes)
+        self.densities = LRUCache(densityCacheBytes)
+        self._blank = None
+        ThreadingHTTPServer.__init__(self, address, _TileHandler)
+
+    def density(self, z, x, y):
+        """ density pixels of tile z/x/y as TileRenderer.density(), memoized """
+        key = (z, x, y)
+        pixels = self.densities.get(key, self)
+        if pixels is self:
+            pixels = self.renderer.density(z, x, y)
+            # blank tiles are remembered too, at a nominal cost
+            self.densities.put(key, pixels, len(pixels) if pixels is not None else 64)
+        return pixels
+
+    def tilePNG(self, scheme, z, x, y, opacity):
+        """ tile z/x/y as PNG bytes, memoized along with the scheme's bytes it was
+        colorized from, so it is colorized again if the scheme is registered anew """
+        rgb = colorschemes._rgb(scheme)
+        key = (scheme, opacity, z, x, y)
+        cached = self.tiles.get(key)
+        if cached is None or cached[0] is not rgb:
+            pixels = self.density(z, x, y)
+            if pixels is None:
+                return self._blankPNG()
+            png = self._encode(self.renderer.colorize(pixels, scheme, opacity))
+            self.tiles.put(key, (rgb, png), len(png))
+            return png
+        return cached[1]
+
+    def _blankPNG(self):
+        if self._blank is None:
+            self._blank = self._encode(Image.new('RGBA', (TILE_SIZE, TILE_SIZE)))
+        return self._blank
+
+    def _encode(self, img):
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        return buf.getvalue()
@@ -0,0 +1,171 @@
+import os
+import ctypes
+import concurrent.futures
+from multiprocessing import shared_memory
+from .heatmap import Heatmap, _loadLibrary, _checkPyproj
+
+def _renderBand(job):
+    """ worker side: draws rows rowStart to rowEnd of the shared grid from the
+    points filed for them """
+    (libpath, pointsName, cPoints, indicesName, first, count, gridName, size, dotsize,
+     bounds, weighted, additive, aggregate, rowStart, rowEnd) = job
+    gridType = ctypes.c_float if additive else ctypes.c_ubyte
+    # the workers share the resource tracker of the parent, which unlinks the blocks
+    shmPoints = shared_memory.SharedMemory(pointsName)
+    shmIndices = shared_memory.SharedMemory(indicesName)
+    shmGrid = shared_memory.SharedMemory(gridName)
+    try:
+        points = (ctypes.c_float * cPoints).from_buffer(shmPoints.buf)
+        subset = (ctypes.c_uint * count).from_buffer(shmIndices.buf, first * ctypes.sizeof(ctypes.c_uint))
+        grid = (gridType * (size[0] * size[1])).from_buffer(shmGrid.buf)
+        (minX, minY, maxX, maxY) = [ctypes.c_float(v) for v in bounds]
+        ret = _loadLibrary(libpath).densityRows(
+            points, cPoints, size[0], size[1], dotsize, minX, minY, maxX, maxY, weighted,
+            additive, aggregate, grid, rowStart, rowEnd, subset, count)
+        # the views have to go before the blocks can be closed
+        del points, subset, grid
+    finally:
+        shmPoints.close()
+        shmIndices.close()
+        shmGrid.close()
+    return ret
+
+class _ShardedHeatmap(Heatmap):
+    """ Heatmap whose density stage is drawn in bands by a ShardedRenderer's workers """
+
+    def __init__(self, renderer, libpath=None):
+        Heatmap.__init__(self, libpath)
+        self._renderer = renderer
+
+    def _stamp(self, grid, arrPoints, dotsize, override, bounds, subset=None, aggregate=False):
+        # the gaussian kernel's histogram costs less than copying the points to
+        # the workers, and without bounds there are no finite points to draw
+        if grid.kernel == 'gaussian' or not override or subset is not None:
+            return Heatmap._stamp(self, grid, arrPoints, dotsize, override, bounds, subset, aggregate)
+        if len(arrPoints):
+            self._renderer._shard(grid, arrPoints, [b.value for b in bounds])
+
+class ShardedRenderer:
+    """
+    Renders one heatmap with several processes, for point sets large enough that
+    a single process is held up by memory bandwidth rather than the GIL.
+
+    sr = ShardedRenderer(size=(4096, 4096), workers=8)
+    img = sr.render(points, scheme="fire").img
+
+    The image is cut into bands of rows and the points are filed once by the
+    bands their dots reach, then copied with that filing into shared memory.
+    Every worker draws whole bands of one shared density grid from the points
+    filed for them alone, and the bands make up the grid with nothing to add
+    together.  Each pixel is worked out by a
+    single process in the same order as a single process render would, so the
+    image is identical to Heatmap.heatmap() for either engine and with aggregate.
+    Only colorizing the grid is left to the calling process.
+
+    The gaussian kernel is not sharded, its density stage is a histogram of the
+    points which costs less than copying them to the workers.  It is drawn in the
+    calling process and still blurred with threads.
+
+    size, area, dotsize, weighted, srcepsg, dstepsg, threads (of the colorize
+    stage), engine, kernel and aggregate are as for Heatmap.heatmap().
+
+    workers -> processes drawing bands, as for concurrent.futures.ProcessPoolExecutor
+    bands   -> bands the rows are cut into, 4 per worker (or per cpu when workers
+               isn't given) by default so the workers are kept busy when the
+               points are spread unevenly
+    pool    -> a concurrent.futures.ProcessPoolExecutor to run on in place of one
+               started (and shut down) per render
+    """
+
+    def __init__(self, size=(1024, 1024), area=None, dotsize=150, weighted=0, srcepsg=None,
+                 dstepsg='EPSG:3857', threads=1, engine='multiply', kernel='dot',
+                 aggregate=False, workers=None, bands=None, pool=None, libpath=None):
+        _checkPyproj(srcepsg)
+
+        self.size = size
+        self.area = area
+        self.dotsize = dotsize
+        self.weighted = weighted
+        self.srcepsg = srcepsg
+        self.dstepsg = dstepsg
+        self.threads = threads
+        self.engine = engine
+        self.kernel = kernel
+        self.aggregate = aggregate
+        self.workers = workers
+        self.bands = bands
+        self.pool = pool
+        self.libpath = libpath
+        self._hm = _ShardedHeatmap(self, libpath)
+
+    def density(self, points):
+        """
+        The density stage, sharded over the workers.  Returns the DensityGrid to
+        colorize with Heatmap.colorize() as for Heatmap.density().
+        """
+        return self._hm.density(points, self.dotsize, self.size, self.area, self.weighted,
+                                self.srcepsg, self.dstepsg, self.threads, self.engine,
+                                self.kernel, self.aggregate)
+
+    def _shard(self, grid, arrPoints, bounds):
+        (width, height) = grid.size
+        bands = min(self.bands or 4 * (self.workers or os.cpu_count() or 1), height)
+        # bands of whole rows as shardPoints() in heatmap.c files them
+        bandHeight = (height + bands - 1) // bands
+        bands = (height + bandHeight - 1) // bandHeight
+        (minX, minY, maxX, maxY) = [ctypes.c_float(v) for v in bounds]
+        lib = self._hm._heatmap
+        offsets = (ctypes.c_uint * (bands + 1))()
+        args = (arrPoints, len(arrPoints), width, height, self.dotsize, minX, minY, maxX, maxY,
+                self.weighted, bands, offsets)
+        count = lib.shardPoints(*(args + (None,)))
+        if count < 0:
+            raise Exception("Unexpected error during processing.")
+        indices = (ctypes.c_uint * max(count, 1))()
+        lib.shardPoints(*(args + (indices,)))
+        (cbPoints, cbIndices, cbGrid) = (ctypes.sizeof(arrPoints), ctypes.sizeof(indices),
+                                         ctypes.sizeof(grid.data))
+
+        shmPoints = shared_memory.SharedMemory(create=True, size=cbPoints)
+        shmIndices = shared_memory.SharedMemory(create=True, size=cbIndices)
+        shmGrid = shared_memory.SharedMemory(create=True, size=cbGrid)
+        try:
+            shmPoints.buf[:cbPoints] = memoryview(arrPoints).cast('B')
+            shmIndices.buf[:cbIndices] = memoryview(indices).cast('B')
+            shmGrid.buf[:cbGrid] = memoryview(grid.data).cast('B')
+
+            # bands no dot reaches are left as they are
+            jobs = [(self.libpath, shmPoints.name, len(arrPoints), shmIndices.name,
+                     offsets[k], offsets[k + 1] - offsets[k], shmGrid.name,
+                     grid.size, self.dotsize, bounds, self.weighted,
+                     int(grid.engine == 'additive'), int(bool(self.aggregate)),
+                     k * bandHeight, min((k + 1) * bandHeight, height))
+                    for k in range(bands) if offsets[k + 1] > offsets[k]]
+            if self.pool is not None:
+                results = list(self.pool.map(_renderBand, jobs))
+            else:
+                with concurrent.futures.ProcessPoolExecutor(self.workers) as pool:
+                    results = list(pool.map(_renderBand, jobs))
+            if not all(results):
+                raise Exception("Unexpected error during processing.")
+
+            memoryview(grid.data).cast('B')[:] = shmGrid.buf[:cbGrid]
+        finally:
+            shmPoints.close()
+            shmPoints.unlink()
+            shmIndices.close()
+            shmIndices.unlink()
+            shmGrid.close()
+            shmGrid.unlink()
+
+    def render(self, points, scheme="classic", opacity=128, normalize='linear', percentile=99.0,
+               saturation=5.0):
+        """
+        Renders points, in any of the layouts Heatmap.heatmap() accepts, and
+        returns a HeatmapResult.  scheme, opacity, normalize, percentile and
+        saturation are as for Heatmap.heatmap().
+        """
+        self._hm._checkScheme(scheme)
+        self._hm._checkNormalize(normalize, saturation)
+        return self._hm.colorize(self.density(points), scheme, opacity, normalize, percentile,
+                                 saturation=saturation, _stacklevel=3)
@@ -0,0 +1,336 @@
+import os
+import math
+import array
+import ctypes
+import threading
+import collections
+import concurrent.futures
+from PIL import Image
+from .heatmap import Heatmap, _flattenPoints, _floatView, _floatArray, _transformer, _checkPyproj
+
+# half the width of the EPSG:3857 world, in meters
+EXTENT = 20037508.342789244
+TILE_SIZE = 256
+
+# deepest zoom level rendered, its tiles are a few centimeters across
+MAX_ZOOM = 30
+
+# most cells a zoom level's spatial index may have, coarser cells are used
+# when the points span more tiles than this
+MAX_CELLS = 1 << 20
+
+def tileBounds(z, x, y):
+    """ EPSG:3857 bounds of tile z/x/y as ((minX, minY), (maxX, maxY)) """
+    res = 2 * EXTENT / (1 << z)
+    return ((-EXTENT + x * res, EXTENT - (y + 1) * res),
+            (-EXTENT + (x + 1) * res, EXTENT - y * res))
+
+class LRUCache:
+    """
+    Least recently used cache bounded by the total size of its values, in bytes.
+    Safe to use from several threads.
+
+    maxBytes -> size the values may add up to, older ones are dropped beyond it
+    """
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._items:
+                self.nbytes -= self._items.pop(key)[1]
+            if nbytes > self.maxBytes:
+                return
+            self._items[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.maxBytes:
+                self.nbytes -= self._items.popitem(last=False)[1][1]
+
+    def __len__(self):
+        return len(self._items)
+
+class _TileIndex:
+    """ points of one zoom level binned by binPoints() in heatmap.c into cells of
+    2**shift by 2**shift tiles, the first cell being tile (col0 << shift, row0 << shift) """
+
+    def __init__(self, shift, col0, row0, cols, rows, offsets, indices):
+        self.shift = shift
+        self.col0 = col0
+        self.row0 = row0
+        self.cols = cols
+        self.rows = rows
+        self.offsets = offsets
+        self.indices = indices
+        self.nbytes = ctypes.sizeof(offsets) + ctypes.sizeof(indices)
+
+class TileRenderer:
+    """
+    Renders heatmaps as XYZ (slippy map) tiles of 256x256 pixels in the Web Mercator
+    projection, without ever rendering the whole map at once.
+
+    tr = TileRenderer(points, dotsize=50, srcepsg='EPSG:4326')
+    tr.saveTiles("tiles", range(0, 12), scheme="fire")
+
+    Points are binned spatially once per zoom level so every tile only stamps the
+    points within a dot of it.  Dots crossing a tile edge are stamped on both tiles,
+    so adjacent tiles join up seamlessly.
+
+    points   -> as for Heatmap.heatmap()
+    dotsize  -> size of a single coordinate in the output image in pixels, as for
+                Heatmap.heatmap() but applied at every zoom level
+    weighted -> as for Heatmap.heatmap()
+    srcepsg  -> EPSG code of the points, they are taken to be EPSG:3857 already when
+                None
+    threads  -> threads heatmap.c uses per tile, see Heatmap.heatmap()
+    aggregate -> merge near duplicate points per tile, see Heatmap.heatmap()
+    indexCacheBytes -> bytes of spatial indexes to keep, the least recently used
+                zoom levels are binned again when asked for after being dropped
+
+    Only the multiply engine is supported, normalizing the additive engine per
+    tile would not join up.  A TileRenderer can render tiles from several
+    threads at once.
+    """
+
+    def __init__(self, points, dotsize=50, weighted=0, srcepsg=None, threads=1, libpath=None,
+                 aggregate=False, indexCacheBytes=64*1024*1024):
+        _checkPyproj(srcepsg, 'EPSG:3857')
+
+        self.dotsize = dotsize
+        self.weighted = weighted
+        self.srcepsg = srcepsg
+        self.threads = threads
+        self.aggregate = aggregate
+        self._hm = Heatmap(libpath)
+        self._indexes = LRUCache(indexCacheBytes)
+        self._lock = threading.Lock()
+        # tiles either side a dot can reach into
+        self._halo = (dotsize + TILE_SIZE - 1) // TILE_SIZE
+
+        points, view = _flattenPoints(points)
+        inc = 3 if weighted else 2
+        xs = array.array('d', points[0::inc])
+        ys = array.array('d', points[1::inc])
+        if srcepsg is not None and srcepsg != 'EPSG:3857':
+          xs, ys = (array.array('d', v) for v in _transformer(srcepsg, 'EPSG:3857').transform(xs, ys))
+
+        # float32 loses meters this far from (0, 0), keep the points relative
+        # to the corner of their extent instead
+        self._extent = ((max(min(xs, default=0), -EXTENT), max(min(ys, default=0), -EXTENT)),
+                        (min(max(xs, default=0), EXTENT), min(max(ys, default=0), EXTENT)))
+        (ox, oy) = self._origin = self._extent[0]
+        if view is not None:
+            local = array.array('f', _floatView(view).tobytes())
+        else:
+            local = array.array('f', points)
+        self._points = _floatArray(memoryview(local))
+        ret = self._hm._heatmap.offsetPoints(
+            self._points, len(self._points), weighted,
+            (ctypes.c_double * len(xs)).from_buffer(xs), (ctypes.c_double * len(ys)).from_buffer(ys),
+            ctypes.c_double(ox), ctypes.c_double(oy))
+        if not ret:
+            raise Exception("Unexpected error during processing.")
+
+    def _index(self, z):
+        """ spatial index of zoom level z, built on first use.  None without points
+        on the map """
+        if not 0 <= z <= MAX_ZOOM:
+            raise Exception("Invalid zoom level: %s.  Zoom must be 0-%d" % (z, MAX_ZOOM))
+        with self._lock:
+            index = self._indexes.get(z, self)
+            if index is self:
+                index = self._buildIndex(z)
+                # levels without points are remembered too, at a nominal cost
+                self._indexes.put(z, index, index.nbytes if index is not None else 64)
+            return index
+
+    def _buildIndex(self, z):
+        n = 1 << z
+        res = 2 * EXTENT / n
+        ((minX, minY), (maxX, maxY)) = self._extent
+        col0 = max(int(math.floor((minX + EXTENT) / res)), 0)
+        col1 = min(int(math.floor((maxX + EXTENT) / res)), n - 1)
+        row0 = max(int(math.floor((EXTENT - maxY) / res)), 0)
+        row1 = min(int(math.floor((EXTENT - minY) / res)), n - 1)
+        if len(self._points) == 0 or col0 > col1 or row0 > row1:
+            return None
+
+        shift = 0
+        while ((col1 >> shift) - (col0 >> shift) + 1) * ((row1 >> shift) - (row0 >> shift) + 1) > MAX_CELLS:
+            shift += 1
+        col0, col1, row0, row1 = col0 >> shift, col1 >> shift, row0 >> shift, row1 >> shift
+        cols = col1 - col0 + 1
+        rows = row1 - row0 + 1
+
+        cellRes = res * (1 << shift)
+        west = -EXTENT + col0 * cellRes - self._origin[0]
+        north = EXTENT - row0 * cellRes - self._origin[1]
+        offsets = (ctypes.c_uint * (cols * rows + 1))()
+        indices = (ctypes.c_uint * (len(self._points) // (3 if self.weighted else 2)))()
+        ret = self._hm._heatmap.binPoints(
+            self._points, len(self._points), self.weighted,
+            ctypes.c_float(west), ctypes.c_float(north - rows * cellRes),
+            ctypes.c_float(west + cols * cellRes), ctypes.c_float(north),
+            cols, rows, offsets, indices)
+        if ret < 0:
+            raise Exception("Unexpected error during processing.")
+
+        return _TileIndex(shift, col0, row0, cols, rows, offsets, indices)
+
+    def tiles(self, z):
+        """
+        Returns the (x, y) of the tiles at zoom level z that may have dots on them,
+        sorted.  Tiles near the points but left blank are included.
+        """
+        index = self._index(z)
+        if index is None:
+            return []
+
+        # the tiles the points fall in, found among the points of the index's
+        # non empty cells, then every tile their dots can reach
+        n = 1 << z
+        res = 2 * EXTENT / n
+        halo = self._halo
+        shift = index.shift
+        col0 = index.col0 << shift
+        row0 = index.row0 << shift
+        cols = index.cols << shift
+        rows = index.rows << shift
+        west = -EXTENT + col0 * res - self._origin[0]
+        north = EXTENT - row0 * res - self._origin[1]
+        lib = self._hm._heatmap
+        args = (self._points, len(self._points), self.weighted,
+                ctypes.c_float(west), ctypes.c_float(north - rows * res),
+                ctypes.c_float(west + cols * res), ctypes.c_float(north), cols, rows,
+                index.indices, index.offsets[index.cols * index.rows])
+        count = lib.occupiedCells(*(args + (None,)))
+        if count < 0:
+            raise Exception("Unexpected error during processing.")
+        occupied = (ctypes.c_uint * (2 * count))()
+        lib.occupiedCells(*(args + (occupied,)))
+
+        found = set()
+        for i in range(0, 2 * count, 2):
+            (col, row) = (col0 + occupied[i], row0 + occupied[i + 1])
+            found.update((x, y) for x in range(max(col - halo, 0), min(col + halo, n - 1) + 1)
+                         for y in range(max(row - halo, 0), min(row + halo, n - 1) + 1))
+        return sorted(found)
+
+    def _subset(self, z, x, y):
+        """ indices of the points that may reach tile z/x/y, in their original order """
+        index = self._index(z)
+        if index is None:
+            return None
+
+        lib = self._hm._heatmap
+        halo = self._halo
+        shift = index.shift
+        cells = (index.offsets, index.indices, index.cols, index.rows,
+                 ((x - halo) >> shift) - index.col0, ((y - halo) >> shift) - index.row0,
+                 ((x + halo) >> shift) - index.col0, ((y + halo) >> shift) - index.row0)
+        count = lib.gatherCells(*(cells + (None,)))
+        if count <= 0:
+            return None
+        subset = (ctypes.c_uint * count)()
+        lib.gatherCells(*(cells + (subset,)))
+        return subset
+
+    def density(self, z, x, y):
+        """
+        Stamps the points onto tile z/x/y.  Returns its density pixels (TILE_SIZE**2
+        bytes, 255 where empty) to colorize with colorize(), or None when no dot
+        touches the tile.
+        """
+        n = 1 << z
+        if not (0 <= z <= MAX_ZOOM and 0 <= x < n and 0 <= y < n):
+            return None
+        subset = self._subset(z, x, y)
+        if subset is None:
+            return None
+
+        # each bound is computed the same way for the tiles either side of it
+        ((west, south), (east, north)) = tileBounds(z, x, y)
+        (ox, oy) = self._origin
+        pixels = (ctypes.c_ubyte * (TILE_SIZE * TILE_SIZE))()
+        ctypes.memset(pixels, 0xff, len(pixels))
+        ret = self._hm._heatmap.multiply(
+            self._points, len(self._points), TILE_SIZE, TILE_SIZE, self.dotsize, 1,
+            ctypes.c_float(west - ox), ctypes.c_float(south - oy),
+            ctypes.c_float(east - ox), ctypes.c_float(north - oy),
+            self.weighted, pixels, self.threads, subset, len(subset), int(bool(self.aggregate)))
+        if not ret:
+            raise Exception("Unexpected error during processing.")
+
+        # levels above 252 are drawn transparent
+        if min(bytes(pixels)) > 252:
+            return None
+        return pixels
+
+    def colorize(self, pixels, scheme="classic", opacity=128):
+        """
+        Colorizes density pixels returned by density(), returns the tile as an image.
+        """
+        self._hm._checkScheme(scheme)
+        return self._colorize(pixels, self._hm._convertScheme(scheme, opacity))
+
+    def _colorize(self, pixels, lut):
+        arrFinalImage = self._hm._allocOutputBuffer((TILE_SIZE, TILE_SIZE))
+        ret = self._hm._heatmap.colorizePixels(
+            pixels, TILE_SIZE, TILE_SIZE, lut, arrFinalImage, 0, ctypes.c_float(0), self.threads, None)
+        if not ret:
+            raise Exception("Unexpected error during processing.")
+        return Image.frombuffer('RGBA', (TILE_SIZE, TILE_SIZE), arrFinalImage, 'raw', 'RGBA', 0, 1)
+
+    def tile(self, z, x, y, scheme="classic", opacity=128):
+        """
+        Renders tile z/x/y, returns it as an image or None when it would be blank.
+        """
+        self._hm._checkScheme(scheme)
+        pixels = self.density(z, x, y)
+        if pixels is None:
+            return None
+        return self._colorize(pixels, self._hm._convertScheme(scheme, opacity))
+
+    def saveTiles(self, directory, zooms, scheme="classic", opacity=128, workers=None):
+        """
+        Renders the tiles of every zoom level in zooms and saves them as
+        directory/z/x/y.png.  Blank tiles are not saved.  Returns the number of
+        tiles saved.
+
+        directory -> root of the tile tree, created as needed
+        zooms     -> zoom levels to render, e.g. range(0, 12)
+        scheme    -> name of color scheme to use to color the output image
+        opacity   -> opacity (0-255) of the heatmap
+        workers   -> tiles rendered and written at once, as for
+                     concurrent.futures.ThreadPoolExecutor
+        """
+        self._hm._checkScheme(scheme)
+        lut = self._hm._convertScheme(scheme, opacity)
+
+        def save(job):
+            (z, x, y) = job
+            pixels = self.density(z, x, y)
+            if pixels is None:
+                return 0
+            path = os.path.join(directory, str(z), str(x))
+            os.makedirs(path, exist_ok=True)
+            self._colorize(pixels, lut).save(os.path.join(path, "%d.png" % y))
+            return 1
+
+        jobs = [(z, x, y) for z in zooms for (x, y) in self.tiles(z)]
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            return sum(pool.map(save, jobs))
@@ -1,48 +1,52 @@
 import os
-import glob
 
 #here use a flag so don't automatically use setuptools if available, hard to test otherwise
 with_setuptools = False
 if 'USE_SETUPTOOLS' in os.environ or 'pip' in __file__ or 'easy_install' in __file__:
   try:
-    from setuptools.command.install import install
     from setuptools import setup
     from setuptools import Extension
     from setuptools.command.build_ext import build_ext
+    from setuptools.errors import CompileError, LinkError
     with_setuptools = True
   except ImportError:
     pass
 if not with_setuptools:
-    from distutils.command.install import install
     from distutils.core import setup
     from distutils.core import Extension
     from distutils.command.build_ext import build_ext
-
-# sorry for this, welcome feedback on the "right" way.
-# shipping pre-compiled bainries on windows, have
-# to hack things up here.
+    from distutils.errors import CompileError, LinkError
 
 class mybuild(build_ext):
-    def run(self):
-        if "nt" in os.name:
-            print("On Windows, skipping build_ext.")
-            return
-        build_ext.run(self)
-
-class post_install(install):
-    def run(self):
-        install.run(self)
+    # heatmap.c is a plain library loaded with ctypes, it has no PyInit_
+    # function for the MSVC linker to export
+    def get_export_symbols(self, ext):
+        return ext.export_symbols
 
-        # on windows boxes, manually copy pre-compiled DLLs to
-        # site-packages (or wherever the module is being installed)
-        if "nt" in os.name:
-            basedir = os.path.dirname(__file__)
-            for f in glob.glob(os.path.join(basedir, "*.dll")):
-                src = os.path.join(basedir, f)
-                dst = os.path.join(self.install_lib, f)
-                open(dst, "wb").write(open(src, "rb").read())
+    # OpenMP renders on all cores when the compiler has it, heatmap.c
+    # falls back to a single thread when built without.
+    def build_extension(self, ext):
+        compile_args = ext.extra_compile_args
+        link_args = ext.extra_link_args
+        if self.compiler.compiler_type == 'msvc':
+            ext.extra_compile_args = compile_args + ['/openmp']
+        else:
+            ext.extra_compile_args = compile_args + ['-fopenmp']
+            ext.extra_link_args = link_args + ['-fopenmp']
+        try:
+            build_ext.build_extension(self, ext)
+        except (CompileError, LinkError):
+            print("OpenMP not available, building single threaded.")
+            ext.extra_compile_args = compile_args
+            ext.extra_link_args = link_args
+            build_ext.build_extension(self, ext)
 
-cHeatmap = Extension('cHeatmap', sources=['heatmap/heatmap.c', ])
+# HEATMAP_NO_SIMD=1 builds heatmap.c with only its plain C kernels
+macros = [('HEATMAP_NO_SIMD', '1')] if os.environ.get('HEATMAP_NO_SIMD') else []
+# Windows builds it from source too, WIN32 turns on its DLL exports
+if "nt" in os.name:
+    macros.append(('WIN32', '1'))
+cHeatmap = Extension('cHeatmap', sources=['heatmap/heatmap.c', ], define_macros=macros)
 
 #separate calls to remove errors
 basekw = {
@@ -55,8 +59,7 @@ basekw = {
       'packages' : ['heatmap', ],
       'py_modules' : ['heatmap.colorschemes', ],
       'ext_modules' : [cHeatmap, ],
-      'cmdclass' : {'install': post_install,
-                'build_ext': mybuild},
+      'cmdclass' : {'build_ext': mybuild},
       'classifiers' : [
                        'Programming Language :: Python', 
                        'Programming Language :: Python :: 2.6',
@@ -0,0 +1,213 @@
+"""
+Benchmarks of the render pipeline, stage by stage.
+
+    python test/bench.py                  # quick run, 1e3 to 1e5 points
+    python test/bench.py --full           # 1e3 to 1e7 points
+    python test/bench.py --save           # store the timings as the baselines
+    python test/bench.py --compare        # fail when a stage got slower
+
+Every stage is timed on its own, taking the best of --repeat runs: converting
+points from a list of tuples, reprojecting them with pyproj (when installed),
+finding their bounds, the density stage, colorizing, PNG encoding and writing
+KML.  Point stages are reported in points per second and image stages in pixels
+per second.
+
+Baselines are kept as JSON, by default in test/bench_baselines.json.  Timings
+only compare on the same machine, so the file isn't shipped and each machine
+saves its own before comparing.
+"""
+import os
+import io
+import sys
+import json
+import time
+import array
+import random
+import argparse
+import platform
+import tempfile
+
+import heatmap
+from heatmap import heatmap as _hm
+
+QUICK_COUNTS = (1000, 10000, 100000)
+FULL_COUNTS = (1000, 10000, 100000, 1000000, 10000000)
+DOTSIZES = (25, 150)
+SIZES = ((512, 512), (2048, 2048))
+# lists of tuples take around 100 bytes a point, beyond this converting them is
+# left out rather than running out of memory
+MAX_TUPLES = 1000000
+
+def makePoints(count, weighted, seed=0):
+    """ float32 x,y(,w) points around a few clusters within lon/lat range """
+    rnd = random.Random(seed)
+    centers = [(rnd.uniform(-120, 120), rnd.uniform(-60, 60)) for c in range(8)]
+    inc = 3 if weighted else 2
+    flat = array.array('f', bytes(4 * inc * count))
+    for n in range(count):
+        (cx, cy) = centers[n % len(centers)]
+        flat[n*inc] = rnd.gauss(cx, 10)
+        flat[n*inc+1] = max(min(rnd.gauss(cy, 5), 85), -85)
+        if weighted:
+            flat[n*inc+2] = rnd.uniform(.1, 2)
+    return flat
+
+def best(repeat, fn):
+    """ fastest of repeat runs of fn in seconds, and what the last one returned """
+    times = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), value
+
+def rate(count, seconds, unit):
+    if seconds <= 0:
+        return "-"
+    value = count / seconds
+    for (scale, prefix) in ((1e9, 'G'), (1e6, 'M'), (1e3, 'k')):
+        if value >= scale:
+            return "%.1f%s %s/s" % (value / scale, prefix, unit)
+    return "%.0f %s/s" % (value, unit)
+
+class Bench:
+
+    def __init__(self, repeat, out):
+        self.repeat = repeat
+        self.out = out
+        self.timings = {}
+        self.hm = heatmap.Heatmap()
+
+    def time(self, stage, case, count, unit, fn):
+        seconds, value = best(self.repeat, fn)
+        key = "%s %s" % (stage, case)
+        self.timings[key] = seconds
+        self.out.write("%-10s %-46s %10.4fs %16s\n" % (stage, case, seconds, rate(count, seconds, unit)))
+        self.out.flush()
+        return value
+
+    def points(self, count, weighted):
+        """ the stages that only depend on the points """
+        flat = makePoints(count, weighted)
+        inc = 3 if weighted else 2
+        case = "n=%d weighted=%d" % (count, weighted)
+        if count <= MAX_TUPLES:
+            tuples = [tuple(flat[n*inc:(n+1)*inc]) for n in range(count)]
+            self.time("convert", case, count, "pts",
+                      lambda: self.hm._convertPoints(tuples, weighted, None, 'EPSG:3857'))
+            del tuples
+        if _hm._pyproj():
+            self.time("reproject", case, count, "pts",
+                      lambda: _hm._reproject(flat, weighted, 'EPSG:4326', 'EPSG:3857'))
+        arrPoints = _hm._floatArray(memoryview(flat))
+        self.time("bounds", case, count, "pts",
+                  lambda: _hm._pointBounds(self.hm._heatmap, arrPoints, weighted))
+        return flat
+
+    def render(self, flat, count, weighted, dotsize, size, engine):
+        """ the stages that depend on the image too """
+        case = "n=%d weighted=%d dotsize=%d size=%dx%d %s" % (
+            count, weighted, dotsize, size[0], size[1], engine)
+        pixels = size[0] * size[1]
+        grid = self.time("density", case, count, "pts",
+                         lambda: self.hm.density(flat, dotsize, size, weighted=weighted, engine=engine))
+        result = self.time("colorize", case, pixels, "px",
+                           lambda: self.hm.colorize(grid, "classic"))
+        self.time("png", case, pixels, "px",
+                  lambda: result.img.save(io.BytesIO(), "PNG"))
+        (fd, kml) = tempfile.mkstemp(suffix=".kml")
+        os.close(fd)
+        try:
+            self.time("kml", case, count, "pts", lambda: result.saveKML(kml))
+        finally:
+            os.remove(kml)
+
+class Tee:
+    """ writes to several files at once """
+
+    def __init__(self, *files):
+        self.files = files
+
+    def write(self, text):
+        for f in self.files:
+            f.write(text)
+
+    def flush(self):
+        for f in self.files:
+            f.flush()
+
+def compare(timings, baselines, tolerance, minTime, out):
+    """ writes the stages slower than their baselines by more than tolerance,
+    returns how many there are.  stages that took less than minTime are too
+    noisy to tell and left out. """
+    regressions = 0
+    for (key, seconds) in sorted(timings.items()):
+        before = baselines.get(key)
+        if not before or before < minTime:
+            continue
+        if seconds > before * (1 + tolerance):
+            regressions += 1
+            out.write("SLOWER %-57s %10.4fs was %.4fs (%+.0f%%)\n" % (
+                key, seconds, before, 100 * (seconds / before - 1)))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the heatmap render pipeline")
+    parser.add_argument("--full", action="store_true", help="go up to 1e7 points")
+    parser.add_argument("--counts", type=int, nargs="+", help="point counts to run")
+    parser.add_argument("--dotsizes", type=int, nargs="+", default=DOTSIZES)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[s[0] for s in SIZES],
+                        help="widths of square images to render")
+    parser.add_argument("--engines", nargs="+", default=["multiply", "additive"])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best counts")
+    parser.add_argument("--baselines", default=os.path.join(os.path.dirname(__file__), "bench_baselines.json"))
+    parser.add_argument("--save", action="store_true", help="store the timings as the baselines")
+    parser.add_argument("--compare", action="store_true",
+                        help="exit with 1 when a stage is slower than its baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown allowed before --compare fails, 0.25 for 25%%")
+    parser.add_argument("--min-time", type=float, default=0.005,
+                        help="stages faster than this many seconds aren't compared")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    counts = args.counts or (FULL_COUNTS if args.full else QUICK_COUNTS)
+
+    report = open(args.output, "w") if args.output else None
+    out = Tee(sys.stdout, report) if report else sys.stdout
+    try:
+        out.write("python %s on %s, simd %s\n" % (
+            platform.python_version(), platform.machine(), heatmap.simd()))
+        bench = Bench(args.repeat, out)
+        for count in counts:
+            for weighted in (0, 1):
+                flat = bench.points(count, weighted)
+                for dotsize in args.dotsizes:
+                    for width in args.sizes:
+                        for engine in args.engines:
+                            bench.render(flat, count, weighted, dotsize, (width, width), engine)
+                del flat
+
+        regressions = 0
+        if args.compare:
+            with open(args.baselines) as fh:
+                baselines = json.load(fh)["timings"]
+            regressions = compare(bench.timings, baselines, args.tolerance, args.min_time, out)
+            out.write("%d stages slower than the baselines\n" % regressions)
+        if args.save:
+            baselines = {}
+            if os.path.exists(args.baselines):
+                with open(args.baselines) as fh:
+                    baselines = json.load(fh)["timings"]
+            baselines.update(bench.timings)
+            with open(args.baselines, "w") as fh:
+                json.dump({"python" : platform.python_version(), "machine" : platform.machine(),
+                           "timings" : baselines}, fh, indent=1, sort_keys=True)
+            out.write("baselines saved to %s\n" % args.baselines)
+    finally:
+        if report:
+            report.close()
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
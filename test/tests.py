@@ -1,4 +1,12 @@
 import random
+import sys
+import os
+import io
+import array
+import threading
+import warnings
+import concurrent.futures
+import ctypes
 
 from PIL import Image
 
@@ -86,6 +94,569 @@ class TestHeatmap(unittest.TestCase):
         self.assertEqual(tt,f)
         self.assertEqual(tt,fw)
 
+    def test_heatmap_buffer_datatypes(self):
+        #float32 buffers skip the python conversion, should be the same as the flat list
+        pts = [(random.random(),random.random(),1) for x in range(400)]
+        flat = sum(map(lambda x_y_z : [x_y_z[0],x_y_z[1]], pts),[])
+        flatw = sum(map(list, pts),[])
+        f = self.heatmapImage("12-400-flat", flat)
+        af = self.heatmapImage("12-400-arrayf", array.array('f', flat))
+        afw = self.heatmapImage("12-400-arrayfweighted", array.array('f', flatw), kwargs = { "weighted" : True })
+        ad = self.heatmapImage("12-400-arrayd", array.array('d', flat))
+        mv = self.heatmapImage("12-400-memoryview", memoryview(array.array('f', flat)))
+        ro = self.heatmapImage("12-400-readonly", memoryview(array.array('f', flat).tobytes()).cast('f'))
+        st = self.heatmapImage("12-400-strided", memoryview(array.array('f', [v for v in flat for r in range(2)]))[::2])
+        self.assertEqual(f,af)
+        self.assertEqual(f,afw)
+        self.assertEqual(f,ad)
+        self.assertEqual(f,mv)
+        self.assertEqual(f,ro)
+        self.assertEqual(f,st)
+
+    def test_heatmap_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not available")
+        pts = [(random.random(),random.random(),1) for x in range(400)]
+        flat = sum(map(lambda x_y_z : [x_y_z[0],x_y_z[1]], pts),[])
+        f = self.heatmapImage("13-400-flat", flat)
+        n2 = self.heatmapImage("13-400-numpy2", numpy.array(flat, dtype=numpy.float32).reshape(-1, 2))
+        n3 = self.heatmapImage("13-400-numpy3", numpy.array(pts, dtype=numpy.float32), kwargs = { "weighted" : True })
+        n64 = self.heatmapImage("13-400-numpy64", numpy.array(flat).reshape(-1, 2))
+        #strided views are copied into a contiguous buffer first
+        cols = self.heatmapImage("13-400-numpycols", numpy.array(pts, dtype=numpy.float32)[:, :2])
+        rows = self.heatmapImage("13-400-numpyrows", numpy.repeat(numpy.array(flat, dtype=numpy.float32).reshape(-1, 2), 2, axis=0)[::2])
+        self.assertEqual(f,n2)
+        self.assertEqual(f,n3)
+        self.assertEqual(f,n64)
+        self.assertEqual(f,cols)
+        self.assertEqual(f,rows)
+
+    def test_heatmap_baseline(self):
+        #stamping must give the very bytes the original per pixel loop of calcDensity did
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy not available")
+        f = numpy.float32
+        (width, height) = (61, 47)
+        area = ((-3, -2), (58, 45))
+        rnd = random.Random(23)
+        pts = [(rnd.uniform(-8, 66), rnd.uniform(-7, 52), rnd.uniform(.3, 1.5)) for x in range(60)]
+        #dots on pixel corners and centres too
+        pts += [(x + o, y + o, 1) for x in (-3, 10, 57) for y in (-2, 20, 44) for o in (0, .5)]
+
+        def reference(dotsize, weighted):
+            pixels = numpy.full((height, width), 255, dtype=numpy.int64)
+            midpt = f(dotsize) / f(2)
+            radius = f(numpy.sqrt(midpt*midpt + midpt*midpt)) / f(2)
+            for (x, y, w) in pts:
+                px = (f(x) - f(area[0][0])) / (f(area[1][0]) - f(area[0][0])) * f(width)
+                py = (f(1) - (f(y) - f(area[0][1])) / (f(area[1][1]) - f(area[0][1]))) * f(height)
+                js = numpy.arange(int(f(int(px)) - midpt), int(px) + dotsize + 1)
+                js = js[js < f(int(px)) + midpt]
+                ks = numpy.arange(int(py - midpt), int(py + midpt))
+                js = js[(js >= 0) & (js < width)]
+                ks = ks[(ks >= 0) & (ks < height)]
+                (j, k) = numpy.meshgrid(js, ks)
+                dx = j.astype(f) - px
+                dy = k.astype(f) - py
+                dist = numpy.sqrt(dx*dx + dy*dy)
+                inside = dist <= radius
+                falloff = f(200) * (dist / radius) + f(50)
+                if weighted:
+                    falloff = falloff / f(w)
+                pixVal = numpy.minimum(falloff.astype(numpy.int64), 255)
+                (j, k, pixVal) = (j[inside], k[inside], pixVal[inside])
+                pixels[k, j] = pixels[k, j] * pixVal // 255
+            return pixels.astype(numpy.uint8).tobytes()
+
+        for dotsize in (1, 2, 7, 20, 33):
+            for weighted in (0, 1):
+                data = pts if weighted else [(x, y) for (x, y, w) in pts]
+                for threads in (1, 3):
+                    grid = self.heatmap.density(data, dotsize, (width, height), area, weighted=weighted,
+                                                threads=threads)
+                    self.assertEqual(bytes(grid.data), reference(dotsize, weighted))
+
+    def test_heatmap_threads(self):
+        #row bands keep the point order so any thread count should give the same image
+        pts = [(random.random(),random.random(),random.uniform(.5,1)) for x in range(4000)]
+        single = self.heatmapImage("14-4k-1thread", pts, kwargs = { "dotsize" : 50, "weighted" : 1 })
+        multi = self.heatmapImage("14-4k-4threads", pts, kwargs = { "dotsize" : 50, "weighted" : 1, "threads" : 4 })
+        cores = self.heatmapImage("14-4k-allthreads", pts, kwargs = { "dotsize" : 50, "weighted" : 1, "threads" : 0 })
+        self.assertEqual(single,multi)
+        self.assertEqual(single,cores)
+        pts = [(x, y) for (x, y, w) in pts[:100]]
+        single = self.heatmapImage("14-4k-1threadunweighted", pts, kwargs = { "size" : (300, 2000) })
+        multi = self.heatmapImage("14-4k-7threadsunweighted", pts, kwargs = { "size" : (300, 2000), "threads" : 7 })
+        self.assertEqual(single,multi)
+
+    def test_heatmap_render_concurrent(self):
+        #one Heatmap shared by several threads, each render should match a serial one
+        pts = [(random.random(),random.random()) for x in range(2000)]
+        kwargs = [{ "dotsize" : 25 + 10*x, "scheme" : scheme } for x, scheme in enumerate(sorted(colorschemes.valid_schemes()))]
+        expected = [self.heatmap.render(pts, **kw).img for kw in kwargs]
+        results = [None] * len(kwargs)
+        def render(i):
+            results[i] = self.heatmap.render(pts, **kwargs[i])
+        threads = [threading.Thread(target=render, args=(i,)) for i in range(len(kwargs))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for result, img in zip(results, expected):
+            self.assertTrue(isinstance(result, heatmap.HeatmapResult))
+            self.assertEqual(result.img, img)
+        self.assertEqual(results[0].area, self.heatmap.render(pts, area=results[0].area).area)
+        flat = sum(map(list, pts), [])
+        self.assertEqual(results[0].area, ((min(flat[0::2]), min(flat[1::2])), (max(flat[0::2]), max(flat[1::2]))))
+        results[0].saveKML("15-2k-render.kml")
+        self.assertTrue(self.heatmap.img is None)
+
+    def test_heatmap_additive(self):
+        #normalization is deferred so scaling every weight by 2 (exact in float) changes nothing
+        pts = [(random.random(),random.random(),1) for x in range(4000)]
+        additive = self.heatmapImage("17-4k-additive", pts, kwargs = { "dotsize" : 50, "weighted" : 1, "engine" : "additive" })
+        double = self.heatmapImage("17-4k-additivedouble", [(x,y,2) for (x,y,w) in pts], kwargs = { "dotsize" : 50, "weighted" : 1, "engine" : "additive" })
+        threaded = self.heatmapImage("17-4k-additivethreads", pts, kwargs = { "dotsize" : 50, "weighted" : 1, "engine" : "additive", "threads" : 3 })
+        unweighted = self.heatmapImage("17-4k-additiveunweighted", [(x,y) for (x,y,w) in pts], kwargs = { "dotsize" : 50, "engine" : "additive" })
+        self.assertEqual(additive,double)
+        self.assertEqual(additive,threaded)
+        self.assertEqual(additive,unweighted)
+        multiply = self.heatmapImage("17-4k-multiply", pts, kwargs = { "dotsize" : 50, "weighted" : 1 })
+        log = self.heatmapImage("17-4k-additivelog", pts, kwargs = { "dotsize" : 50, "weighted" : 1, "engine" : "additive", "normalize" : "log" })
+        clipped = self.heatmapImage("17-4k-additivepercentile", pts, kwargs = { "dotsize" : 50, "weighted" : 1, "engine" : "additive", "normalize" : "percentile", "percentile" : 90 })
+        self.assertNotEqual(additive,multiply)
+        self.assertNotEqual(additive,log)
+        self.assertNotEqual(additive,clipped)
+        self.assertRaises(Exception, self.heatmap.heatmap, pts, engine="invalid")
+        self.assertRaises(Exception, self.heatmap.heatmap, pts, engine="additive", normalize="invalid")
+
+    def test_heatmap_accumulator(self):
+        #feeding the points in chunks should give the same image as all at once
+        pts = [(random.random(),random.random(),random.uniform(.5,1)) for x in range(4000)]
+        area = ((0, 0), (1, 1))
+        for engine in ("multiply", "additive"):
+            whole = self.heatmapImage("18-4k-whole" + engine, pts, kwargs = { "dotsize" : 50, "weighted" : 1, "area" : area, "engine" : engine, "scheme" : "fire" })
+            acc = heatmap.HeatmapAccumulator((1024, 1024), area, dotsize=50, weighted=1, engine=engine)
+            for chunk in (pts[i:i+700] for i in range(0, len(pts), 700)):
+                acc.add(chunk)
+            acc.add([])
+            self.assertEqual(acc.count, len(pts))
+            result = acc.render("fire")
+            result.saveKML("18-4k-chunked" + engine + ".kml")
+            self.assertEqual(whole, result.img)
+            self.assertEqual(result.area, area)
+            self.assertNotEqual(whole, acc.render("classic").img)
+
+    def test_heatmap_from_file(self):
+        #memory mapped float32 files should match the same values passed as an array
+        flat = array.array('f', [v for x in range(4000) for v in (random.random(),random.random(),random.uniform(.5,1))])
+        if sys.byteorder != 'little':
+            flat.byteswap()
+        fh = open("19-4k-points.bin", "wb")
+        flat.tofile(fh)
+        fh.close()
+        if sys.byteorder != 'little':
+            flat.byteswap()
+        weighted = self.heatmapImage("19-4k-array", flat, kwargs = { "weighted" : 1 })
+        mapped = self.heatmap.heatmap_from_file("19-4k-points.bin", weighted=1)
+        self.assertEqual(weighted, mapped)
+        #read as unweighted pairs the same file has 6000 points
+        unweighted = self.heatmapImage("19-6k-array", flat, kwargs = { "area" : ((0, 0), (1, 1)) })
+        mapped = self.heatmap.heatmap_from_file("19-4k-points.bin", area=((0, 0), (1, 1)))
+        self.heatmap.saveKML("19-6k-mapped.kml")
+        self.assertEqual(unweighted, mapped)
+        fh = open("19-partial.bin", "wb")
+        flat[:4].tofile(fh)
+        fh.close()
+        self.assertRaises(Exception, self.heatmap.heatmap_from_file, "19-partial.bin", weighted=1)
+
+    def test_heatmap_density_colorize(self):
+        #one density grid colorized in every scheme should match rendering each scheme
+        pts = [(random.random(),random.random(),random.uniform(.5,1)) for x in range(2000)]
+        for engine in ('multiply', 'additive'):
+            grid = self.heatmap.density(pts, dotsize=40, size=(400, 300), weighted=1, engine=engine)
+            self.assertEqual(grid.size, (400, 300))
+            for scheme in sorted(colorschemes.valid_schemes()):
+                expected = self.heatmap.render(pts, dotsize=40, size=(400, 300), weighted=1,
+                                               engine=engine, scheme=scheme, opacity=200).img
+                result = self.heatmap.colorize(grid, scheme, 200)
+                result.img.save("22-%s-%s.png" % (engine, scheme))
+                self.assertEqual(expected, result.img)
+            self.assertEqual(result.area, self.heatmap.render(pts, weighted=1).area)
+        self.assertRaises(Exception, self.heatmap.colorize, grid, "nosuchscheme")
+
+    def test_heatmap_scheme_lut(self):
+        #lookup tables are built once per scheme and opacity and match the scheme
+        lut = heatmap.heatmap._schemeLUT("fire", 77)
+        self.assertTrue(lut is heatmap.heatmap._schemeLUT("fire", 77))
+        rgba = bytearray(lut)
+        for level, (r, g, b) in enumerate(colorschemes.schemes["fire"]):
+            self.assertEqual(tuple(rgba[level*4:level*4+4]), (r, g, b, 77 if level <= 252 else 0))
+        pts = [(random.random(), random.random()) for x in range(100)]
+        self.assertRaises(Exception, self.heatmap.heatmap, pts, opacity=256)
+
+    def test_heatmap_lazy_import(self):
+        #importing heatmap shouldn't pull in PIL or pyproj, they're loaded on first use
+        import subprocess
+        code = ("import sys, heatmap; heatmap.Heatmap(); heatmap.__version__; "
+                "print(sorted(m for m in ('PIL', 'pyproj', 'pkg_resources') if m in sys.modules))")
+        out = subprocess.check_output([sys.executable, "-c", code], cwd=os.path.dirname(heatmap.__path__[0]))
+        self.assertEqual(out.decode().strip(), "[]")
+
+    def test_heatmap_point_index(self):
+        #windows rendered from an index should match rendering all the points
+        pts = [(random.uniform(0, 1000), random.uniform(0, 1000), random.uniform(.5, 1)) for x in range(20000)]
+        index = heatmap.PointIndex(pts, weighted=1)
+        for n, area in enumerate((((100, 100), (200, 150)), ((990, 0), (1100, 40)),
+                                  ((0, 0), (1000, 1000)), ((2000, 2000), (2100, 2100)))):
+            kwargs = { "dotsize" : 50, "size" : (400, 200), "area" : area, "weighted" : 1 }
+            expected = self.heatmapImage("23-%d-points" % n, pts, kwargs = kwargs)
+            indexed = self.heatmapImage("23-%d-index" % n, index, kwargs = kwargs)
+            self.assertEqual(expected, indexed)
+        culled = index.query(((100, 100), (200, 150)), (400, 200), 50)
+        self.assertTrue(0 < len(culled) < len(pts) // 10)
+        self.assertEqual(list(culled), sorted(culled))
+        additive = self.heatmap.render(index, dotsize=50, area=((100, 100), (200, 150)), engine='additive').img
+        self.assertEqual(additive, self.heatmap.render(pts, dotsize=50, area=((100, 100), (200, 150)),
+                                                       weighted=1, engine='additive').img)
+
+    def test_heatmap_gaussian(self):
+        #the gaussian kernel should come out the same however the points are fed in
+        rnd = random.Random(18)
+        pts = [(rnd.gauss(500, 150), rnd.gauss(500, 150), rnd.uniform(.5, 1)) for x in range(20000)]
+        area = ((200, 300), (700, 600))
+        kwargs = { "dotsize" : 40, "size" : (300, 180), "area" : area, "weighted" : 1, "kernel" : "gaussian" }
+        img = self.heatmapImage("24-gaussian", pts, kwargs = kwargs)
+        self.assertEqual(img, self.heatmap.render(pts, threads=3, **kwargs).img)
+        self.assertEqual(img, self.heatmap.render(heatmap.PointIndex(pts, weighted=1), **kwargs).img)
+        acc = heatmap.HeatmapAccumulator((300, 180), area, dotsize=40, weighted=1, kernel="gaussian")
+        for i in range(0, len(pts), 7000):
+            acc.add(pts[i:i+7000])
+        self.assertEqual(img, acc.render().img)
+        #a lone point blurs out evenly about where its dot would end
+        lone = self.heatmap.render([(0, 0)], dotsize=40, size=(101, 101), area=((-50, -50), (50, 50)),
+                                   kernel="gaussian").img
+        self.assertEqual(lone.getpixel((50, 40)), lone.getpixel((50, 60)))
+        self.assertEqual(lone.getpixel((40, 50)), lone.getpixel((60, 50)))
+        self.assertNotEqual(lone.getpixel((50, 40))[3], 0)
+        self.assertEqual(lone.getpixel((50, 10))[3], 0)
+        self.assertRaises(Exception, self.heatmap.render, pts, kernel="box")
+
+    def test_heatmap_aggregate(self):
+        #without duplicates merging changes nothing
+        rnd = random.Random(19)
+        pts = [(rnd.random(), rnd.random(), rnd.uniform(.5, 1)) for x in range(3000)]
+        for kwargs in ({ "weighted" : 1 }, { "weighted" : 1, "threads" : 3 }):
+            self.assertEqual(self.heatmap.render(pts, **kwargs).img,
+                             self.heatmap.render(pts, aggregate=True, **kwargs).img)
+        #duplicates add up to one point of their total weight, stamped at the
+        #centre of their 1/16 pixel cell, here where the spots are
+        spots = [((rnd.randrange(16384) + .5) / 16384, (rnd.randrange(16384) + .5) / 16384)
+                 for x in range(200)]
+        dups = [spots[rnd.randrange(len(spots))] for x in range(20000)]
+        #in the order they first turn up, the order the intensities are summed in
+        counts = [(x, y, float(dups.count((x, y)))) for (x, y) in dict.fromkeys(dups)]
+        area = ((0, 0), (1, 1))
+        merged = self.heatmap.render(dups, area=area, engine='additive', aggregate=True).img
+        merged.save("25-aggregate.png")
+        self.assertEqual(merged, self.heatmap.render(counts, area=area, weighted=1, engine='additive').img)
+        #and come close to stamping every one
+        a = self.heatmap.render(dups, area=area, aggregate=True).img.tobytes()
+        b = self.heatmap.render(dups, area=area).img.tobytes()
+        self.assertTrue(sum(1 for (x, y) in zip(a, b) if x != y) < len(a) // 20)
+        #points a few thousandths of a pixel apart are merged as well
+        jitter = [(x + rnd.uniform(-.004, .004) / 1024, y + rnd.uniform(-.004, .004) / 1024)
+                  for (x, y) in dups]
+        for engine in ("multiply", "additive"):
+            stats = heatmap.RenderStats()
+            self.heatmap.render(jitter, area=area, engine=engine, stats=stats)
+            self.assertEqual(stats.stamped, 20000)
+            stats.reset()
+            result = self.heatmap.render(jitter, area=area, engine=engine, aggregate=True, stats=stats)
+            self.assertEqual(stats.stamped, len(counts))
+            self.assertEqual(result.img, self.heatmap.render(dups, area=area, engine=engine,
+                                                             aggregate=True).img)
+
+    def test_heatmap_bounds(self):
+        #the render hands back the bounds it scaled to, NaN points left out
+        pts = array.array('f', [random.random() for x in range(4000)] + [float('nan'), .5])
+        xs = pts[0:4000:2]
+        ys = pts[1:4000:2]
+        expected = ((min(xs), min(ys)), (max(xs), max(ys)))
+        result = self.heatmap.render(memoryview(pts))
+        self.assertEqual(result.bounds, expected)
+        self.assertEqual(result.area, expected)
+        self.assertEqual(heatmap.HeatmapResult(None, memoryview(pts[:4000]), 0, None, None).area, expected)
+        #and so does tx()
+        lib = self.heatmap._heatmap
+        used = heatmap.heatmap._Bounds()
+        arr = (ctypes.c_float * len(pts))(*pts)
+        out = (ctypes.c_ubyte * (64 * 64 * 4))()
+        lut = self.heatmap._convertScheme("classic", 128)
+        diag = heatmap.heatmap._Diagnostics()
+        self.assertTrue(lib.tx(arr, len(arr), 64, 64, 10, lut, out, 0, ctypes.c_float(0), ctypes.c_float(0),
+                               ctypes.c_float(0), ctypes.c_float(0), 0, 1, ctypes.byref(used), ctypes.byref(diag)))
+        self.assertEqual(((used.minX, used.minY), (used.maxX, used.maxY)), expected)
+        self.assertEqual(sum(diag.histogram), 64 * 64)
+        #the area of doubles is that of the values given, not of their float32 copy
+        doubles = array.array('d', [.1, .2, .3, .4, .7, .9])
+        self.assertEqual(self.heatmap.render(doubles).area, ((.1, .2), (.7, .9)))
+        try:
+            import numpy
+        except ImportError:
+            return
+        self.assertEqual(self.heatmap.render(numpy.array(doubles).reshape(-1, 2)).area, ((.1, .2), (.7, .9)))
+        #numpy leaves NaN out as heatmap.c does
+        nans = numpy.array(pts)
+        self.assertEqual(heatmap.HeatmapResult(None, memoryview(nans), 0, None, None).area, expected)
+        #and so does ranging them without numpy, infinities too
+        (nan, inf) = (float('nan'), float('inf'))
+        for flat in ([nan, 1, 2, 3, nan, 3, 0.5, 4, 1, inf], [nan, 1, nan, 3]):
+            view = memoryview(numpy.array(flat))
+            self.assertEqual(heatmap.HeatmapResult(None, view, 0, None, None).area,
+                             heatmap.HeatmapResult(None, flat, 0, None, None).area)
+        self.assertEqual(heatmap.HeatmapResult(None, [nan, 1, 2, 3, 0.5, 4, 1, inf], 0, None, None).area,
+                         ((0.5, 3), (2, 4)))
+        self.assertEqual(heatmap.HeatmapResult(None, [nan, 1, nan, 3], 0, None, None).area, ((0, 0), (0, 0)))
+
+    def test_heatmap_animation(self):
+        #each frame of the rolling grid should match rendering its window afresh,
+        #bar float rounding of the points added and taken out again
+        rnd = random.Random(21)
+        pts = [(rnd.random(), rnd.random(), rnd.uniform(0, 1000)) for x in range(6000)]
+        area = ((0, 0), (1, 1))
+        ar = heatmap.AnimationRenderer(pts, window=300, step=100, size=(200, 150), area=area, dotsize=20)
+        self.assertEqual(ar.times()[:3], [ar.start, ar.start + 100, ar.start + 200])
+        self.assertTrue(ar.times()[-1] + 300 > ar.end >= ar.times()[-2] + 300)
+        for (t0, result) in ar.frames():
+            window = [(x, y) for (x, y, t) in pts if t0 <= t < t0 + 300]
+            a = result.img.tobytes()
+            b = self.heatmap.render(window, dotsize=20, size=(200, 150), area=area, engine='additive').img.tobytes()
+            self.assertTrue(sum(1 for (x, y) in zip(a, b) if x != y) < len(a) // 1000)
+        self.assertEqual(ar.save("26-animation.gif"), len(ar.times()))
+        self.assertEqual(Image.open("26-animation.gif").n_frames, len(ar.times()))
+        self.assertEqual(ar.save("26-animation.png"), len(ar.times()))
+        self.assertEqual(Image.open("26-animation.png").n_frames, len(ar.times()))
+        self.assertEqual(ar.saveFrames("26-animation"), len(ar.times()))
+
+    def test_heatmap_sharded(self):
+        #bands drawn by several processes should make up exactly the image of one
+        rnd = random.Random(22)
+        pts = [(rnd.gauss(0, 1), rnd.gauss(0, 1), rnd.uniform(.1, 2)) for x in range(5000)]
+        runs = ({ "weighted" : 0 }, { "weighted" : 1 }, { "weighted" : 1, "engine" : "additive" },
+                { "weighted" : 1, "aggregate" : True }, { "weighted" : 0, "kernel" : "gaussian" },
+                { "weighted" : 0, "engine" : "additive", "aggregate" : True },
+                #most bands out of reach of every dot
+                { "weighted" : 0, "area" : ((-1, -1), (6, 6)) })
+        with concurrent.futures.ProcessPoolExecutor(2) as pool:
+            for kwargs in runs:
+                p = pts if kwargs["weighted"] else [q[:2] for q in pts]
+                whole = self.heatmap.render(p, dotsize=30, size=(300, 200), **kwargs)
+                sr = heatmap.ShardedRenderer(size=(300, 200), dotsize=30, pool=pool, bands=7, **kwargs)
+                result = sr.render(p)
+                self.assertEqual(whole.img, result.img, kwargs)
+                self.assertEqual(whole.area, result.area)
+        result.img.save("27-sharded.png")
+
+    def test_heatmap_stats(self):
+        #recording stats should leave the image as is and count what was drawn
+        rnd = random.Random(24)
+        pts = [(rnd.random(), rnd.random()) for x in range(3000)] + [(3, 3), (-2, .5)]
+        area = ((0, 0), (1, 1))
+        seen = []
+        stats = heatmap.RenderStats(lambda stage, seconds: seen.append(stage))
+        img = self.heatmap.heatmap(pts, dotsize=10, size=(300, 200), area=area, stats=stats)
+        self.heatmap.saveKML("28-stats.kml", stats=stats)
+        self.assertEqual(img, self.heatmap.render(pts, dotsize=10, size=(300, 200), area=area).img)
+        self.assertEqual(seen, ['convert', 'density', 'colorize', 'image', 'save', 'kml'])
+        self.assertEqual(list(stats.stages), seen)
+        self.assertEqual((stats.points, stats.culled, stats.stamped, stats.pixels), (3002, 2, 3000, 60000))
+        alpha = img.getchannel('A').tobytes()
+        self.assertEqual(stats.touched, sum(1 for a in alpha if a))
+        self.assertTrue(0 < stats.saturation < 1)
+        self.assertEqual(stats.asDict()["seconds.density"], stats.stages["density"])
+        stats.reset()
+        self.heatmap.render(pts, dotsize=10, size=(300, 200), kernel='gaussian', stats=stats)
+        self.assertEqual(list(stats.stages), ['convert', 'bounds', 'density', 'blur', 'colorize', 'image'])
+        self.assertEqual((stats.points, stats.culled), (3002, 0))
+
+    def test_heatmap_diagnostics(self):
+        #colorizing should report its histogram and warn rather than print when saturated
+        rnd = random.Random(25)
+        pts = [(rnd.gauss(0, 1), rnd.gauss(0, 1)) for x in range(5000)]
+        for engine in ("multiply", "additive"):
+            diag = self.heatmap.render(pts, dotsize=15, size=(300, 200), engine=engine).diagnostics
+            self.assertEqual(diag.pixels, 60000)
+            self.assertEqual(sum(diag.histogram), 60000)
+            self.assertEqual(diag.touched, 60000 - diag.histogram[255])
+            self.assertEqual(diag.saturated, sum(diag.histogram[:16]))
+            self.assertAlmostEqual(diag.saturation, diag.saturated / 60000.0)
+            self.assertTrue(0 < diag.minIntensity < diag.maxIntensity)
+        for target in (0, 2, 10, 30):
+            result = self.heatmap.render(pts, dotsize=15, size=(300, 200), engine="additive",
+                                         normalize="saturation", saturation=target)
+            self.assertAlmostEqual(result.diagnostics.saturation * 100, target, delta=0.5)
+        result = self.heatmap.render(pts, dotsize=15, size=(300, 200), normalize="saturation", saturation=30)
+        self.assertAlmostEqual(result.diagnostics.saturation * 100, 30, delta=2)
+        result.img.save("29-saturation.png")
+        self.assertRaises(Exception, self.heatmap.render, pts, normalize="saturation", saturation=101)
+        #the other renderers take saturation too
+        kwargs = { "normalize" : "saturation", "saturation" : 30 }
+        acc = heatmap.HeatmapAccumulator((300, 200), result.bounds, dotsize=15)
+        acc.add(pts)
+        self.assertEqual(acc.render(**kwargs).img, result.img)
+        self.assertEqual(heatmap.ShardedRenderer((300, 200), dotsize=15, workers=1).render(pts, **kwargs).img,
+                         result.img)
+        additive = self.heatmap.render(pts, dotsize=15, size=(300, 200), area=result.bounds,
+                                       engine="additive", **kwargs)
+        ar = heatmap.AnimationRenderer([(x, y, 0) for (x, y) in pts], 1, 1, size=(300, 200), dotsize=15,
+                                       area=result.bounds)
+        self.assertEqual([r.img for (t0, r) in ar.frames(**kwargs)], [additive.img])
+        with self.assertWarns(heatmap.SaturationWarning):
+            self.heatmap.render(pts, dotsize=200, size=(50, 50))
+        #pinned on the line calling into heatmap, whichever entry point it is
+        grid = self.heatmap.density(pts, dotsize=200, size=(50, 50))
+        acc = heatmap.HeatmapAccumulator((50, 50), result.bounds, dotsize=200)
+        acc.add(pts)
+        ar = heatmap.AnimationRenderer([(x, y, 0) for (x, y) in pts], 1, 1, size=(50, 50), dotsize=200,
+                                       area=result.bounds)
+        calls = (lambda: self.heatmap.heatmap(pts, dotsize=200, size=(50, 50)),
+                 lambda: self.heatmap.render(pts, dotsize=200, size=(50, 50)),
+                 lambda: self.heatmap.colorize(grid),
+                 lambda: acc.render(),
+                 lambda: heatmap.ShardedRenderer((50, 50), dotsize=200, workers=1).render(pts),
+                 lambda: [r for (t0, r) in ar.frames(normalize="saturation", saturation=90)],
+                 lambda: ar.saveFrames("29-frames", normalize="saturation", saturation=90))
+        for call in calls:
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter("always")
+                call()
+            self.assertEqual([x.category for x in w], [heatmap.SaturationWarning])
+            self.assertEqual(w[0].filename, __file__)
+
+    def test_heatmap_simd(self):
+        #every kernel level the CPU has should draw exactly what the scalar one does
+        rnd = random.Random(17)
+        pts = [(rnd.uniform(0, 1000), rnd.uniform(0, 1000), rnd.uniform(.1, 2)) for x in range(3000)]
+        runs = ({ "weighted" : 0 }, { "weighted" : 1 }, { "weighted" : 1, "engine" : "additive" })
+        original = heatmap.simd()
+        try:
+            expected = None
+            for level in ('scalar', 'sse2', 'avx2'):
+                heatmap.simd(level)
+                imgs = [self.heatmap.render(pts if kwargs["weighted"] else [p[:2] for p in pts],
+                                            dotsize=37, size=(333, 211), **kwargs).img.tobytes()
+                        for kwargs in runs]
+                if expected is None:
+                    expected = imgs
+                self.assertEqual(imgs, expected, level)
+            self.assertEqual(heatmap.simd('scalar'), 'scalar')
+            self.assertRaises(Exception, heatmap.simd, 'mmx')
+        finally:
+            heatmap.simd(original)
+
+    def test_heatmap_tiles(self):
+        #stitched tiles should match rendering their area in one go.  dots are only
+        #cut at tile edges when tiles are rendered on their own, so count any pixel
+        #that differs but allow a few flipped by float32 rounding of the single render
+        rnd = random.Random(9)
+        extent = heatmap.tiles.EXTENT
+        pts = [(rnd.uniform(-.6, .5)*extent, rnd.uniform(-.4, .7)*extent) for x in range(2000)]
+        tr = heatmap.TileRenderer(pts, dotsize=60)
+        tiles = tr.tiles(2)
+        xs = [x for (x, y) in tiles]
+        ys = [y for (x, y) in tiles]
+        size = ((max(xs) - min(xs) + 1)*256, (max(ys) - min(ys) + 1)*256)
+        stitched = Image.new('RGBA', size)
+        for (x, y) in tiles:
+            img = tr.tile(2, x, y)
+            if img is not None:
+                stitched.paste(img, ((x - min(xs))*256, (y - min(ys))*256))
+        ((west, south), _) = heatmap.tiles.tileBounds(2, min(xs), max(ys))
+        (_, (east, north)) = heatmap.tiles.tileBounds(2, max(xs), min(ys))
+        whole = self.heatmapImage("20-tiles-whole", pts, kwargs = { "dotsize" : 60, "size" : size,
+                                  "area" : ((west, south), (east, north)) })
+        stitched.save("20-tiles-stitched.png")
+        a = stitched.tobytes()
+        b = whole.tobytes()
+        painted = [i for i in range(0, len(a), 4) if a[i+3] or b[i+3]]
+        differ = [i for i in painted if a[i:i+4] != b[i:i+4]]
+        self.assertTrue(len(painted) > len(a)//16)
+        self.assertTrue(len(differ) < len(painted)/1000.)
+        self.assertEqual(tr.saveTiles("20-tiles", [2], scheme="fire"),
+                         len([t for t in tiles if tr.tile(2, t[0], t[1]) is not None]))
+        self.assertTrue(tr.tile(2, 4, 0) is None)
+        self.assertTrue(tr.tile(2000, 0, 0) is None)
+        self.assertRaises(Exception, tr.tiles, 31)
+        #deep zoom levels list the tiles around the points, not every tile of
+        #the index's coarse cells
+        deep = set(tr.tiles(20))
+        self.assertTrue(len(deep) <= len(pts) * 9)
+        res = 2 * extent / (1 << 20)
+        for (px, py) in pts[:50]:
+            self.assertTrue((int((px + extent) // res), int((extent - py) // res)) in deep)
+        #zoom levels' indexes are dropped beyond the cache budget, and built again
+        bounded = heatmap.TileRenderer(pts, dotsize=60, indexCacheBytes=64*1024)
+        for z in range(0, 12):
+            bounded.tiles(z)
+        self.assertTrue(bounded._indexes.nbytes <= 64*1024)
+        self.assertTrue(len(bounded._indexes) < 12)
+        self.assertEqual(bounded.tiles(2), tiles)
+
+    def test_heatmap_tile_server(self):
+        #switching scheme should colorize the memoized density again, not stamp it again
+        try:
+            from urllib.request import urlopen
+            from urllib.error import HTTPError
+        except ImportError:
+            self.skipTest("urllib.request not available")
+        pts = [(random.uniform(-2e6, 2e6), random.uniform(-2e6, 2e6)) for x in range(500)]
+        tr = heatmap.TileRenderer(pts, dotsize=40)
+        server = heatmap.TileServer(tr, ('127.0.0.1', 0))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:%d/%%s" % server.server_address[1]
+            classic = urlopen(url % "classic/3/3/3.png").read()
+            fire = urlopen(url % "fire/3/3/3.png?opacity=200").read()
+            self.assertEqual(classic, urlopen(url % "classic/3/3/3.png").read())
+            self.assertEqual(server.densities.misses, 1)
+            self.assertEqual(server.tiles.hits, 1)
+            with open("21-server-fire.png", "wb") as fh:
+                fh.write(fire)
+            self.assertEqual(Image.open("21-server-fire.png").convert('RGBA'), tr.tile(3, 3, 3, "fire", 200))
+            #a scheme registered anew is colorized again rather than served stale
+            colorschemes.register_scheme("test-server", colorschemes.schemes["fire"])
+            self.assertEqual(urlopen(url % "test-server/3/3/3.png?opacity=200").read(), fire)
+            colorschemes.register_scheme("test-server", colorschemes.schemes["classic"])
+            recolored = Image.open(io.BytesIO(urlopen(url % "test-server/3/3/3.png?opacity=200").read()))
+            self.assertEqual(recolored.convert('RGBA'), tr.tile(3, 3, 3, "classic", 200))
+            self.assertEqual(server.densities.misses, 1)
+            blank = Image.open(io.BytesIO(urlopen(url % "classic/3/0/0.png").read()))
+            self.assertEqual(blank.getextrema()[3], (0, 0))
+            self.assertRaises(HTTPError, urlopen, url % "nosuchscheme/3/3/3.png")
+            self.assertRaises(HTTPError, urlopen, url % "classic/3/3/3.png?opacity=300")
+            #tiles off the map or too deep are not found, rather than failing to render
+            for path in ("classic/2000/0/0.png", "classic/31/0/0.png", "classic/3/8/0.png", "classic/3/0/8.png"):
+                with self.assertRaises(HTTPError) as raised:
+                    urlopen(url % path)
+                self.assertEqual(raised.exception.code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            colorschemes._schemes.pop("test-server", None)
+        cache = heatmap.server.LRUCache(10)
+        cache.put("a", "a", 4)
+        cache.put("b", "b", 4)
+        cache.get("a")
+        cache.put("c", "c", 4)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), ("a", None, "c"))
+
     def test_heatmap_area(self):
       MAX_SIZE=8192
       PPD=100
@@ -115,6 +686,18 @@ class TestHeatmap(unittest.TestCase):
       self.heatmapImage("11-400-areaTest", pts, { "size" : (width, height), "dotsize" : dotsize, "area" : bounds, "weighted" : 1}, saveKML = True)
       self.heatmapImage("11-400-areaTestNormal", pts , kwargs = { "size" : (width, height), "dotsize" : dotsize, "weighted" : 1}, saveKML = True)
 
+    def test_heatmap_use_pyproj(self):
+        #turning pyproj off by hand should count as it not being installed
+        pts = [(random.uniform(-180,180),random.uniform(-90,90)) for x in range(400)]
+        try:
+            heatmap.heatmap.use_pyproj = False
+            self.assertRaises(Exception, self.heatmap.heatmap, pts, srcepsg="EPSG:4326")
+            self.assertRaises(Exception, heatmap.TileRenderer, pts, srcepsg="EPSG:4326")
+        finally:
+            del heatmap.heatmap.use_pyproj
+        if heatmap.heatmap.use_pyproj:
+            self.heatmapImage("09-400-usepyproj", pts, kwargs = { "srcepsg" : "EPSG:4326" })
+
     def test_heatmap_random_proj(self):
         pts = [(random.uniform(-180,180),random.uniform(-90,90)) for x in range(400)]
         norm = self.heatmapImage("09-400-normal", pts, saveKML = True)
@@ -146,6 +729,17 @@ class TestHeatmap(unittest.TestCase):
         #testing conversion of src epsg, image is possibly similar do to linearity at the equator but KML boundary should be very different (not tested)
         epsg3857 = self.heatmapImage("10-400-EPSG3857", pts, kwargs = { "srcepsg" : "EPSG:3857", "dstepsg" : "EPSG:4087",  "size" : (2048, 1024), "dotsize" : 50, "weighted" : 1 }, saveKML = True)
     
+    def test_heatmap_proj_datatypes(self):
+        #reprojection is done in one call per column, weights must come through untouched
+        #coordinates are float32 already so the projected float32 array is the same as the list
+        f32 = array.array('f', [v for x in range(4000) for v in (random.uniform(-180,180),random.uniform(-85,85))])
+        pts = [(f32[i],f32[i+1],1) for i in range(0,len(f32),2)]
+        norm = self.heatmapImage("16-4k-EPSG3857DST", list(map(lambda x_y_z : (x_y_z[0],x_y_z[1]), pts)), kwargs = { "srcepsg" : "EPSG:4326" }, saveKML = True)
+        weight = self.heatmapImage("16-4k-EPSG3857DSTweighted", pts, kwargs = { "srcepsg" : "EPSG:4326", "weighted" : 1 }, saveKML = True)
+        flat = self.heatmapImage("16-4k-EPSG3857DSTarrayf", array.array('f', sum(map(list, pts), [])), kwargs = { "srcepsg" : "EPSG:4326", "weighted" : 1 }, saveKML = True)
+        self.assertEqual(norm,weight)
+        self.assertEqual(norm,flat)
+
     def test_heatmap_exceptions(self):
  
       #test invalid (empty) heatmap, should print error to stdout
@@ -179,6 +773,35 @@ class TestColorScheme(unittest.TestCase):
         keys = colorschemes.valid_schemes()
         self.assertEqual(sorted(list(keys)), sorted(['fire', 'pgaitch', 'pbj', 'omg', 'classic']))
 
+    def tearDown(self):
+        #leave only the built-in schemes for test_schemes
+        for name in list(colorschemes.valid_schemes()):
+            if name.startswith("test-"):
+                del colorschemes._schemes[name]
+
+    def test_register(self):
+        #registered schemes can be used by name, replacing one rebuilds its lookup table
+        colorschemes.register_gradient("test-gradient", [(0, (0, 0, 255)), (.5, (0, 255, 0)), (1, (255, 0, 0))])
+        values = colorschemes.schemes["test-gradient"]
+        self.assertEqual((values[0], values[255]), ((255, 0, 0), (0, 0, 255)))
+        self.assertTrue(values[127] in ((0, 255, 0), (1, 254, 0)))
+        self.assertTrue("test-gradient" in heatmap.Heatmap().schemes())
+        strip = Image.new('RGB', (512, 3))
+        strip.paste((255, 255, 0), (256, 0, 512, 3))
+        colorschemes.register_image("test-image", strip)
+        values = colorschemes.schemes["test-image"]
+        self.assertEqual((values[0], values[255]), ((255, 255, 0), (0, 0, 0)))
+        pts = [(random.random(), random.random()) for x in range(100)]
+        hm = heatmap.Heatmap()
+        colorschemes.register_scheme("test-flat", [(255, 0, 0)] * 256)
+        red = hm.heatmap(pts, scheme="test-flat", opacity=255)
+        colorschemes.register_scheme("test-flat", bytes(bytearray([0, 0, 255] * 256)))
+        blue = hm.heatmap(pts, scheme="test-flat", opacity=255)
+        self.assertEqual(red.getextrema()[:3], ((255, 255), (0, 0), (0, 0)))
+        self.assertEqual(blue.getextrema()[:3], ((0, 0), (0, 0), (255, 255)))
+        self.assertRaises(Exception, colorschemes.register_scheme, "test-short", [(0, 0, 0)] * 255)
+        self.assertRaises(Exception, colorschemes.register_scheme, "test-range", [(0, 0, 256)] * 256)
+
     def test_values(self):
         for key, values in colorschemes.schemes.items():
             self.assertTrue(isinstance(values, list))